@@ -7,85 +7,245 @@ import sys
 import re
 import time
 import json
-import queue
 import socket
 import logging
 import threading
+import multiprocessing
+import contextvars
 import uuid
+import shutil
 from flask import Flask, render_template, request, jsonify, send_file, Response
 from flask import stream_with_context
 from werkzeug.utils import secure_filename
-from converter import UniversalConverter, pt_to_onnx
+from job_executor import ConversionExecutor
+from conversion_cache import ConversionCache, make_key
+from build_options import (BUILD_OPTION_SPECS, DEFAULT_BUILD_PRESET, resolve_build_options,
+                           get_build_presets_meta)
+from converter import _resolve_dataset
+from op_report import REPORT_SUFFIX
+from stage_metrics import make_record, rebase as rebase_stages, summary_text as stages_text
+from eta_history import EtaHistory, EtaTracker, params_from_file, plan_seconds
+from job_store import JobStore, STATUS_RUNNING
+from event_log import EventLog, SPILL_SUFFIX, spill_path, replay_file
+from model_estimate import check_limits
+from upload_stream import (StreamingRequest, InsufficientStorage, save_upload, upload_sha256,
+                           SPOOL_PREFIX, SPOOL_SUFFIX)
+from quant_sweep import (DEFAULT_SWEEP_GRID, DEFAULT_HOLDOUT, split_dataset, expand_grid,
+                         config_label, rank_results)
+from hybrid_quant import (DEFAULT_TARGET_COSINE, DEFAULT_LAYER_THRESHOLD, DEFAULT_MAX_ITERS,
+                          DEFAULT_LAYERS_PER_ITER)
 from model_registry import MODEL_REGISTRY, get_model_types_meta, validate_file_ext, validate_pt_task
 from calibration_builder import build_calibration_dataset, get_calibration_status, detect_dataset_format, normalize_path, link_calibration_dataset
-from inferencer import run_inference, img_to_base64, run_accuracy_analysis
+from inferencer import (run_inference, run_cascade_inference, img_to_base64, run_accuracy_analysis,
+                        select_input_shape, check_tile_overlap)
 try:
     import netron
     NETRON_AVAILABLE = True
 except ImportError:
     NETRON_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
 # ─── 异步转换任务管理 ───────────────────────────────────
-_jobs = {}          # job_id -> {q, thread_id, done}
+# 内存中只保留运行中与刚结束的任务（事件日志，见 event_log），状态 / 参数 / 结果持久化在 _store（job_store）
+_jobs = {}          # job_id -> {id, events, done, finished_at}
 _jobs_lock = threading.Lock()
+_current_job = contextvars.ContextVar('current_job', default=None)   # 当前上下文所属任务
+
+def _new_job(job_id, kind, params, platforms=None, resumed=False):
+    """登记任务：内存事件队列 + 任务存储记录（resumed 时记录已存在）"""
+    job = {'id': job_id, 'events': EventLog(spill_path(app.config['EVENT_LOG_FOLDER'], job_id)),
+           'done': False, 'progress': None,
+           'platforms': {p: 0 for p in platforms} if platforms and len(platforms) > 1 else None,
+           'eta': None}
+    with _jobs_lock:
+        _jobs[job_id] = job
+    if not resumed:
+        _store.create(job_id, kind, params)
+    return job
 
-def _get_job_by_thread():
-    tid = threading.current_thread().ident
+def _find_active_job(content_key):
+    """内容键相同、尚未结束的任务（上传去重）"""
     with _jobs_lock:
         for job in _jobs.values():
-            if job.get('thread_id') == tid:
+            if job.get('content_key') == content_key and not job['done'] and not job.get('cancelled'):
                 return job
     return None
 
+def _job_running(job):
+    """第一个子任务开始执行：queued → running"""
+    if not job.get('running'):
+        job['running'] = True
+        _store.set_status(job['id'], STATUS_RUNNING)
+
+def _bind_job(job, fn):
+    """
+    包装执行器回调：回调执行期间 _current_job 指向该任务，回调内产生的 stderr / logger 输出
+    由 _TeeWriter / _QueueLogHandler 直接归属到该任务（无需加锁扫描 _jobs）
+    """
+    def wrapper(*args, **kwargs):
+        token = _current_job.set(job)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_job.reset(token)
+    return wrapper
+
 def _job_put(job, event_type, data):
     if job:
-        job['q'].put((event_type, data))
+        job['events'].append(event_type, data)
+        if event_type == 'done':
+            job['finished_at'] = time.monotonic()
+        _store.on_event(job.get('id'), event_type, data)
+
+def _job_stopped(job, result, platform=None):
+    """
+    子任务被看门狗超时终止时推送 timeout 事件（取消事件由 /api/convert/cancel 推送一次）。
+    返回子任务的终止状态（'cancelled' / 'timeout'），正常结束返回 None。
+    """
+    status = result.get('status')
+    if status == 'timeout':
+        _job_put(job, 'timeout', {'message': result.get('message', ''), 'stage': result.get('stage'),
+                                  'platform': platform})
+    return status
+
+def _done_status(job, results):
+    """done 事件的 status：任务被取消为 cancelled，没有成功结果且有子任务超时为 timeout"""
+    if job.get('cancelled'):
+        return 'cancelled'
+    if results and not any(r.get('success') for r in results) and \
+            any(r.get('status') == 'timeout' for r in results):
+        return 'timeout'
+    return None
+
+def _remove_outputs(rknn_path):
+    """删除 .rknn 及其配套文件（被终止的构建可能留下不完整的输出）"""
+    base = os.path.splitext(rknn_path)[0]
+    for path in (rknn_path, rknn_path + '.meta.json', base + '.onnx', base + '.quantization.cfg',
+                 base + REPORT_SUFFIX):
+        if os.path.exists(path):
+            try: os.remove(path)
+            except: pass
+
+def _save_upload(file, path):
+    """
+    保存上传文件（流式上传的文件直接 rename，见 upload_stream），
+    返回 (upload 阶段的统计记录（见 stage_metrics）, 文件 SHA-256)
+    """
+    sha256, wall_s, cpu_s = save_upload(file, path)
+    return make_record('upload', wall_s, cpu_s, write_bytes=os.path.getsize(path)), sha256
+
+def _merge_stages(upload_stage, upload_started, *results):
+    """
+    上传记录 + 各子任务结果中的阶段记录合并为一条时间线：每个工作进程从自己的子任务开始计时，
+    start_s 统一换算为相对上传开始（upload_started，Unix 时间）
+    """
+    stages = [upload_stage]
+    for res in results:
+        stages += rebase_stages(res.get('stages', []), res.get('stages_started_at'), upload_started)
+    return stages
+
+def _put_stages(job, stages, label=None):
+    """阶段耗时摘要推送为日志行"""
+    for line in stages_text(stages).splitlines():
+        _job_put(job, 'log', f'[{label}] {line}' if label else line)
+
+def _put_eta(job):
+    tracker = job.get('eta')
+    if tracker:
+        _job_put(job, 'eta', tracker.snapshot())
+
+def _count_lines(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+    except OSError:
+        return 0
+
+_TQDM_PCT = re.compile(r'(\d+)%\s?\|')
+_KEYWORDS = ('rknnopt', 'load_', '加载', '构建 RKNN', 'uilding', '复用量化参数', 'export_rknn', '导出：',
+             '完成 ✓', 'RKNN 成功')
 
-def _parse_progress_from_line(job, line):
-    """从 RKNN tqdm / logger 行解析进度百分比并推送"""
+def _progress_from_line(line):
+    """从 RKNN tqdm / logger 行解析整体进度百分比，无进度信息返回 None"""
     if not line:
-        return
+        return None
     # tqdm 格式: "I Quantizating :  24%|████..."
-    if ('%|' in line or '% |' in line) and re.search(r'\d+%', line):
-        pct_m = re.search(r'(\d+)%', line)
+    if '%' in line:
+        pct_m = _TQDM_PCT.search(line)
         if pct_m:
             pct = int(pct_m.group(1))
             if 'Quantizat' in line:
-                overall = 37 + int(pct * 0.46)   # 37-83%
-                _job_put(job, 'progress', overall)
+                return 37 + int(pct * 0.46)   # 37-83%
             elif 'GraphPreparing' in line:
-                _job_put(job, 'progress', 30 + int(pct * 0.05))
+                return 30 + int(pct * 0.05)
+            return None
+    # 绝大多数日志行不含关键字，先整体筛一遍
+    if not any(k in line for k in _KEYWORDS):
+        return None
     # 关键文字进度节点
-    elif 'rknnopt' in line and '导出完成' in line:
-        _job_put(job, 'progress', 18)
-    elif 'load_pytorch' in line or 'load_onnx' in line or '加载 torchscript' in line or '加载 ONNX' in line:
-        _job_put(job, 'progress', 22)
-    elif '构建 RKNN' in line or 'building' in line.lower():
+    if 'rknnopt' in line and '导出完成' in line:
+        return 18
+    if 'load_pytorch' in line or 'load_onnx' in line or '加载 torchscript' in line or '加载 ONNX' in line:
+        return 22
+    if '构建 RKNN' in line or 'building' in line.lower():
         if 'done' in line.lower() or '完成' in line:
-            _job_put(job, 'progress', 86)
-        else:
-            _job_put(job, 'progress', 28)
-    elif 'export_rknn' in line or '导出：' in line:
-        _job_put(job, 'progress', 90)
-    elif '完成 ✓' in line or 'RKNN 成功' in line:
-        _job_put(job, 'progress', 95)
+            return 86
+        return 28
+    if '复用量化参数' in line:
+        return 80
+    if 'export_rknn' in line or '导出：' in line:
+        return 90
+    if '完成 ✓' in line or 'RKNN 成功' in line:
+        return 95
+    return None
+
+def _progress_from_lines(lines):
+    """一批日志行中最后一个进度值"""
+    for line in reversed(lines):
+        pct = _progress_from_line(line)
+        if pct is not None:
+            return pct
+    return None
+
+
+def _push_progress(job, lines, platform=None):
+    """
+    解析一批日志行的进度并推送（取最后一个进度值，与上次相同则不推送）。platform 不为空时
+    （多平台任务的构建阶段）推送该平台的 platform_progress，整体进度取各平台平均值。
+    """
+    if not job:
+        return
+    pct = _progress_from_lines(lines)
+    if pct is None:
+        return
+    platforms = job.get('platforms')
+    if platform and platforms is not None:
+        pct = max(platforms.get(platform, 0), pct)
+        if pct == platforms.get(platform):
+            return
+        platforms[platform] = pct
+        _job_put(job, 'platform_progress', {'platform': platform, 'progress': pct})
+        pct = int(sum(platforms.values()) / len(platforms))
+    if pct != job.get('progress'):
+        job['progress'] = pct
+        _job_put(job, 'progress', pct)
 
 class _TeeWriter:
-    """将 stderr/stdout 写入同时推送到当前线程对应的 job queue"""
+    """将 stderr/stdout 写入同时推送到当前上下文所属任务（_current_job）"""
     def __init__(self, orig):
         self._orig = orig
     def write(self, s):
         self._orig.write(s)
         if not s or s.isspace():
             return
-        job = _get_job_by_thread()
+        job = _current_job.get()
         if job:
-            lines = re.sub(r'\r', '\n', s).split('\n')
-            for line in lines:
-                line = line.strip()
-                if line:
-                    job['q'].put(('log', line))
-                    _parse_progress_from_line(job, line)
+            lines = [line.strip() for line in s.replace('\r', '\n').split('\n')]
+            lines = [line for line in lines if line]
+            if lines:
+                _job_put(job, 'logs', lines)
+                _push_progress(job, lines)
     def flush(self):
         self._orig.flush()
     def fileno(self):
@@ -95,14 +255,14 @@ class _TeeWriter:
         return False
 
 class _QueueLogHandler(logging.Handler):
-    """将 Python logger 消息推送到当前线程对应的 job queue"""
+    """将 Python logger 消息推送到当前上下文所属任务（_current_job）"""
     def emit(self, record):
         try:
-            msg = self.format(record)
-            job = _get_job_by_thread()
+            job = _current_job.get()
             if job:
-                job['q'].put(('log', msg))
-                _parse_progress_from_line(job, msg)
+                msg = self.format(record)
+                _job_put(job, 'log', msg)
+                _push_progress(job, (msg,))
         except Exception:
             pass
 
@@ -115,16 +275,55 @@ logging.getLogger().addHandler(_queue_handler)
 # ──────────────────────────────────────────────────────────
 
 
+SUPPORTED_PLATFORMS = ('rk3562', 'rk3566', 'rk3568', 'rk3576', 'rk3588')
+MAX_BATCH_SIZE = 32
+
 app = Flask(__name__)
+app.request_class = StreamingRequest                  # 上传文件流式写入上传目录并计算 SHA-256
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB
+app.config['MAX_UPLOAD_FILE_BYTES'] = 500 * 1024 * 1024  # 单个上传文件上限，写入中超出即中止
 app.config['UPLOAD_FOLDER'] = './uploads'
 app.config['OUTPUT_FOLDER'] = './output'
 app.config['CALIBRATION_FOLDER'] = './calibration_data'
+app.config['CACHE_FOLDER'] = './cache'
+app.config['CACHE_MAX_BYTES'] = 20 * 1024 * 1024 * 1024  # 20GB，超出按最近使用淘汰
+app.config['ETA_HISTORY_FILE'] = './history/stage_history.jsonl'  # 阶段耗时历史，用于 ETA 预测
+# 任务存储：结束的任务在内存中保留 JOB_MEMORY_TTL 秒（供 SSE 读取），记录在库中保留 JOB_TTL 秒
+app.config['JOB_STORE_PATH'] = './data/jobs.db'
+app.config['EVENT_LOG_FOLDER'] = './data/events'     # 逐任务压缩事件日志（SSE 断线续传 / 回放）
+app.config['JOB_MEMORY_TTL'] = 300
+app.config['JOB_TTL'] = 7 * 24 * 3600
+# 构建前静态预估的上限（0 表示不限制），超出时不再构建；/api/convert 可用同名字段覆盖
+app.config['ESTIMATE_MAX_GMACS'] = 0
+app.config['ESTIMATE_MAX_PARAMS_M'] = 0
+
+# 转换工作进程：同时运行的任务数上限 / 每个工作进程执行多少个任务后回收
+app.config['MAX_CONCURRENT_JOBS'] = 2
+app.config['JOBS_PER_WORKER'] = 5
+# 各阶段超时（秒，0 表示不限制），超时由看门狗终止工作进程
+app.config['STAGE_TIMEOUTS'] = {'export': 1800, 'export_onnx': 1800, 'load': 600, 'calibration': 3600,
+                                'build': 3600, 'export_rknn': 600}
+_executor = ConversionExecutor(max_workers=app.config['MAX_CONCURRENT_JOBS'],
+                               jobs_per_worker=app.config['JOBS_PER_WORKER'],
+                               stage_timeouts=app.config['STAGE_TIMEOUTS'])
+
+_eta_history = EtaHistory(app.config['ETA_HISTORY_FILE'])
+_store = JobStore(app.config['JOB_STORE_PATH'])
+JOB_JANITOR_INTERVAL = 30
+UPLOAD_SPOOL_MAX_AGE = 3600   # 超过该时间未写入的上传中文件视为残留
+ETA_INTERVAL = 5      # SSE 推送 ETA 的间隔（秒）
 
 # 确保必要的目录存在
-for folder in [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER'], app.config['CALIBRATION_FOLDER']]:
+for folder in [app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER'], app.config['CALIBRATION_FOLDER'],
+               app.config['CACHE_FOLDER'], app.config['EVENT_LOG_FOLDER']]:
     os.makedirs(folder, exist_ok=True)
 
+# 上传超限 / 磁盘空间不足（上传流式写入时提前中止，见 upload_stream）
+@app.errorhandler(413)
+@app.errorhandler(InsufficientStorage)
+def upload_rejected(e):
+    return jsonify({'success': False, 'message': e.description}), e.code
+
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'pt', 'pth', 'onnx'}
 
@@ -165,7 +364,7 @@ def validate_model():
     if ext in ('pt', 'pth'):
         tmp_path = os.path.join(app.config['UPLOAD_FOLDER'],
                                 f"_validate_{int(time.time())}_{secure_filename(file.filename)}")
-        file.save(tmp_path)
+        _save_upload(file, tmp_path)
         try:
             ok, msg = validate_pt_task(model_type, tmp_path)
         finally:
@@ -181,16 +380,16 @@ def validate_model():
 @app.route('/api/platforms', methods=['GET'])
 def get_platforms():
     """获取支持的平台列表"""
-    platforms = [
-        {'value': 'rk3562', 'label': 'RK3562'},
-        {'value': 'rk3566', 'label': 'RK3566'},
-        {'value': 'rk3568', 'label': 'RK3568'},
-        {'value': 'rk3576', 'label': 'RK3576'},
-        {'value': 'rk3588', 'label': 'RK3588'}
-    ]
+    platforms = [{'value': p, 'label': p.upper()} for p in SUPPORTED_PLATFORMS]
     return jsonify({'platforms': platforms})
 
 
+@app.route('/api/build_presets', methods=['GET'])
+def get_build_presets():
+    """获取 RKNN 构建参数预设及各参数可选值"""
+    return jsonify(get_build_presets_meta())
+
+
 @app.route('/api/convert', methods=['POST'])
 def convert_model():
     """处理模型转换请求（异步，返回 job_id）"""
@@ -203,10 +402,40 @@ def convert_model():
         return jsonify({'success': False, 'message': '只支持 .pt / .pth / .onnx 文件'}), 400
 
     model_type   = request.form.get('model_type', 'yolov8_det')
-    platform     = request.form.get('platform', 'rk3576')
     quant_type   = request.form.get('quant_type', 'i8')
     input_width  = int(request.form.get('input_width', 640))
     input_height = int(request.form.get('input_height', 640))
+    priority     = int(request.form.get('priority', 0))
+    # platform 可重复提交或逗号分隔，多个平台共享一次导出
+    platforms = []
+    for value in request.form.getlist('platform') or ['rk3576']:
+        for p in value.split(','):
+            p = p.strip().lower()
+            if p and p not in platforms:
+                platforms.append(p)
+    unknown = [p for p in platforms if p not in SUPPORTED_PLATFORMS]
+    if unknown or not platforms:
+        return jsonify({'success': False, 'message': f'不支持的平台：{", ".join(unknown)}'}), 400
+
+    # 构建参数：预设 + 单项覆盖（表单字段名与 rknn.config 参数同名）
+    build_preset = request.form.get('build_preset') or DEFAULT_BUILD_PRESET
+    ok, msg, build_options = resolve_build_options(
+        build_preset, {k: request.form.get(k) for k in BUILD_OPTION_SPECS})
+    if not ok:
+        return jsonify({'success': False, 'message': msg}), 400
+
+    # 批大小与额外输入尺寸（"WxH,WxH"，主尺寸为 input_width × input_height）
+    try:
+        batch_size   = int(request.form.get('batch_size') or 1)
+        input_shapes = _parse_shapes(request.form.get('input_shapes', ''))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'message': f'batch_size 须在 1~{MAX_BATCH_SIZE} 之间'}), 400
+    try:
+        limits = _parse_limits()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
     ok, msg = validate_file_ext(model_type, file.filename)
     if not ok:
@@ -215,109 +444,871 @@ def convert_model():
     filename  = secure_filename(file.filename)
     timestamp = int(time.time())
     upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{filename}")
-    file.save(upload_path)
-
-    model_name      = os.path.splitext(filename)[0]
-    output_filename = f"{model_name}_{model_type}_{platform}_{quant_type}_{timestamp}.rknn"
-    output_path     = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-    do_quant        = (quant_type == 'i8')
+    # 相同内容 + 相同转换参数的任务仍在进行时，复用该任务而不是重复转换（上传文件随请求结束删除）
+    def _content_key(source_hash):
+        return make_key('convert', source_hash, model_type, quant_type, platforms, input_width,
+                        input_height, build_options, batch_size, input_shapes, limits)
+    streamed_hash = upload_sha256(file)
+    active = _find_active_job(_content_key(streamed_hash)) if streamed_hash else None
+    if active:
+        return jsonify({'started': True, 'job_id': active['id'], 'platforms': platforms,
+                        'deduplicated': True})
+    upload_stage, source_hash = _save_upload(file, upload_path)
+    upload_started = time.time() - upload_stage['wall_s']
+    content_key = _content_key(source_hash)
 
     job_id = uuid.uuid4().hex[:10]
-    job = {'q': queue.Queue(), 'thread_id': None, 'done': False}
-    with _jobs_lock:
-        _jobs[job_id] = job
+    _start_convert(job_id, dict(
+        model_type=model_type, quant_type=quant_type, platforms=platforms,
+        input_width=input_width, input_height=input_height, priority=priority,
+        build_preset=build_preset, build_options=build_options, batch_size=batch_size,
+        input_shapes=input_shapes, limits=limits, filename=filename, timestamp=timestamp,
+        upload_path=upload_path, upload_stage=upload_stage, upload_started=upload_started,
+        source_hash=source_hash,
+        content_key=content_key))
+    return jsonify({'started': True, 'job_id': job_id, 'platforms': platforms})
+
+
+def _start_convert(job_id, params, resumed=False):
+    """
+    提交转换任务：共享导出 → 各平台构建。/api/convert 与服务重启后恢复排队任务共用；
+    params 写入任务存储（须可 JSON 序列化），resumed=True 时沿用存储中已有的记录。
+    """
+    model_type, quant_type, platforms = params['model_type'], params['quant_type'], params['platforms']
+    input_width, input_height = params['input_width'], params['input_height']
+    priority, build_preset = params['priority'], params['build_preset']
+    build_options, batch_size = params['build_options'], params['batch_size']
+    input_shapes, limits = params['input_shapes'], params['limits']
+    filename, timestamp = params['filename'], params['timestamp']
+    upload_path, upload_stage = params['upload_path'], params['upload_stage']
+
+    model_name = os.path.splitext(filename)[0]
+    do_quant   = (quant_type == 'i8')
+    outputs = {p: f"{model_name}_{model_type}_{p}_{quant_type}_{timestamp}.rknn" for p in platforms}
+
+    # ETA 预测特征：参数量先由文件大小估算，静态预估完成后修正
+    calib_images = 0
+    if do_quant:
+        dataset_path = _resolve_dataset(os.path.abspath(app.config['CALIBRATION_FOLDER']),
+                                        MODEL_REGISTRY[model_type]['calibration_subdir'])
+        calib_images = _count_lines(dataset_path) if dataset_path else 0
+    eta_features = {'model_type': model_type, 'quant_type': 'i8' if calib_images else 'fp',
+                    'source_ext': os.path.splitext(filename)[1].lower(),
+                    'params_m': params_from_file(upload_path),
+                    'input_h': input_height, 'input_w': input_width, 'batch_size': batch_size,
+                    'calib_images': calib_images}
+    eta_plan = _eta_history.plan(eta_features, platforms)
+
+    job = _new_job(job_id, 'convert', params, platforms, resumed)
+    job['eta'] = EtaTracker(eta_plan) if eta_plan else None
+    job['content_key'] = params.get('content_key')
+    if resumed:
+        _job_put(job, 'log', '↻ 服务重启后恢复排队任务')
+    _job_put(job, 'stage_metrics', dict(upload_stage, platform=None))
+    _put_eta(job)
+
+    state = {'artifact': None, 'export': None, 'builds': {}, 'submitted': False}
+    state_lock = threading.Lock()
+    common = dict(
+        model_type=model_type,
+        input_size=(input_height, input_width),
+        input_shapes=input_shapes,
+        cache_dir=os.path.abspath(app.config['CACHE_FOLDER']),
+        cache_max_bytes=app.config['CACHE_MAX_BYTES'],
+    )
 
-    def _run():
-        job['thread_id'] = threading.current_thread().ident
-        job['q'].put(('progress', 5))
-        job['q'].put(('log', f'▶ 开始转换：{filename} → {output_filename}'))
-        try:
-            converter = UniversalConverter(verbose=True)
-            success, message, onnx_out = converter.convert(
-                model_type=model_type,
-                input_path=upload_path,
-                platform=platform,
-                do_quant=do_quant,
-                calibration_dir=app.config['CALIBRATION_FOLDER'],
-                output_path=output_path,
-                input_size=(input_height, input_width),
+    def _tag(platform, text):
+        return f'[{platform}] {text}' if len(platforms) > 1 else text
+
+    def _build_event(platform):
+        def _on_event(kind, data):
+            if kind == 'logs':
+                _job_put(job, 'logs', [_tag(platform, line) for line in data])
+                _push_progress(job, data, platform if len(platforms) > 1 else None)
+            elif kind == 'queue':
+                _job_put(job, 'queue', dict(data, platform=platform))
+            elif kind == 'started':
+                _job_put(job, 'log', _tag(platform, f'▶ 开始构建 {outputs[platform]}（工作进程 {data["pid"]}）'))
+            elif kind == 'stage':
+                _job_put(job, 'stage', {'platform': platform, 'stage': data})
+                if job['eta']:
+                    job['eta'].on_stage(platform, data)
+                    _put_eta(job)
+            elif kind == 'stage_metrics':
+                _job_put(job, 'stage_metrics', dict(data, platform=platform))
+                if job['eta']:
+                    job['eta'].on_metrics(platform, data)
+        return _on_event
+
+    def _build_done(platform):
+        def _on_done(result):
+            if _job_stopped(job, result, platform):
+                _remove_outputs(os.path.join(app.config['OUTPUT_FOLDER'], outputs[platform]))
+            with state_lock:
+                state['builds'][platform] = result
+            if job['eta']:
+                job['eta'].finish(platform)
+            if len(platforms) > 1:
+                _job_put(job, 'platform_progress', {
+                    'platform': platform, 'progress': 100 if result.get('success') else 0,
+                    'success': bool(result.get('success')), 'cached': result.get('cached', False)})
+            _maybe_finish()
+        return _on_done
+
+    def _submit_builds(artifact):
+        with state_lock:
+            if state['submitted'] or job.get('cancelled'):
+                return
+            state['submitted'] = True
+            state['artifact'] = artifact
+        for p in platforms:
+            _executor.submit(
+                f'{job_id}:{p}', 'converter:run_build_job',
+                dict(common, artifact=artifact, platform=p, do_quant=do_quant,
+                     build_options=build_options, batch_size=batch_size,
+                     calibration_dir=os.path.abspath(app.config['CALIBRATION_FOLDER']),
+                     output_path=os.path.abspath(os.path.join(app.config['OUTPUT_FOLDER'], outputs[p]))),
+                on_event=_bind_job(job, _build_event(p)),
+                on_done=_bind_job(job, _build_done(p)),
+                priority=priority + 1,    # 已开始的任务的构建优先于其他排队任务的导出
             )
-            if success:
-                # rknnopt 路径不产生 ONNX，补充导出供 x86 模拟推理使用
-                if not onnx_out and upload_path.lower().endswith(('.pt', '.pth')):
-                    job['q'].put(('log', '▶ 补充导出 ONNX（x86 模拟推理用）...'))
-                    _ok, _msg, _onnx = pt_to_onnx(
-                        pt_path=upload_path,
-                        input_size=(input_height, input_width),
-                        tmp_dir=app.config['OUTPUT_FOLDER'],
-                    )
-                    if _ok:
-                        onnx_out = _onnx
-                        job['q'].put(('log', f'✔ ONNX 已生成：{_onnx}'))
-                    else:
-                        job['q'].put(('log', f'⚠ ONNX 生成失败（{_msg}），x86 推理不可用'))
-                cfg = MODEL_REGISTRY[model_type]
+
+    def _on_export_event(kind, data):
+        if kind == 'logs':
+            _job_put(job, 'logs', data)
+            if not state['submitted']:
+                _push_progress(job, data)
+        elif kind == 'queue':
+            _job_put(job, 'queue', data)
+        elif kind == 'started':
+            _job_running(job)
+            _job_put(job, 'progress', 5)
+            _job_put(job, 'log', f'▶ 开始转换：{filename} → {", ".join(platforms)}（工作进程 {data["pid"]}）')
+        elif kind == 'stage':
+            _job_put(job, 'stage', {'platform': None, 'stage': data})
+            if job['eta']:
+                job['eta'].on_stage('export', data)
+                _put_eta(job)
+        elif kind == 'stage_metrics':
+            _job_put(job, 'stage_metrics', dict(data, platform=None))
+            if job['eta']:
+                job['eta'].on_metrics('export', data)
+        elif kind == 'artifact':
+            _job_put(job, 'log', '▶ 导出完成，开始构建：' + ', '.join(platforms))
+            _refine_eta(data.get('estimate'))
+            _submit_builds(data)
+
+    def _refine_eta(report):
+        """静态预估给出实际参数量后重新预测"""
+        if not report or report.get('params_m') is None:
+            return
+        eta_features['params_m'] = report['params_m']
+        plan = _eta_history.plan(eta_features, platforms)
+        if plan and job['eta']:
+            job['eta'].update_plan(plan)
+            _put_eta(job)
+
+    def _on_export_done(result):
+        if _job_stopped(job, result) == 'timeout':
+            _executor.cancel(job_id, 'timeout', '导出阶段超时，已终止同批构建')
+        if job['eta']:
+            job['eta'].finish('export')
+        with state_lock:
+            state['export'] = result
+        _maybe_finish()
+
+    def _maybe_finish():
+        with state_lock:
+            export = state['export']
+            if export is None:
+                return
+            if state['submitted'] and len(state['builds']) < len(platforms):
+                return
+            if state.get('finished'):
+                return
+            state['finished'] = True
+            builds = dict(state['builds'])
+        try:
+            _finish(export, builds)
+        finally:
+            # 上传文件可能就是构建输入 / 模拟推理 ONNX（.onnx 上传），各平台构建结束后才删除
+            artifact = export.get('artifact') or state['artifact'] or {}
+            for t in artifact.get('tmp', []) + [upload_path]:
+                try: os.remove(t)
+                except: pass
+            job['done'] = True
+
+    def _finish(export, builds):
+        if not builds:
+            _job_put(job, 'done', {'success': False, 'message': export.get('message', ''),
+                                   'status': _done_status(job, [export])})
+            return
+        artifact = export.get('artifact') or {}
+        sim_onnx = artifact.get('onnx', '') if export.get('success') else ''
+        cfg = MODEL_REGISTRY[model_type]
+        results = []
+        for p in platforms:
+            res = builds.get(p, {})
+            # 上传与导出阶段由各平台共享，构建阶段各平台独立
+            stages = _merge_stages(upload_stage, params.get('upload_started'), export, res)
+            entry = {'platform': p, 'success': bool(res.get('success')),
+                     'cached': res.get('cached', False), 'message': res.get('message', ''),
+                     'status': res.get('status'), 'stages': stages}
+            _put_stages(job, stages, p if len(platforms) > 1 else None)
+            if entry['success'] and not entry['cached']:
+                estimate = artifact.get('estimate') or {}
+                _eta_history.add(dict(eta_features, platform=p,
+                                      params_m=estimate.get('params_m', eta_features['params_m'])),
+                                 stages)
+            if entry['success']:
+                output_path = os.path.join(app.config['OUTPUT_FOLDER'], outputs[p])
+                onnx_out = ''
+                if sim_onnx and os.path.exists(sim_onnx):
+                    onnx_out = os.path.splitext(output_path)[0] + '.onnx'
+                    try:
+                        shutil.copy2(sim_onnx, onnx_out)
+                    except Exception:
+                        onnx_out = ''
+                if not onnx_out:
+                    _job_put(job, 'log', _tag(p, '⚠ 未生成 ONNX，x86 模拟推理不可用'))
+                qcfg = os.path.splitext(output_path)[0] + '.quantization.cfg'
+                shapes = res.get('input_shapes') or []
                 meta = {
                     'model_type': model_type,
                     'input_w': input_width, 'input_h': input_height,
-                    'platform': platform, 'quant_type': quant_type,
+                    'platform': p, 'quant_type': quant_type,
                     'class_names': [], 'onnx_path': onnx_out,
                     'mean_values': cfg['mean_values'], 'std_values': cfg['std_values'],
+                    'cache_hit': entry['cached'],
+                    'group_id': job_id, 'platforms': platforms,
+                    'build_preset': build_preset,
+                    'build_options': res.get('build_options', {}),
+                    'quantization_cfg': qcfg if os.path.exists(qcfg) else '',
+                    'batch_size': res.get('batch_size', 1),
+                    'input_shapes': [[w, h] for h, w in shapes],   # 多输入尺寸，[[W, H], ...]
+                    'output_layout': artifact.get('layout'),     # 用户 ONNX 改写后的分头输出布局
+                    'op_report': res.get('op_report'),           # 算子放置 / CPU 回退摘要，明细见 .ops.json
+                    'estimate': artifact.get('estimate'),        # 构建前静态预估（model_estimate）
+                    'stages': stages,                            # 各阶段耗时 / 资源统计（stage_metrics）
                 }
-                meta_path = output_path + '.meta.json'
                 try:
-                    with open(meta_path, 'w', encoding='utf-8') as mf:
+                    with open(output_path + '.meta.json', 'w', encoding='utf-8') as mf:
                         json.dump(meta, mf, ensure_ascii=False, indent=2)
                 except Exception:
                     pass
-                job['q'].put(('progress', 100))
-                job['q'].put(('done', {
-                    'success': True, 'message': message,
-                    'output_file': output_filename,
-                    'download_url': f'/api/download/{output_filename}'
-                }))
-            else:
-                job['q'].put(('done', {'success': False, 'message': message}))
-        except Exception as e:
-            job['q'].put(('done', {'success': False, 'message': f'转换失败: {e}'}))
+                entry.update(output_file=outputs[p], download_url=f'/api/download/{outputs[p]}',
+                             build_options=meta['build_options'], batch_size=meta['batch_size'],
+                             input_shapes=meta['input_shapes'], op_report=meta['op_report'])
+            results.append(entry)
+
+        ok_results = [r for r in results if r['success']]
+        message = export.get('message', '')
+        for r in results:
+            message += '\n' + _tag(r['platform'], r['message'])
+        done = {'success': bool(ok_results), 'message': message.strip(), 'outputs': results,
+                'group_id': job_id, 'cached': bool(ok_results) and all(r['cached'] for r in ok_results),
+                'status': _done_status(job, results)}
+        if ok_results:
+            # 单平台字段保持兼容
+            done.update(output_file=ok_results[0]['output_file'],
+                        download_url=ok_results[0]['download_url'])
+            _job_put(job, 'progress', 100)
+        _job_put(job, 'done', done)
+
+    _executor.submit(
+        f'{job_id}:export', 'converter:run_export_job',
+        dict(common, input_path=os.path.abspath(upload_path), source_hash=params.get('source_hash'),
+             estimate={'platforms': platforms, 'do_quant': do_quant, 'limits': limits}),
+        on_event=_bind_job(job, _on_export_event), on_done=_bind_job(job, _on_export_done),
+        priority=priority,
+    )
+
+
+def _parse_shapes(text):
+    """'640x640,480x640' → [[H, W], ...]（每项 WxH）"""
+    shapes = []
+    for item in (text or '').replace(';', ',').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        try:
+            w, h = (int(v) for v in item.split('x'))
+        except ValueError:
+            raise ValueError(f'输入尺寸格式应为 WxH，收到 {item!r}')
+        if w <= 0 or h <= 0 or w % 32 or h % 32:
+            raise ValueError(f'输入尺寸须为 32 的正整数倍，收到 {item!r}')
+        shapes.append([h, w])
+    return shapes
+
+
+def _parse_limits():
+    """构建前静态预估上限：表单 max_gmacs / max_params_m，缺省取 app.config"""
+    limits = {}
+    for field, key in (('max_gmacs', 'ESTIMATE_MAX_GMACS'), ('max_params_m', 'ESTIMATE_MAX_PARAMS_M')):
+        raw = request.form.get(field, '')
+        try:
+            value = float(raw) if raw.strip() else float(app.config[key])
+        except ValueError:
+            raise ValueError(f'{field} 须为数字，收到 {raw!r}')
+        if value < 0:
+            raise ValueError(f'{field} 不能为负数')
+        limits[field] = value
+    return limits
+
+
+def _form_list(name, default, cast=str):
+    """表单列表参数：可重复提交或逗号分隔"""
+    values = []
+    for raw in request.form.getlist(name):
+        values.extend(v.strip() for v in raw.split(',') if v.strip())
+    return [cast(v) for v in values] if values else list(default)
+
+
+ESTIMATE_TIMEOUT = 600   # 秒，PT 需要先导出 ONNX
+
+
+@app.route('/api/estimate', methods=['POST'])
+def estimate_model():
+    """
+    构建前静态预估：逐层 MACs / 参数 / 激活、各平台 NPU 不友好算子与预估延迟，
+    以及候选输入尺寸（sizes，WxH 逗号分隔）的相对延迟排名。
+    在工作进程中执行并同步返回；PT 导出的 ONNX 进入转换缓存，随后的转换可直接复用。
+    """
+    if 'model_file' not in request.files:
+        return jsonify({'success': False, 'message': '未上传模型文件'}), 400
+    file = request.files['model_file']
+    if not file.filename or not allowed_file(file.filename):
+        return jsonify({'success': False, 'message': '只支持 .pt / .pth / .onnx 文件'}), 400
+    model_type = request.form.get('model_type', 'yolov8_det')
+    if model_type not in MODEL_REGISTRY:
+        return jsonify({'success': False, 'message': f'未知模型类型：{model_type}'}), 400
+    ok, msg = validate_file_ext(model_type, file.filename)
+    if not ok:
+        return jsonify({'success': False, 'message': msg}), 400
+    platforms = [p.lower() for p in _form_list('platform', ['rk3576'])]
+    unknown = [p for p in platforms if p not in SUPPORTED_PLATFORMS]
+    if unknown:
+        return jsonify({'success': False, 'message': f'不支持的平台：{", ".join(unknown)}'}), 400
+    try:
+        input_size = (int(request.form.get('input_height', 640)),
+                      int(request.form.get('input_width', 640)))
+        sizes = _parse_shapes(request.form.get('sizes', ''))
+        limits = _parse_limits()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    do_quant = request.form.get('quant_type', 'i8') == 'i8'
+
+    upload_path = os.path.join(app.config['UPLOAD_FOLDER'],
+                               f"_estimate_{uuid.uuid4().hex[:8]}_{secure_filename(file.filename)}")
+    _save_upload(file, upload_path)
+    finished = threading.Event()
+    holder = {}
+
+    def _on_done(result):
+        try: os.remove(upload_path)
+        except: pass
+        holder['result'] = result
+        finished.set()
+
+    exec_id = f'estimate:{uuid.uuid4().hex[:10]}'
+    _executor.submit(
+        exec_id, 'model_estimate:run_estimate_job',
+        dict(model_type=model_type, input_path=os.path.abspath(upload_path),
+             input_size=input_size, platforms=platforms, sizes=sizes, do_quant=do_quant,
+             cache_dir=os.path.abspath(app.config['CACHE_FOLDER']),
+             cache_max_bytes=app.config['CACHE_MAX_BYTES']),
+        on_event=lambda kind, data: None, on_done=_on_done,
+        priority=int(request.form.get('priority', 1)),
+    )
+    if not finished.wait(ESTIMATE_TIMEOUT):
+        _executor.cancel(exec_id, 'timeout')
+        return jsonify({'success': False, 'message': f'预估超时（{ESTIMATE_TIMEOUT}s）'}), 504
+    result = holder['result']
+    if not result.get('success'):
+        return jsonify({'success': False, 'message': result.get('message', '预估失败')}), 500
+    within, reason = check_limits(result['report'], **limits)
+    return jsonify({'success': True, 'message': result['message'], 'report': result['report'],
+                    'within_limits': within, 'limit_message': reason})
+
+
+@app.route('/api/sweep', methods=['POST'])
+def sweep_quantization():
+    """
+    INT8 量化参数搜索：同一模型在 algorithm × method × 校准图片数 网格上分别构建，
+    按留出图片上与 FP16 的输出余弦相似度排名，保留最优 .rknn。
+    日志 / 进度 / 结果通过 /api/convert/log/<job_id> 推送（每个候选完成时推送 sweep_result）。
+    """
+    if 'model_file' not in request.files:
+        return jsonify({'success': False, 'message': '没有上传文件'}), 400
+    file = request.files['model_file']
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'success': False, 'message': '只支持 .pt / .pth / .onnx 文件'}), 400
+
+    model_type   = request.form.get('model_type', 'yolov8_det')
+    platform     = request.form.get('platform', 'rk3576').strip().lower()
+    input_width  = int(request.form.get('input_width', 640))
+    input_height = int(request.form.get('input_height', 640))
+    priority     = int(request.form.get('priority', 0))
+    if model_type not in MODEL_REGISTRY:
+        return jsonify({'success': False, 'message': f'未知模型类型：{model_type}'}), 400
+    if platform not in SUPPORTED_PLATFORMS:
+        return jsonify({'success': False, 'message': f'不支持的平台：{platform}'}), 400
+    try:
+        algorithms  = _form_list('algorithms', DEFAULT_SWEEP_GRID['quantized_algorithm'])
+        methods     = _form_list('methods', DEFAULT_SWEEP_GRID['quantized_method'])
+        calib_sizes = _form_list('calib_sizes', DEFAULT_SWEEP_GRID['calib_size'], int)
+        holdout     = int(request.form.get('holdout', DEFAULT_HOLDOUT))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'参数错误：{e}'}), 400
+    for name, values in (('quantized_algorithm', algorithms), ('quantized_method', methods)):
+        bad = [v for v in values if v not in BUILD_OPTION_SPECS[name]['choices']]
+        if bad:
+            return jsonify({'success': False, 'message': f'{name} 不支持：{", ".join(bad)}'}), 400
+    ok, msg, build_options = resolve_build_options(
+        request.form.get('build_preset') or DEFAULT_BUILD_PRESET,
+        {k: request.form.get(k) for k in BUILD_OPTION_SPECS})
+    if not ok:
+        return jsonify({'success': False, 'message': msg}), 400
+    ok, msg = validate_file_ext(model_type, file.filename)
+    if not ok:
+        return jsonify({'success': False, 'message': msg}), 400
+
+    cfg = MODEL_REGISTRY[model_type]
+    dataset_path = _resolve_dataset(os.path.abspath(app.config['CALIBRATION_FOLDER']),
+                                    cfg['calibration_subdir'])
+    if not dataset_path:
+        return jsonify({'success': False,
+                        'message': f"未找到 {cfg['calibration_subdir']} 校准数据集，无法进行量化搜索"}), 400
+
+    job_id = uuid.uuid4().hex[:10]
+    work_dir = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], f'sweep_{job_id}'))
+    try:
+        subsets, holdout_images = split_dataset(dataset_path, calib_sizes, holdout, work_dir)
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return jsonify({'success': False, 'message': f'划分校准集失败：{e}'}), 400
+    candidates = expand_grid(algorithms, methods, sorted(subsets))
+
+    filename  = secure_filename(file.filename)
+    timestamp = int(time.time())
+    upload_path = os.path.join(work_dir, filename)
+    upload_stage, source_hash = _save_upload(file, upload_path)
+    upload_started = time.time() - upload_stage['wall_s']
+    model_name  = os.path.splitext(filename)[0]
+    output_file = f"{model_name}_{model_type}_{platform}_i8_sweep_{timestamp}.rknn"
+    input_size  = (input_height, input_width)
+    reference_path = os.path.join(work_dir, 'reference.npz')
+
+    job = _new_job(job_id, 'sweep', dict(
+        model_type=model_type, platform=platform, filename=filename, algorithms=algorithms,
+        methods=methods, calib_sizes=calib_sizes, holdout=holdout, build_options=build_options))
+    state = {'export': None, 'artifact': None, 'results': [], 'finished': False,
+             'expected': None}
+    state_lock = threading.Lock()
+
+    def _log_event(prefix):
+        def _on_event(kind, data):
+            if kind == 'logs':
+                _job_put(job, 'logs', [f'{prefix}{line}' for line in data] if prefix else data)
+            elif kind == 'queue':
+                _job_put(job, 'queue', data)
+            elif kind == 'stage_metrics':
+                _job_put(job, 'stage_metrics', dict(data, platform=prefix.strip(' []') or None))
+        return _on_event
+
+    def _candidate_done(result):
+        _job_stopped(job, result)
+        with state_lock:
+            state['results'].append(result)
+            n = len(state['results'])
+        _job_put(job, 'sweep_result', result)
+        _job_put(job, 'progress', 30 + int(65 * n / len(candidates)))
+        _maybe_finish()
+
+    def _reference_done(result):
+        _job_stopped(job, result)
+        _job_put(job, 'log', ('✅ ' if result.get('success') else '❌ ') + result.get('message', ''))
+        if not result.get('success') or job.get('cancelled'):
+            with state_lock:
+                state['expected'] = 0
+                state['error'] = result.get('message', '')
+            _maybe_finish()
+            return
+        _job_put(job, 'progress', 30)
+        with state_lock:
+            state['expected'] = len(candidates)
+            artifact = state['artifact']
+        for i, c in enumerate(candidates):
+            _executor.submit(
+                f'{job_id}:c{i}', 'quant_sweep:run_candidate_job',
+                dict(model_type=model_type, artifact=artifact, platform=platform,
+                     input_size=input_size, config=c, dataset_path=subsets[c['calib_size']],
+                     holdout_images=holdout_images, reference_path=reference_path,
+                     output_path=os.path.join(work_dir, f'candidate_{i}.rknn'),
+                     build_options=build_options),
+                on_event=_bind_job(job, _log_event(f'[{config_label(c)}] ')),
+                on_done=_bind_job(job, _candidate_done),
+                priority=priority + 1,
+            )
+
+    def _on_export_event(kind, data):
+        if kind == 'artifact':
+            if job.get('cancelled'):
+                return
+            with state_lock:
+                state['artifact'] = data
+            _job_put(job, 'progress', 20)
+            _job_put(job, 'log', f'▶ 导出完成，生成 FP16 参考输出（留出 {len(holdout_images)} 张）')
+            _executor.submit(
+                f'{job_id}:ref', 'quant_sweep:run_reference_job',
+                dict(model_type=model_type, artifact=data, platform=platform,
+                     input_size=input_size, holdout_images=holdout_images,
+                     reference_path=reference_path),
+                on_event=_bind_job(job, _log_event('[FP16] ')),
+                on_done=_bind_job(job, _reference_done), priority=priority + 1,
+            )
+        elif kind == 'started':
+            _job_running(job)
+            _job_put(job, 'progress', 5)
+            _job_put(job, 'log', f'▶ 量化搜索：{filename} → {platform}，{len(candidates)} 个候选')
+        else:
+            _log_event('')(kind, data)
+
+    def _on_export_done(result):
+        if _job_stopped(job, result) == 'timeout':
+            _executor.cancel(job_id, 'timeout', '导出阶段超时，已终止量化搜索')
+        with state_lock:
+            state['export'] = result
+            if state['artifact'] is None:
+                state['expected'] = 0
+        _maybe_finish()
+
+    def _maybe_finish():
+        with state_lock:
+            if state['finished'] or state['export'] is None or state['expected'] is None:
+                return
+            if len(state['results']) < state['expected']:
+                return
+            state['finished'] = True
+        try:
+            _finish()
         finally:
+            for t in (state['export'].get('artifact') or state['artifact'] or {}).get('tmp', []):
+                try: os.remove(t)
+                except: pass
+            shutil.rmtree(work_dir, ignore_errors=True)
             job['done'] = True
-            if os.path.exists(upload_path):
-                try: os.remove(upload_path)
+
+    def _finish():
+        export = state['export']
+        board = rank_results(state['results'])
+        if not board or not board[0].get('success'):
+            message = state.get('error') or export.get('message', '') if not board else \
+                '\n'.join(r.get('message', '') for r in board)
+            _job_put(job, 'done', {'success': False, 'message': message or '量化搜索失败',
+                                   'scoreboard': board,
+                                   'status': _done_status(job, [export] + board)})
+            return
+        best = board[0]
+        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_file)
+        shutil.copy2(best['output_path'], output_path)
+        artifact = export.get('artifact') or {}
+        onnx_out = ''
+        if export.get('success') and artifact.get('onnx') and os.path.exists(artifact['onnx']):
+            onnx_out = os.path.splitext(output_path)[0] + '.onnx'
+            try:
+                shutil.copy2(artifact['onnx'], onnx_out)
+            except Exception:
+                onnx_out = ''
+        for r in board:
+            r.pop('output_path', None)
+        meta = {
+            'model_type': model_type,
+            'input_w': input_width, 'input_h': input_height,
+            'platform': platform, 'quant_type': 'i8',
+            'class_names': [], 'onnx_path': onnx_out,
+            'mean_values': cfg['mean_values'], 'std_values': cfg['std_values'],
+            'build_preset': 'sweep', 'build_options': best['build_options'],
+            'output_layout': artifact.get('layout'),
+            'sweep': {'best': best['config'], 'holdout': len(holdout_images), 'scoreboard': board},
+            'stages': _merge_stages(upload_stage, upload_started, export, best),
+        }
+        with open(output_path + '.meta.json', 'w', encoding='utf-8') as mf:
+            json.dump(meta, mf, ensure_ascii=False, indent=2)
+        lines = [f"{'#' + str(r['rank']) if r.get('rank') else '✗'} {config_label(r['config'])}: "
+                 + (f"cos={r['cosine']:.6f} min={r['min_cosine']:.6f} "
+                    f"{r['size'] / 1e6:.2f}MB {r['build_time']:.1f}s" if r.get('success')
+                    else r.get('message', ''))
+                 for r in board]
+        _put_stages(job, meta['stages'])
+        _job_put(job, 'progress', 100)
+        _job_put(job, 'done', {
+            'success': True,
+            'message': f"最优配置：{config_label(best['config'])}\n" + '\n'.join(lines),
+            'scoreboard': board, 'best': best['config'],
+            'output_file': output_file, 'download_url': f'/api/download/{output_file}',
+        })
+
+    _executor.submit(
+        f'{job_id}:export', 'converter:run_export_job',
+        dict(model_type=model_type, input_path=upload_path, input_size=input_size,
+             source_hash=source_hash, cache_dir=os.path.abspath(app.config['CACHE_FOLDER']),
+             cache_max_bytes=app.config['CACHE_MAX_BYTES']),
+        on_event=_bind_job(job, _on_export_event), on_done=_bind_job(job, _on_export_done),
+        priority=priority,
+    )
+    return jsonify({'started': True, 'job_id': job_id, 'candidates': len(candidates)})
+
+
+_HYBRID_ROUND = re.compile(r'第 (\d+) 轮')
+
+@app.route('/api/hybrid', methods=['POST'])
+def hybrid_quantization():
+    """
+    自动混合量化：以已转换模型的配套 ONNX 重新量化，逐层精度分析后把误差大的层提升为
+    float16，迭代到输出余弦相似度达到 target_cosine。结果另存为 <原文件名>_hybrid.rknn。
+    日志与结果通过 /api/convert/log/<job_id> 推送。
+    """
+    rknn_filename = secure_filename(request.form.get('rknn_filename', ''))
+    if not rknn_filename or not rknn_filename.endswith('.rknn'):
+        return jsonify({'success': False, 'message': '未指定 RKNN 文件名'}), 400
+    rknn_path = os.path.join(app.config['OUTPUT_FOLDER'], rknn_filename)
+    meta_path = rknn_path + '.meta.json'
+    if not os.path.exists(rknn_path) or not os.path.exists(meta_path):
+        return jsonify({'success': False, 'message': 'RKNN 文件或元数据不存在'}), 404
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    onnx_path = meta.get('onnx_path', '')
+    if not onnx_path or not os.path.exists(onnx_path):
+        return jsonify({'success': False,
+                        'message': 'ONNX 文件不存在，请重新转换以生成配套 ONNX'}), 404
+
+    model_type = meta.get('model_type', 'yolov8_det')
+    cfg = MODEL_REGISTRY.get(model_type)
+    if cfg is None:
+        return jsonify({'success': False, 'message': f'未知模型类型：{model_type}'}), 400
+    dataset_path = _resolve_dataset(os.path.abspath(app.config['CALIBRATION_FOLDER']),
+                                    cfg['calibration_subdir'])
+    if not dataset_path:
+        return jsonify({'success': False,
+                        'message': f"未找到 {cfg['calibration_subdir']} 校准数据集，无法量化"}), 400
+    try:
+        target_cosine   = float(request.form.get('target_cosine', DEFAULT_TARGET_COSINE))
+        layer_threshold = float(request.form.get('layer_threshold', DEFAULT_LAYER_THRESHOLD))
+        max_iters       = int(request.form.get('max_iters', DEFAULT_MAX_ITERS))
+        layers_per_iter = int(request.form.get('layers_per_iter', DEFAULT_LAYERS_PER_ITER))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'参数错误：{e}'}), 400
+
+    job_id = uuid.uuid4().hex[:10]
+    # 评估图片：上传的测试图，未上传时取校准集第一张
+    image_path = ''
+    if 'image' in request.files and request.files['image'].filename:
+        image_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'],
+                                                  f'hybrid_{job_id}.jpg'))
+        request.files['image'].save(image_path)
+    else:
+        with open(dataset_path, 'r', encoding='utf-8') as f:
+            image_path = next((l.strip() for l in f if l.strip()), '')
+
+    output_file = os.path.splitext(rknn_filename)[0] + '_hybrid.rknn'
+    output_path = os.path.abspath(os.path.join(app.config['OUTPUT_FOLDER'], output_file))
+    job = _new_job(job_id, 'hybrid', dict(
+        rknn_filename=rknn_filename, target_cosine=target_cosine, layer_threshold=layer_threshold,
+        max_iters=max_iters, layers_per_iter=layers_per_iter))
+
+    def _on_event(kind, data):
+        if kind == 'logs':
+            _job_put(job, 'logs', data)
+            rounds = [m.group(1) for m in map(_HYBRID_ROUND.search, data) if m]
+            if rounds:
+                _job_put(job, 'progress', min(95, 10 + 85 * int(rounds[-1]) // (max_iters + 1)))
+        elif kind == 'queue':
+            _job_put(job, 'queue', data)
+        elif kind == 'started':
+            _job_running(job)
+            _job_put(job, 'progress', 5)
+            _job_put(job, 'log', f'▶ 混合量化：{rknn_filename}（目标余弦 {target_cosine}）')
+        elif kind == 'stage_metrics':
+            _job_put(job, 'stage_metrics', dict(data, platform=None))
+
+    def _on_done(result):
+        try:
+            if image_path.startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
+                try: os.remove(image_path)
                 except: pass
+            if _job_stopped(job, result):
+                _remove_outputs(output_path)
+            if not result.get('success'):
+                _job_put(job, 'done', {'success': False, 'message': result.get('message', ''),
+                                       'promoted': result.get('promoted', []),
+                                       'status': _done_status(job, [result])})
+                return
+            onnx_out = os.path.splitext(output_path)[0] + '.onnx'
+            try:
+                shutil.copy2(onnx_path, onnx_out)
+            except Exception:
+                onnx_out = ''
+            with open(os.path.splitext(output_path)[0] + '.quantization.cfg', 'w',
+                      encoding='utf-8') as f:
+                f.write(result.get('cfg', ''))
+            # 混合量化以配套 ONNX（标准单输出）按主输入尺寸、batch 1 重新构建
+            new_meta = dict(meta, quant_type='i8', onnx_path=onnx_out, cache_hit=False,
+                            batch_size=1, input_shapes=[], output_layout=None, op_report=None,
+                            build_preset='hybrid', build_options=result.get('build_options', {}),
+                            hybrid={'source': rknn_filename, 'target_cosine': target_cosine,
+                                    'layer_threshold': layer_threshold,
+                                    'output_cosine': result['output_cosine'],
+                                    'target_met': result['target_met'],
+                                    'promoted': result['promoted'],
+                                    'iterations': result['iterations']},
+                            stages=result.get('stages', []))
+            new_meta.pop('group_id', None)
+            with open(output_path + '.meta.json', 'w', encoding='utf-8') as mf:
+                json.dump(new_meta, mf, ensure_ascii=False, indent=2)
+            _put_stages(job, new_meta['stages'])
+            _job_put(job, 'progress', 100)
+            _job_put(job, 'done', {
+                'success': True, 'message': result['message'],
+                'output_cosine': result['output_cosine'], 'target_met': result['target_met'],
+                'promoted': result['promoted'], 'iterations': result['iterations'],
+                'output_file': output_file, 'download_url': f'/api/download/{output_file}',
+            })
+        finally:
+            job['done'] = True
 
-    t = threading.Thread(target=_run, daemon=True)
-    t.start()
-    return jsonify({'started': True, 'job_id': job_id})
+    _executor.submit(
+        f'{job_id}:hybrid', 'hybrid_quant:run_hybrid_job',
+        dict(model_type=model_type, onnx_path=os.path.abspath(onnx_path),
+             platform=meta.get('platform', 'rk3576'),
+             input_size=(int(meta.get('input_h', 640)), int(meta.get('input_w', 640))),
+             dataset_path=dataset_path, image_path=image_path, output_path=output_path,
+             target_cosine=target_cosine, layer_threshold=layer_threshold,
+             max_iters=max_iters, layers_per_iter=layers_per_iter,
+             build_options=meta.get('build_options')),
+        on_event=_bind_job(job, _on_event), on_done=_bind_job(job, _on_done),
+    )
+    return jsonify({'started': True, 'job_id': job_id, 'output_file': output_file})
+
+
+@app.route('/api/convert/cancel/<job_id>', methods=['POST'])
+def cancel_job(job_id):
+    """取消转换 / 量化搜索 / 混合量化任务：排队的子任务移出队列，运行中的终止工作进程"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    if job['done']:
+        return jsonify({'success': False, 'message': '任务已结束'}), 400
+    if not job.get('cancelled'):
+        job['cancelled'] = True
+        _job_put(job, 'cancelled', {'message': '任务已取消，正在终止工作进程并清理临时文件'})
+    n = _executor.cancel(job_id)
+    return jsonify({'success': True, 'message': f'已取消 {n} 个子任务'})
+
+
+@app.route('/api/queue', methods=['GET'])
+def queue_status():
+    """转换队列状态：运行中 / 排队任务数及各工作进程"""
+    return jsonify({'success': True, **_executor.stats()})
+
+
+@app.route('/api/eta', methods=['GET'])
+def eta_estimate():
+    """
+    按阶段耗时历史预测转换耗时（容量规划用）：
+    model_type / platform（逗号分隔）/ quant_type / source_ext / params_m / input_width /
+    input_height / batch_size / calib_images
+    """
+    args = request.args
+    platforms = [p.strip().lower() for p in args.get('platform', 'rk3576').split(',') if p.strip()]
+    try:
+        features = {'model_type': args.get('model_type', 'yolov8_det'),
+                    'quant_type': args.get('quant_type', 'i8'),
+                    'source_ext': '.' + args.get('source_ext', 'onnx').lstrip('.').lower(),
+                    'params_m': float(args.get('params_m', 0)) or None,
+                    'input_h': int(args.get('input_height', 640)),
+                    'input_w': int(args.get('input_width', 640)),
+                    'batch_size': int(args.get('batch_size', 1)),
+                    'calib_images': int(args.get('calib_images', 0))}
+    except ValueError as e:
+        return jsonify({'success': False, 'message': f'参数错误：{e}'}), 400
+    plan = _eta_history.plan(features, platforms)
+    history = _eta_history.stats()
+    if not plan:
+        return jsonify({'success': False, 'message': '没有可参考的历史记录', 'history': history})
+    return jsonify({'success': True, 'total_s': plan_seconds(plan), 'export': plan['export'],
+                    'builds': plan['builds'], 'samples': plan['samples'], 'history': history})
+
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """任务存储中最近的任务（可按 status 过滤）"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 500)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'limit 须为整数'}), 400
+    return jsonify({'success': True, 'jobs': _store.list(request.args.get('status'), limit),
+                    'stats': _store.stats()})
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """单个任务的状态、参数、阶段统计与结果"""
+    record = _store.get(job_id)
+    if not record:
+        return jsonify({'success': False, 'message': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': record})
+
+
+def _sse(event_id, event_type, data):
+    payload = json.dumps({'type': event_type, 'data': data}, ensure_ascii=False, default=str)
+    return (f'id: {event_id}\n' if event_id else '') + 'data: ' + payload + '\n\n'
 
 
 @app.route('/api/convert/log/<job_id>')
 def convert_log(job_id):
-    """SSE 端点：流式推送转换日志和进度"""
+    """
+    SSE 端点：流式推送转换日志和进度。事件带单调递增 id，断线重连时按 Last-Event-ID
+    （或 ?last_event_id=）从断点续传；同一任务可被多个客户端同时订阅。
+    """
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        after = 0
     with _jobs_lock:
         job = _jobs.get(job_id)
     if not job:
-        return jsonify({'error': '任务不存在'}), 404
+        # 已从内存淘汰（或服务重启前结束）的任务：回放事件日志，缺少 done 时以任务存储中的结果补上
+        record = _store.get(job_id)
+        events = replay_file(spill_path(app.config['EVENT_LOG_FOLDER'], job_id))
+        if not any(e[1] == 'done' for e in events):
+            if not record or not record['result']:
+                return jsonify({'error': '任务不存在'}), 404
+            events.append(((events[-1][0] if events else 0) + 1, 'done', record['result']))
+        return Response(''.join(_sse(*e) for e in events if e[0] > after),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
     def generate():
+        yield 'retry: 3000\n\n'
+        last = after
         while True:
-            try:
-                event_type, data = job['q'].get(timeout=25)
-                payload = json.dumps({'type': event_type, 'data': data}, ensure_ascii=False)
-                yield 'data: ' + payload + '\n\n'
+            # 有 ETA 预测的任务按 ETA_INTERVAL 推送剩余时间，兼作心跳
+            events = job['events'].read(last, timeout=ETA_INTERVAL if job.get('eta') else 25)
+            for event_id, event_type, data in events:
+                yield _sse(event_id, event_type, data)
+                last = event_id
                 if event_type == 'done':
-                    break
-            except queue.Empty:
-                # 心跳，防止连接超时
-                yield 'data: ' + json.dumps({'type': 'ping'}) + '\n\n'
-                if job['done']:
-                    break
-        # 任务结束后稍后清理
-        def _cleanup():
-            time.sleep(60)
-            with _jobs_lock:
-                _jobs.pop(job_id, None)
-        threading.Thread(target=_cleanup, daemon=True).start()
+                    return
+            if events:
+                continue
+            if job['events'].closed or job['done']:
+                return
+            if job.get('eta'):
+                yield _sse(None, 'eta', job['eta'].snapshot())
+                continue
+            # 心跳，防止连接超时
+            yield _sse(None, 'ping', None)
 
     return Response(
         stream_with_context(generate()),
@@ -495,6 +1486,12 @@ def infer_model():
         input_h     = int(request.form.get('input_h')  or meta.get('input_h', 640))
         conf_thresh = float(request.form.get('conf_thresh', 0.25))
         iou_thresh  = float(request.form.get('iou_thresh', 0.45))
+        tiled        = request.form.get('tiled', 'false').lower() == 'true'
+        try:
+            tile_overlap = float(request.form.get('tile_overlap', 0.2))
+            check_tile_overlap(tile_overlap)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': f'tile_overlap 无效：{e}'}), 400
         class_names_raw = request.form.get('class_names', '')
         if class_names_raw.strip():
             class_names = [n.strip() for n in class_names_raw.split(',') if n.strip()]
@@ -511,6 +1508,55 @@ def infer_model():
         if img_bgr is None:
             return jsonify({'success': False, 'message': '无法解码图片，请上传 JPG/PNG/BMP'}), 400
 
+        # 多输入尺寸模型：未显式指定尺寸时按图片宽高比选择填充最少的输入尺寸
+        shapes = meta.get('input_shapes') or []
+        if shapes and not (request.form.get('input_w') or request.form.get('input_h')):
+            input_w, input_h = select_input_shape(shapes, img_bgr.shape[1], img_bgr.shape[0])
+
+        # 检测 → 分类级联：第二个模型为分类 RKNN（读取其 meta 中的输入尺寸 / batch）
+        cascade_filename = secure_filename(request.form.get('cascade_rknn_filename', ''))
+        if cascade_filename:
+            if model_type != 'yolov8_det':
+                return jsonify({'success': False, 'message': '级联分类仅支持 YOLOv8-Det 检测模型'}), 400
+            cls_path = os.path.join(app.config['OUTPUT_FOLDER'], cascade_filename)
+            if not cascade_filename.endswith('.rknn') or not os.path.exists(cls_path):
+                return jsonify({'success': False, 'message': '级联分类 RKNN 文件不存在'}), 404
+            cls_meta = {}
+            if os.path.exists(cls_path + '.meta.json'):
+                with open(cls_path + '.meta.json', 'r', encoding='utf-8') as f:
+                    cls_meta = json.load(f)
+            cls_names_raw = request.form.get('cascade_class_names', '')
+            cls_names = [n.strip() for n in cls_names_raw.split(',') if n.strip()] \
+                if cls_names_raw.strip() else (cls_meta.get('class_names') or [])
+            result_bgr, summary, detections, infer_ms = run_cascade_inference(
+                rknn_path=rknn_path,
+                img_bgr=img_bgr,
+                input_w=input_w,
+                input_h=input_h,
+                cls_rknn_path=cls_path,
+                cls_input_w=int(cls_meta.get('input_w', 224)),
+                cls_input_h=int(cls_meta.get('input_h', 224)),
+                cls_batch=int(cls_meta.get('batch_size', 1)),
+                conf_thresh=conf_thresh,
+                iou_thresh=iou_thresh,
+                class_names=class_names if class_names else None,
+                cls_class_names=cls_names if cls_names else None,
+                onnx_path=meta.get('onnx_path', ''),
+                mean_values=meta.get('mean_values'),
+                std_values=meta.get('std_values'),
+                cls_onnx_path=cls_meta.get('onnx_path', ''),
+                cls_mean_values=cls_meta.get('mean_values'),
+                cls_std_values=cls_meta.get('std_values'),
+                platform=meta.get('platform', 'rk3576'),
+            )
+            return jsonify({
+                'success': True,
+                'image_b64': img_to_base64(result_bgr),
+                'summary': summary,
+                'detections': detections,
+                'infer_ms': round(infer_ms, 1),
+            })
+
         result_bgr, summary, detections, infer_ms = run_inference(
             rknn_path=rknn_path,
             img_bgr=img_bgr,
@@ -524,6 +1570,9 @@ def infer_model():
             mean_values=meta.get('mean_values'),
             std_values=meta.get('std_values'),
             platform=meta.get('platform', 'rk3576'),
+            tiled=tiled,
+            tile_overlap=tile_overlap,
+            batch=int(meta.get('batch_size', 1)),
         )
 
         img_b64 = img_to_base64(result_bgr)
@@ -533,6 +1582,8 @@ def infer_model():
             'summary': summary,
             'detections': detections,
             'infer_ms': round(infer_ms, 1),
+            'input_w': input_w,
+            'input_h': input_h,
         })
 
     except RuntimeError as e:
@@ -628,16 +1679,18 @@ def download_file(filename):
 
 @app.route('/api/delete/<filename>', methods=['DELETE'])
 def delete_output(filename):
-    """删除单个转换输出文件（.rknn + .meta.json）"""
+    """删除单个转换输出文件（.rknn + .meta.json 及配套 .onnx / .quantization.cfg / .ops.json）"""
     try:
         output_folder = app.config['OUTPUT_FOLDER']
         file_path = os.path.join(output_folder, filename)
         if not os.path.exists(file_path):
             return jsonify({'success': False, 'message': '文件不存在'}), 404
         os.remove(file_path)
-        meta_path = file_path + '.meta.json'
-        if os.path.exists(meta_path):
-            os.remove(meta_path)
+        base = os.path.splitext(file_path)[0]
+        for extra in (file_path + '.meta.json', base + '.onnx', base + '.quantization.cfg',
+                      base + REPORT_SUFFIX):
+            if os.path.exists(extra):
+                os.remove(extra)
         return jsonify({'success': True, 'message': f'{filename} 已删除'})
     except Exception as e:
         return jsonify({'success': False, 'message': f'删除失败: {str(e)}'}), 500
@@ -650,7 +1703,7 @@ def clear_outputs():
         output_folder = app.config['OUTPUT_FOLDER']
         removed = 0
         for fname in os.listdir(output_folder):
-            if fname.endswith('.rknn') or fname.endswith('.meta.json') or fname.endswith('.onnx'):
+            if fname.endswith(('.rknn', '.meta.json', '.onnx', '.quantization.cfg', REPORT_SUFFIX)):
                 os.remove(os.path.join(output_folder, fname))
                 removed += 1
         return jsonify({'success': True, 'message': f'已清空 {removed} 个文件'})
@@ -658,6 +1711,22 @@ def clear_outputs():
         return jsonify({'success': False, 'message': f'清空失败: {str(e)}'}), 500
 
 
+@app.route('/api/cache', methods=['GET'])
+def cache_status():
+    """转换缓存统计（各阶段条目数 / 占用空间）"""
+    cache = ConversionCache(app.config['CACHE_FOLDER'])
+    return jsonify({'success': True, **cache.stats()})
+
+
+@app.route('/api/cache/clear', methods=['POST'])
+def clear_cache():
+    """清空转换缓存（不影响 output 目录中的历史结果）"""
+    try:
+        removed = ConversionCache(app.config['CACHE_FOLDER']).clear()
+        return jsonify({'success': True, 'message': f'已清除 {removed} 个缓存条目'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'清除缓存失败: {str(e)}'}), 500
+
 
 @app.route('/api/outputs', methods=['GET'])
 def list_outputs():
@@ -686,8 +1755,15 @@ def list_outputs():
                     'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(file_time)),
                     'download_url': f'/api/download/{filename}',
                     'model_type': meta.get('model_type', ''),
+                    'platform': meta.get('platform', ''),
+                    'group_id': meta.get('group_id', ''),
+                    'build_preset': meta.get('build_preset', ''),
+                    'build_options': meta.get('build_options', {}),
                     'input_w': meta.get('input_w', 640),
                     'input_h': meta.get('input_h', 640),
+                    'batch_size': meta.get('batch_size', 1),
+                    'input_shapes': meta.get('input_shapes', []),
+                    'op_report': meta.get('op_report'),
                 })
         
         # 按时间倒序排序
@@ -698,6 +1774,81 @@ def list_outputs():
         return jsonify({'success': False, 'message': f'获取文件列表失败: {str(e)}'}), 500
 
 
+# ─── 任务存储：重启恢复与过期淘汰 ─────────────────────────
+
+def _recover_jobs():
+    """服务启动：中断的任务已标记为失败，排队中的转换任务重新提交，其他排队任务结束"""
+    interrupted, queued = _store.recover()
+    for record in interrupted:
+        upload = (record['params'] or {}).get('upload_path')
+        if upload and os.path.exists(upload):
+            try: os.remove(upload)
+            except: pass
+    resumed = 0
+    for record in queued:
+        params = record['params'] or {}
+        if record['kind'] == 'convert' and os.path.exists(params.get('upload_path', '')):
+            _start_convert(record['job_id'], params, resumed=True)
+            resumed += 1
+        else:
+            _store.finish(record['job_id'], 'failed',
+                          {'success': False, 'status': 'failed', 'message': '服务重启，任务无法恢复'})
+    if interrupted or queued:
+        logger.info(f'[jobs] 重启恢复：{len(interrupted)} 个中断任务标记为失败，'
+                    f'{resumed} 个排队任务重新提交')
+
+
+def _evict_event_logs(ttl):
+    folder = app.config['EVENT_LOG_FOLDER']
+    cutoff = time.time() - ttl
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.endswith(SPILL_SUFFIX) and os.path.getmtime(path) < cutoff:
+            try: os.remove(path)
+            except: pass
+
+
+def _evict_upload_spools(max_age):
+    """服务异常退出时残留的上传中文件（正常请求结束时已删除）"""
+    folder = app.config['UPLOAD_FOLDER']
+    cutoff = time.time() - max_age
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(SPOOL_PREFIX) and name.endswith(SPOOL_SUFFIX) and \
+                os.path.getmtime(path) < cutoff:
+            try: os.remove(path)
+            except: pass
+
+
+def _janitor():
+    """定期写入任务增量，淘汰内存中已结束的任务与库中过期的记录（无论 SSE 客户端是否连接过）"""
+    while True:
+        time.sleep(JOB_JANITOR_INTERVAL)
+        try:
+            _store.flush()
+            now = time.monotonic()
+            with _jobs_lock:
+                for job_id, job in list(_jobs.items()):
+                    if job['done'] and 'finished_at' not in job:
+                        job['finished_at'] = now
+                    if job.get('finished_at') and now - job['finished_at'] > app.config['JOB_MEMORY_TTL']:
+                        job['events'].close()
+                        del _jobs[job_id]
+            _store.evict(app.config['JOB_TTL'])
+            _evict_event_logs(app.config['JOB_TTL'])
+            _evict_upload_spools(UPLOAD_SPOOL_MAX_AGE)
+        except Exception as e:
+            logger.warning(f'[jobs] 清理任务失败：{e}')
+
+
+# debug 模式的 reloader 父进程不处理请求，只在实际服务的进程中恢复任务；
+# 执行器的工作进程不导入本模块（见 job_executor），此处的进程判断仅作保险
+if multiprocessing.current_process().name == 'MainProcess':
+    if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        _recover_jobs()
+    threading.Thread(target=_janitor, name='job-janitor', daemon=True).start()
+
+
 if __name__ == '__main__':
     print("=" * 60)
     print("PT to RKNN 转换工具已启动")
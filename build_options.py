@@ -0,0 +1,137 @@
+"""
+RKNN 构建参数（rknn.config 的性能 / 精度相关选项）与预设
+
+选项最终以关键字参数传给 rknn.config：
+  optimization_level      0~3，图优化等级
+  quantized_algorithm     normal / mmse / kl_divergence
+  quantized_method        layer / channel
+  quantized_dtype         w8a8 / w8a16 / w16a16i / w4a16（后几种视平台支持）
+  compress_weight         压缩权重，减小模型体积
+  single_core_mode        单核模式（仅多核 NPU：RK3576 / RK3588）
+  model_pruning           剪除无效分支 / 冗余算子
+  sparse_infer            稀疏推理（仅 RK3576）
+  enable_flash_attention  Flash Attention（含注意力结构的模型）
+
+预设：
+  max-speed     剪枝 + Flash Attention，normal 量化
+  balanced      与 rknn-toolkit2 默认一致（默认预设）
+  max-accuracy  MMSE 量化（构建更慢），逐通道
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ──────────────────────────────────────────────────────────────
+# 选项定义
+# ──────────────────────────────────────────────────────────────
+
+BUILD_OPTION_SPECS = {
+    'optimization_level':     {'type': int,  'default': 3, 'choices': [0, 1, 2, 3]},
+    'quantized_algorithm':    {'type': str,  'default': 'normal',
+                               'choices': ['normal', 'mmse', 'kl_divergence'], 'quant': True},
+    'quantized_method':       {'type': str,  'default': 'channel',
+                               'choices': ['layer', 'channel'], 'quant': True},
+    'quantized_dtype':        {'type': str,  'default': 'w8a8',
+                               'choices': ['w8a8', 'w8a16', 'w16a16i', 'w4a16'], 'quant': True},
+    'compress_weight':        {'type': bool, 'default': False},
+    'single_core_mode':       {'type': bool, 'default': False, 'platforms': ['rk3576', 'rk3588']},
+    'model_pruning':          {'type': bool, 'default': False},
+    'sparse_infer':           {'type': bool, 'default': False, 'platforms': ['rk3576']},
+    'enable_flash_attention': {'type': bool, 'default': False},
+}
+
+DEFAULT_BUILD_OPTIONS = {k: spec['default'] for k, spec in BUILD_OPTION_SPECS.items()}
+
+BUILD_PRESETS = {
+    'max-speed': {
+        'label': '极致速度',
+        'desc': '剪枝冗余算子 + Flash Attention，normal 量化',
+        'options': dict(DEFAULT_BUILD_OPTIONS, model_pruning=True, enable_flash_attention=True),
+    },
+    'balanced': {
+        'label': '均衡（默认）',
+        'desc': '与 rknn-toolkit2 默认配置一致',
+        'options': dict(DEFAULT_BUILD_OPTIONS),
+    },
+    'max-accuracy': {
+        'label': '极致精度',
+        'desc': 'MMSE 逐通道量化，构建耗时明显增加',
+        'options': dict(DEFAULT_BUILD_OPTIONS, quantized_algorithm='mmse'),
+    },
+}
+
+DEFAULT_BUILD_PRESET = 'balanced'
+
+_TRUE = ('1', 'true', 'yes', 'on')
+_FALSE = ('0', 'false', 'no', 'off', '')
+
+
+def _coerce(name, value):
+    spec = BUILD_OPTION_SPECS[name]
+    if spec['type'] is bool:
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError(f'{name} 须为布尔值，收到 {value!r}')
+    value = spec['type'](value)
+    if 'choices' in spec and value not in spec['choices']:
+        raise ValueError(f'{name} 可选值为 {spec["choices"]}，收到 {value!r}')
+    return value
+
+
+def resolve_build_options(preset=None, overrides=None):
+    """
+    预设 + 单项覆盖 → 完整选项 dict。
+    overrides 中值为 None / 空串的条目视为未指定。
+    返回 (ok, msg, options)
+    """
+    preset = preset or DEFAULT_BUILD_PRESET
+    if preset not in BUILD_PRESETS:
+        return False, f'未知构建预设：{preset}（可选 {", ".join(BUILD_PRESETS)}）', None
+    options = dict(BUILD_PRESETS[preset]['options'])
+    for name, value in (overrides or {}).items():
+        if name not in BUILD_OPTION_SPECS:
+            return False, f'未知构建参数：{name}', None
+        if value is None or (isinstance(value, str) and value.strip() == ''):
+            continue
+        try:
+            options[name] = _coerce(name, value)
+        except (TypeError, ValueError) as e:
+            return False, str(e), None
+    return True, 'OK', options
+
+
+def effective_build_options(options, platform, do_quant):
+    """
+    按平台 / 是否量化裁剪选项：FP16 构建去掉量化参数，平台不支持的选项恢复默认。
+    结果用于 rknn.config 关键字参数、缓存键与 .meta.json。
+    """
+    effective = {}
+    for name, spec in BUILD_OPTION_SPECS.items():
+        value = (options or {}).get(name, spec['default'])
+        if spec.get('quant') and not do_quant:
+            continue
+        if 'platforms' in spec and platform not in spec['platforms']:
+            if value != spec['default']:
+                logger.warning(f'[build] {name} 不支持 {platform}，已忽略')
+            continue
+        effective[name] = value
+    return effective
+
+
+def get_build_presets_meta():
+    """供前端渲染的预设与选项定义"""
+    return {
+        'default': DEFAULT_BUILD_PRESET,
+        'presets': [{'value': k, 'label': v['label'], 'desc': v['desc'], 'options': v['options']}
+                    for k, v in BUILD_PRESETS.items()],
+        'options': {k: {'type': spec['type'].__name__, 'default': spec['default'],
+                        'choices': spec.get('choices'), 'platforms': spec.get('platforms'),
+                        'quant_only': bool(spec.get('quant'))}
+                    for k, spec in BUILD_OPTION_SPECS.items()},
+    }
@@ -13,6 +13,23 @@ ALLOWED_EXTENSIONS = {'pt', 'pth'}
 UPLOAD_FOLDER = './uploads'
 OUTPUT_FOLDER = './output'
 CALIBRATION_FOLDER = './calibration_data'
+CACHE_FOLDER = './cache'                        # 转换结果内容寻址缓存
+CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024       # 20GB，超出按最近使用淘汰
+ETA_HISTORY_FILE = './history/stage_history.jsonl'  # 阶段耗时历史，用于 ETA 预测
+JOB_STORE_PATH = './data/jobs.db'             # 任务存储（SQLite），服务重启后恢复排队任务
+JOB_MEMORY_TTL = 300                          # 结束的任务在内存中保留的秒数（供 SSE 读取）
+JOB_TTL = 7 * 24 * 3600                       # 任务记录保留的秒数
+
+# 构建前静态预估上限（0 表示不限制），超出时不再构建，见 model_estimate.py
+ESTIMATE_MAX_GMACS = 0
+ESTIMATE_MAX_PARAMS_M = 0
+
+# 转换工作进程
+MAX_CONCURRENT_JOBS = 2       # 同时运行的转换任务数上限，其余排队
+JOBS_PER_WORKER = 5           # 每个工作进程执行的任务数，达到后退出重建以回收内存
+# 各阶段超时（秒，0 表示不限制），超时由看门狗终止工作进程并清理临时文件
+STAGE_TIMEOUTS = {'export': 1800, 'export_onnx': 1800, 'load': 600, 'calibration': 3600,
+                  'build': 3600, 'export_rknn': 600}
 
 # 转换默认参数
 DEFAULT_PLATFORM = 'rk3576'
@@ -21,6 +38,7 @@ DEFAULT_INPUT_SIZE = (640, 640)
 DEFAULT_MEAN_VALUES = [[0, 0, 0]]
 DEFAULT_STD_VALUES = [[255, 255, 255]]
 DEFAULT_OPTIMIZATION_LEVEL = 3
+DEFAULT_BUILD_PRESET = 'balanced'   # max-speed / balanced / max-accuracy，见 build_options.py
 
 # 支持的平台列表
 SUPPORTED_PLATFORMS = [
@@ -0,0 +1,214 @@
+"""
+转换结果内容寻址缓存
+
+缓存键 = sha256(上传文件哈希 + 转换参数 + 校准 dataset.txt 内容哈希 + 工具链版本)。
+按阶段分别缓存：
+  rknnopt  — PT → rknnopt torchscript（只与模型字节、输入尺寸、ultralytics 版本相关）
+  onnx     — PT → ONNX（同上，另含导出参数）
+  onnxopt  — 用户 ONNX 检测头改写（只与文件字节、改写版本、onnx / onnxsim 版本相关）
+  rknn     — 最终 .rknn（+ 配套 .onnx），与平台 / 量化 / 校准集 / rknn-toolkit2 版本相关
+只换平台或量化类型时，导出阶段直接命中，只重新执行 rknn.build。
+
+目录结构：<root>/<stage>/<key>/{<文件>..., manifest.json}
+写入先落到临时目录再整体 rename，并发任务写同一个 key 时只保留先完成的一份。
+"""
+import os
+import json
+import time
+import fcntl
+import shutil
+import hashlib
+import logging
+import tempfile
+import contextlib
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 1024 * 1024
+_MANIFEST = 'manifest.json'
+_versions = {}
+
+
+def file_sha256(path: str) -> str:
+    """分块计算文件 SHA-256"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dataset_hash(dataset_path) -> str:
+    """校准集 dataset.txt 内容哈希；无校准集时返回空串"""
+    if not dataset_path or not os.path.exists(dataset_path):
+        return ''
+    return file_sha256(dataset_path)
+
+
+def package_version(*dists) -> str:
+    """已安装发行包版本（按顺序尝试多个包名），未安装返回 'none'"""
+    key = dists
+    if key not in _versions:
+        from importlib import metadata
+        _versions[key] = 'none'
+        for dist in dists:
+            try:
+                _versions[key] = metadata.version(dist)
+                break
+            except metadata.PackageNotFoundError:
+                continue
+    return _versions[key]
+
+
+def toolkit_version() -> str:
+    return package_version('rknn-toolkit2', 'rknn_toolkit2')
+
+
+def ultralytics_version() -> str:
+    return package_version('ultralytics')
+
+
+def make_key(*parts) -> str:
+    """参数序列 → 稳定的 sha256 键（list / tuple 统一序列化为 JSON 数组）"""
+    blob = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class ConversionCache:
+    """按阶段存放的内容寻址缓存，max_bytes > 0 时按最近使用时间淘汰"""
+
+    def __init__(self, root: str, max_bytes: int = 0):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def _entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.root, stage, key)
+
+    def get(self, stage: str, key: str):
+        """
+        命中返回 {文件名: 绝对路径, ..., 'manifest': dict}，未命中返回 None。
+        命中时刷新目录 mtime，作为 LRU 淘汰依据。
+        """
+        entry = self._entry_dir(stage, key)
+        manifest_path = os.path.join(entry, _MANIFEST)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception:
+            return None
+        files = {}
+        for name in manifest.get('files', []):
+            path = os.path.join(entry, name)
+            if not os.path.exists(path):
+                return None
+            files[name] = path
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+        files['manifest'] = manifest
+        return files
+
+    def put(self, stage: str, key: str, files: dict, info=None):
+        """
+        files: {缓存内文件名: 源路径}，源路径为空或不存在的条目跳过。
+        返回与 get() 相同结构；写入失败返回 None（不影响转换本身）。
+        """
+        entry = self._entry_dir(stage, key)
+        stage_dir = os.path.dirname(entry)
+        tmp = None
+        try:
+            os.makedirs(stage_dir, exist_ok=True)
+            tmp = tempfile.mkdtemp(prefix='.tmp_', dir=stage_dir)
+            names = []
+            for name, src in files.items():
+                if src and os.path.exists(src):
+                    shutil.copy2(src, os.path.join(tmp, name))
+                    names.append(name)
+            manifest = {'stage': stage, 'key': key, 'files': names,
+                        'created': time.time(), 'info': info or {}}
+            with open(os.path.join(tmp, _MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            try:
+                os.rename(tmp, entry)
+                tmp = None
+            except OSError:
+                # 其他任务已写入同一 key，保留已有条目
+                pass
+        except Exception as e:
+            logger.warning(f"[cache] 写入 {stage}/{key[:12]} 失败：{e}")
+            return None
+        finally:
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+        self.prune()
+        return self.get(stage, key)
+
+    @contextlib.contextmanager
+    def lock(self, stage: str, key: str):
+        """
+        同一 key 的跨进程互斥锁（flock），用于只应计算一次的条目：
+        持锁后先 get()，仍未命中再计算并 put()，并发任务等待后直接命中。
+        锁文件为 <root>/<stage>/.lock_<key>，不计入条目
+        """
+        stage_dir = os.path.join(self.root, stage)
+        os.makedirs(stage_dir, exist_ok=True)
+        with open(os.path.join(stage_dir, f'.lock_{key}'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        """各阶段条目数与占用字节数"""
+        result = {'root': self.root, 'stages': {}, 'total_bytes': 0}
+        for stage, entry, size, _ in self._entries():
+            st = result['stages'].setdefault(stage, {'entries': 0, 'bytes': 0})
+            st['entries'] += 1
+            st['bytes'] += size
+            result['total_bytes'] += size
+        return result
+
+    def clear(self) -> int:
+        """清空缓存，返回删除的条目数"""
+        entries = list(self._entries())
+        for _, entry, _, _ in entries:
+            shutil.rmtree(entry, ignore_errors=True)
+        return len(entries)
+
+    def prune(self):
+        """超出 max_bytes 时按最近使用时间从旧到新删除条目"""
+        if self.max_bytes <= 0:
+            return
+        entries = sorted(self._entries(), key=lambda e: e[3])
+        total = sum(e[2] for e in entries)
+        for stage, entry, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            logger.info(f"[cache] 淘汰 {stage}/{os.path.basename(entry)[:12]}（{size / 1e6:.1f} MB）")
+
+    def _entries(self):
+        """遍历 (stage, entry_dir, bytes, mtime)，跳过未完成的临时目录"""
+        if not os.path.isdir(self.root):
+            return
+        for stage in sorted(os.listdir(self.root)):
+            stage_dir = os.path.join(self.root, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for name in os.listdir(stage_dir):
+                entry = os.path.join(stage_dir, name)
+                if name.startswith('.tmp_') or not os.path.isdir(entry):
+                    continue
+                size = 0
+                for f in os.listdir(entry):
+                    try:
+                        size += os.path.getsize(os.path.join(entry, f))
+                    except OSError:
+                        pass
+                yield stage, entry, size, os.path.getmtime(entry)
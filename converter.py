@@ -1,15 +1,33 @@
 """
 PT to RKNN 多模型转换引擎 v2
-支持模型类型：yolov8_det / yolov8_seg / yolov8_pose / yolov8_obb / resnet / retinaface
+支持模型类型：yolov8_det / yolov8_seg / yolov8_pose / yolov8_obb / yolov10_det / yolo11_e2e /
+              resnet / retinaface
 YOLO系列: PT --(ultralytics.export)--> ONNX --(rknn-toolkit2)--> RKNN
+NMS-free（yolov10_det / yolo11_e2e）: 跳过 rknnopt，直接导出端到端 ONNX（输出 [1, N, 6]）
 ONNX系列: ONNX --(rknn-toolkit2)--> RKNN
+用户上传的 YOLOv8 检测 ONNX 先改写为分头输出（见 onnx_rewrite），与 rknnopt 布局一致
+PT 输入每个任务只加载一次模型：rknnopt torchscript 与 ONNX 由同一个内存中的模型导出，
+导出（run_export_job）与各平台构建（run_build_job）在不同工作进程中执行，模拟推理 ONNX
+在构建输入就绪后继续导出，与构建并行
 """
 import os
 import sys
 import glob
+import contextlib
+import shutil
 import logging
+import tempfile
+import threading
 
 from model_registry import MODEL_REGISTRY
+from job_executor import set_stage, register_temp
+from build_options import effective_build_options
+from onnx_rewrite import REWRITE_VERSION, rewrite_detect_head
+from model_estimate import estimate_onnx, check_limits
+from op_report import (REPORT_SUFFIX, parse_log_file, save_report, load_report, summary_text,
+                       brief)
+from conversion_cache import (ConversionCache, file_sha256, dataset_hash, make_key,
+                              toolkit_version, ultralytics_version, package_version)
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -55,22 +73,41 @@ def _resolve_dataset(calibration_dir: str, subdir: str):
 # ──────────────────────────────────────────────────────────────
 
 
-def pt_to_rknnopt(pt_path: str, input_size: tuple, tmp_dir: str):
+_RK_LIB = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib', 'ultralytics_yolov8'))
+
+
+def load_yolo(pt_path: str):
     """
-    使用 Rockchip 修改版 ultralytics 导出 rknnopt torchscript。
-    输出为多头分离格式（3 scale × bbox_dfl + class_scores），
-    可被 load_pytorch 正确量化，避免 bbox/class 共用 INT8 scale 的问题。
+    加载 YOLO 模型，供 rknnopt / ONNX 两种导出复用。
+    优先使用 lib/ultralytics_yolov8（Rockchip 版，支持 format='rknn'），
+    该版本的 format='onnx' 导出与官方一致。
     """
-    import sys
-    # 优先使用 lib/ultralytics_yolov8（Rockchip 版）
-    rk_lib = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'lib', 'ultralytics_yolov8'))
     inserted = False
     try:
-        if os.path.isdir(rk_lib):
-            sys.path.insert(0, rk_lib)
+        if os.path.isdir(_RK_LIB) and _RK_LIB not in sys.path:
+            sys.path.insert(0, _RK_LIB)
             inserted = True
         from ultralytics import YOLO
-        model = YOLO(pt_path)
+        logger.info(f"[PT] 加载模型：{pt_path}")
+        return YOLO(pt_path)
+    finally:
+        if inserted and _RK_LIB in sys.path:
+            sys.path.remove(_RK_LIB)
+
+
+def pt_to_rknnopt(pt_path: str, input_size: tuple, tmp_dir: str, model=None):
+    """
+    使用 Rockchip 修改版 ultralytics 导出 rknnopt torchscript。
+    输出为多头分离格式（3 scale × bbox_dfl + class_scores），
+    可被 load_pytorch 正确量化，避免 bbox/class 共用 INT8 scale 的问题。
+    model：已加载的 YOLO 对象（为空时自行加载）。
+    """
+    try:
+        if model is None:
+            model = load_yolo(pt_path)
+        base = os.path.splitext(pt_path)[0]
+        for suffix in ('_rknnopt.torchscript', '_rknnopt.pt'):
+            register_temp(base + suffix)
         result = model.export(
             format='rknn',
             imgsz=list(input_size),
@@ -81,7 +118,6 @@ def pt_to_rknnopt(pt_path: str, input_size: tuple, tmp_dir: str):
         ts_path = str(result)
         if not os.path.exists(ts_path):
             # ultralytics rknn export 生成 _rknnopt.torchscript
-            base = os.path.splitext(pt_path)[0]
             for suffix in ('_rknnopt.torchscript', '_rknnopt.pt'):
                 if os.path.exists(base + suffix):
                     ts_path = base + suffix
@@ -92,24 +128,24 @@ def pt_to_rknnopt(pt_path: str, input_size: tuple, tmp_dir: str):
         return True, 'PT → rknnopt torchscript 导出成功', ts_path
     except Exception as e:
         return False, f'PT → rknnopt 导出失败：{e}', ''
-    finally:
-        if inserted and rk_lib in sys.path:
-            sys.path.remove(rk_lib)
 
-def pt_to_onnx(pt_path: str, input_size: tuple, tmp_dir: str):
+def pt_to_onnx(pt_path: str, input_size: tuple, tmp_dir: str, export_args=None, model=None):
+    """
+    export_args：附加的 ultralytics export 参数（如 YOLO11 的 end2end=True、多输入尺寸的 dynamic=True）
+    model：已加载的 YOLO 对象（为空时自行加载）；export 内部会深拷贝模型，可重复导出
+    """
     try:
-        from ultralytics import YOLO
-        logger.info(f"[PT→ONNX] 加载模型：{pt_path}")
-        model = YOLO(pt_path)
+        if model is None:
+            from ultralytics import YOLO
+            logger.info(f"[PT→ONNX] 加载模型：{pt_path}")
+            model = YOLO(pt_path)
 
         logger.info(f"[PT→ONNX] 导出 ONNX，输入尺寸：{input_size}")
-        result = model.export(
-            format='onnx',
-            imgsz=list(input_size),
-            simplify=True,
-            opset=12,
-            dynamic=False,
-        )
+        kwargs = dict(format='onnx', imgsz=list(input_size), simplify=True, opset=12,
+                      dynamic=False)
+        kwargs.update(export_args or {})
+        register_temp(os.path.splitext(pt_path)[0] + '.onnx')
+        result = model.export(**kwargs)
         onnx_path = str(result)
 
         if not os.path.exists(onnx_path):
@@ -126,50 +162,103 @@ def pt_to_onnx(pt_path: str, input_size: tuple, tmp_dir: str):
         return False, f"PT → ONNX 导出失败：{e}", ''
 
 
+def _check_e2e_output(onnx_path: str):
+    """
+    校验 NMS-free 模型的 ONNX 输出为 [1, N, 6]（x1,y1,x2,y2,score,cls）。
+    未安装 onnx 时跳过校验。返回 (ok, msg)。
+    """
+    try:
+        import onnx
+    except ImportError:
+        return True, "未安装 onnx，跳过端到端输出校验"
+    try:
+        graph = onnx.load(onnx_path, load_external_data=False).graph
+    except Exception as e:
+        return True, f"无法读取 ONNX 输出（{e}），跳过校验"
+    if len(graph.output) != 1:
+        return False, f"端到端模型应只有 1 个输出，实际为 {len(graph.output)} 个"
+    dims = [d.dim_value for d in graph.output[0].type.tensor_type.shape.dim]
+    if not dims or dims[-1] != 6:
+        return False, (f"ONNX 输出形状为 {dims}，不是 NMS-free 的 [1, N, 6]，"
+                       f"请确认模型为 YOLOv10 / YOLO11 end2end 导出")
+    return True, f"端到端输出 {dims}"
+
+
 # ──────────────────────────────────────────────────────────────
 # ONNX → RKNN
 # ──────────────────────────────────────────────────────────────
 
+def normalize_input_shapes(input_size, input_shapes=None):
+    """
+    输入尺寸列表（每项 [H, W]），首项固定为主尺寸 input_size，去重。
+    只有一个尺寸时返回 None（静态输入）。
+    """
+    shapes = [list(input_size)]
+    for hw in input_shapes or []:
+        hw = [int(hw[0]), int(hw[1])]
+        if hw not in shapes:
+            shapes.append(hw)
+    return shapes if len(shapes) > 1 else None
+
+
+def rknn_input_kwargs(input_size, batch_size=1, input_shapes=None):
+    """
+    输入形状相关参数，返回 (config_kwargs, load_kwargs, build_kwargs)：
+      多输入尺寸 → config(dynamic_input=[[[B, 3, H, W]], ...])，load 不指定 input_size_list
+                   （ONNX 需为动态尺寸导出）
+      单尺寸     → load 按 batch 1，batch>1 时 build(rknn_batch_size=B)
+    """
+    if input_shapes:
+        return {'dynamic_input': [[[batch_size, 3, h, w]] for h, w in input_shapes]}, {}, {}
+    load = {'input_size_list': [[1, 3, input_size[0], input_size[1]]]}
+    return {}, load, ({'rknn_batch_size': batch_size} if batch_size > 1 else {})
+
+
 def onnx_to_rknn(onnx_path, output_path, platform, do_quant,
                   dataset_path, mean_values, std_values, input_size,
-                  verbose=False):
+                  verbose=False, build_options=None, batch_size=1, input_shapes=None,
+                  verbose_file=None):
     try:
         from rknn.api import RKNN
     except ImportError:
         return False, "未安装 rknn-toolkit2，请先安装"
 
-    rknn = RKNN(verbose=verbose)
+    config_kw, load_kw, build_kw = rknn_input_kwargs(input_size, batch_size, input_shapes)
+    set_stage('load')
+    rknn = RKNN(verbose=verbose, verbose_file=verbose_file)
     try:
         logger.info(f"[ONNX→RKNN] 配置：platform={platform}, quant={do_quant}, "
-                    f"mean={mean_values}, std={std_values}")
+                    f"mean={mean_values}, std={std_values}, options={build_options or {}}, "
+                    f"batch={batch_size}, shapes={input_shapes or [list(input_size)]}")
         ret = rknn.config(
             mean_values=mean_values,
             std_values=std_values,
             target_platform=platform,
+            **(build_options or {}),
+            **config_kw,
         )
         if ret != 0:
             return False, f"RKNN config 失败，ret={ret}"
 
         logger.info(f"[ONNX→RKNN] 加载 ONNX：{onnx_path}")
-        ret = rknn.load_onnx(
-            model=onnx_path,
-            input_size_list=[[1, 3, input_size[0], input_size[1]]],
-        )
+        ret = rknn.load_onnx(model=onnx_path, **load_kw)
         if ret != 0:
             return False, f"加载 ONNX 失败，ret={ret}"
 
         logger.info(f"[ONNX→RKNN] 构建 RKNN 模型 (do_quant={do_quant}) ...")
+        set_stage('build')
         if do_quant and dataset_path:
-            ret = rknn.build(do_quantization=True, dataset=dataset_path)
+            ret = rknn.build(do_quantization=True, dataset=dataset_path, **build_kw)
         else:
             if do_quant and not dataset_path:
                 logger.warning("缺少校准数据集，将回退到 FP16 模式")
-            ret = rknn.build(do_quantization=False)
+            ret = rknn.build(do_quantization=False, **build_kw)
         if ret != 0:
             return False, f"RKNN build 失败，ret={ret}"
 
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         logger.info(f"[ONNX→RKNN] 导出：{output_path}")
+        set_stage('export_rknn')
         ret = rknn.export_rknn(output_path)
         if ret != 0:
             return False, f"导出 RKNN 失败，ret={ret}"
@@ -181,39 +270,165 @@ def onnx_to_rknn(onnx_path, output_path, platform, do_quant,
         rknn.release()
 
 
+# ──────────────────────────────────────────────────────────────
+# 量化参数复用：hybrid_quantization_step1 产物（.model / .data / .quantization.cfg）
+# 首次 INT8 构建时导出并缓存，同一模型 + 校准集 + NPU 平台族的后续构建直接 step2，跳过校准
+# ──────────────────────────────────────────────────────────────
+
+QUANT_FILES = ('model.model', 'model.data', 'model.quantization.cfg')
+
+# .model 由 config(target_platform=...) 生成，只在 NPU 相同的平台之间复用
+QUANT_PLATFORM_FAMILY = {'rk3566': 'rk3566_rk3568', 'rk3568': 'rk3566_rk3568'}
+
+_step1_cwd_lock = threading.Lock()
+
+
+def quant_family(platform):
+    """量化参数缓存键中的平台部分"""
+    return QUANT_PLATFORM_FAMILY.get(platform, platform)
+
+
+@contextlib.contextmanager
+def _step1_cwd(path):
+    """
+    hybrid_quantization_step1 没有输出目录参数，产物固定写到当前目录：
+    只在该调用期间切到 path（加锁，同进程的其他线程不会与之交错），调用方的输入须为绝对路径
+    """
+    with _step1_cwd_lock:
+        cwd = os.getcwd()
+        os.chdir(path)
+        try:
+            yield
+        finally:
+            os.chdir(cwd)
+
+
+def quantize_step1(kind, model_path, platform, mean_values, std_values, input_size,
+                   dataset_path, out_dir, verbose=False, build_options=None,
+                   batch_size=1, input_shapes=None):
+    """
+    load → hybrid_quantization_step1，量化参数写到 out_dir/<QUANT_FILES>。
+    converter 的量化参数缓存与 hybrid_quant 的逐层提升共用。
+    返回 (ok, msg, {QUANT_FILES 文件名: 路径})
+    """
+    from rknn.api import RKNN
+    model_path, dataset_path = os.path.abspath(model_path), os.path.abspath(dataset_path)
+    config_kw, load_kw, build_kw = rknn_input_kwargs(input_size, batch_size, input_shapes)
+    os.makedirs(out_dir, exist_ok=True)
+    step_dir = tempfile.mkdtemp(prefix='.step1_', dir=out_dir)
+    set_stage('load')
+    rknn = RKNN(verbose=verbose)
+    try:
+        ret = rknn.config(mean_values=mean_values, std_values=std_values,
+                          target_platform=platform, **(build_options or {}), **config_kw)
+        if ret != 0:
+            return False, f'RKNN config 失败，ret={ret}', {}
+        if kind == 'torchscript':
+            ret = rknn.load_pytorch(model=model_path, **load_kw)
+        else:
+            ret = rknn.load_onnx(model=model_path, **load_kw)
+        if ret != 0:
+            return False, f'加载模型失败，ret={ret}', {}
+        logger.info('[quant] 校准并导出量化参数（hybrid_quantization_step1）...')
+        set_stage('calibration')
+        with _step1_cwd(step_dir):
+            ret = rknn.hybrid_quantization_step1(dataset=dataset_path, proposal=False, **build_kw)
+        if ret != 0:
+            return False, f'hybrid_quantization_step1 失败，ret={ret}', {}
+
+        files = {}
+        for name, ext in zip(QUANT_FILES, ('.model', '.data', '.quantization.cfg')):
+            hits = sorted(glob.glob(os.path.join(step_dir, '*' + ext)))
+            if not hits:
+                return False, f'step1 未生成 {ext} 文件', {}
+            files[name] = os.path.join(out_dir, name)
+            os.replace(hits[0], files[name])
+        return True, '量化参数导出完成', files
+    except Exception as e:
+        return False, f'量化参数导出异常：{e}', {}
+    finally:
+        rknn.release()
+        shutil.rmtree(step_dir, ignore_errors=True)
+
+
+def build_from_quant(quant_files, output_path, platform, mean_values, std_values,
+                     verbose=False, build_options=None, verbose_file=None, config_kw=None):
+    """
+    以 step1 产物执行 hybrid_quantization_step2 并导出 .rknn，不重新校准。
+    config_kw 为 rknn_input_kwargs 的 config 部分（多输入尺寸的 dynamic_input），须与 step1 一致
+    """
+    from rknn.api import RKNN
+    set_stage('load')
+    rknn = RKNN(verbose=verbose, verbose_file=verbose_file)
+    try:
+        # 目标平台 / 构建参数以本次 config 为准，量化参数来自 step1 产物
+        ret = rknn.config(mean_values=mean_values, std_values=std_values,
+                          target_platform=platform, **(build_options or {}), **(config_kw or {}))
+        if ret != 0:
+            return False, f'RKNN config 失败，ret={ret}'
+        logger.info(f'[quant] 复用量化参数构建（hybrid_quantization_step2），platform={platform}')
+        set_stage('build')
+        ret = rknn.hybrid_quantization_step2(
+            model_input=quant_files['model.model'],
+            data_input=quant_files['model.data'],
+            model_quantization_cfg=quant_files['model.quantization.cfg'],
+        )
+        if ret != 0:
+            return False, f'hybrid_quantization_step2 失败，ret={ret}'
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        set_stage('export_rknn')
+        ret = rknn.export_rknn(output_path)
+        if ret != 0:
+            return False, f'export_rknn 失败，ret={ret}'
+        return True, '由量化参数构建 RKNN 成功'
+    except Exception as e:
+        return False, f'复用量化参数构建异常：{e}'
+    finally:
+        rknn.release()
+
+
 # ──────────────────────────────────────────────────────────────
 # 统一入口
 # ──────────────────────────────────────────────────────────────
 
 def torchscript_to_rknn(ts_path, output_path, platform, do_quant,
                         dataset_path, mean_values, std_values, input_size,
-                        verbose=False):
-    """使用 load_pytorch 将 rknnopt torchscript 转换为 RKNN（分头量化，INT8 更准确）"""
+                        verbose=False, build_options=None, batch_size=1, input_shapes=None,
+                        verbose_file=None):
+    """
+    使用 load_pytorch 将 rknnopt torchscript 转换为 RKNN（分头量化，INT8 更准确）。
+    rknnopt 按固定尺寸导出，不支持多输入尺寸（export 阶段已改走动态 ONNX）。
+    """
     from rknn.api import RKNN
-    rknn = RKNN(verbose=verbose)
+    _, load_kw, build_kw = rknn_input_kwargs(input_size, batch_size)
+    set_stage('load')
+    rknn = RKNN(verbose=verbose, verbose_file=verbose_file)
     try:
+        logger.info(f'[TS→RKNN] 配置：platform={platform}, quant={do_quant}, '
+                    f'options={build_options or {}}, batch={batch_size}')
         ret = rknn.config(mean_values=mean_values, std_values=std_values,
-                          target_platform=platform)
+                          target_platform=platform, **(build_options or {}))
         if ret != 0:
             return False, f'RKNN config 失败，ret={ret}'
 
         logger.info(f'[TS→RKNN] 加载 torchscript：{ts_path}')
-        ret = rknn.load_pytorch(model=ts_path,
-                                input_size_list=[[1, 3, input_size[0], input_size[1]]])
+        ret = rknn.load_pytorch(model=ts_path, **load_kw)
         if ret != 0:
             return False, f'load_pytorch 失败，ret={ret}'
 
         logger.info(f'[TS→RKNN] 构建 RKNN 模型 (do_quant={do_quant}) ...')
+        set_stage('build')
         if do_quant and dataset_path:
-            ret = rknn.build(do_quantization=True, dataset=dataset_path)
+            ret = rknn.build(do_quantization=True, dataset=dataset_path, **build_kw)
         else:
             if do_quant and not dataset_path:
                 logger.warning('缺少校准数据集，将回退到 FP16 模式')
-            ret = rknn.build(do_quantization=False)
+            ret = rknn.build(do_quantization=False, **build_kw)
         if ret != 0:
             return False, f'RKNN build 失败，ret={ret}'
 
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        set_stage('export_rknn')
         ret = rknn.export_rknn(output_path)
         if ret != 0:
             return False, f'export_rknn 失败，ret={ret}'
@@ -224,113 +439,538 @@ def torchscript_to_rknn(ts_path, output_path, platform, do_quant,
         rknn.release()
 
 
+class _LazyModel:
+    """按需加载 YOLO 模型，保证同一任务内最多加载一次（多线程安全）"""
+    def __init__(self, pt_path):
+        self.pt_path = pt_path
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._model is None:
+                self._model = load_yolo(self.pt_path)
+            return self._model
+
+
 class UniversalConverter:
-    def __init__(self, verbose=False):
+    """
+    cache_dir 不为空时启用内容寻址缓存（见 conversion_cache）：
+    最终 .rknn 与导出阶段（rknnopt torchscript / ONNX）分别按内容键缓存。
+    build_options 为 rknn.config 构建参数（见 build_options），按平台 / 量化裁剪后生效，
+    实际生效的参数记录在 self.build_options。
+    batch_size > 1 时构建批量推理模型（rknn_batch_size）；input_shapes 为额外输入尺寸
+    [[H, W], ...]，非空时导出动态尺寸 ONNX 并以 dynamic_input 构建多形状模型。
+    verbose 构建时解析逐算子日志，算子放置 / CPU 回退报告写到 .rknn 旁边（<name>.ops.json），
+    并记录在 self.op_report（见 op_report）。
+    """
+    def __init__(self, verbose=False, cache_dir=None, cache_max_bytes=0):
         self.verbose = verbose
+        self.cache = ConversionCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self.cache_hit = False
+        self.build_options = {}
+        self.batch_size = 1
+        self.input_shapes = None
+        self.output_layout = None
+        self.op_report = None
+        self.estimate = None
+
+    # ── 导出阶段（带缓存） ────────────────────────────────────
+
+    def _rknnopt_stage(self, input_path, input_size, src_hash, model=None):
+        """
+        返回 (ok, msg, ts_path)；命中缓存时 ts_path 位于缓存目录内（只读使用）。
+        model 为 _LazyModel，仅在需要导出时才真正加载。
+        """
+        key = None
+        if self.cache:
+            key = make_key('rknnopt', src_hash, list(input_size), ultralytics_version())
+            hit = self.cache.get('rknnopt', key)
+            if hit:
+                logger.info(f'[cache] rknnopt 命中 {key[:12]}，跳过导出')
+                return True, f'命中 rknnopt 缓存（{key[:12]}）', hit['model.torchscript']
 
-    def convert(self, model_type, input_path, platform, do_quant,
-                calibration_dir, output_path, input_size=(640, 640)):
-        if model_type not in MODEL_REGISTRY:
-            return False, f"未知模型类型：{model_type}", ''
+        try:
+            yolo = (model or _LazyModel(input_path)).get()
+        except Exception as e:
+            return False, f'PT 模型加载失败：{e}', ''
+        ok, msg, ts_path = pt_to_rknnopt(
+            pt_path=input_path,
+            input_size=input_size,
+            tmp_dir=os.path.dirname(input_path),
+            model=yolo,
+        )
+        if ok and key:
+            entry = self.cache.put('rknnopt', key, {'model.torchscript': ts_path})
+            if entry:
+                _remove_quiet(ts_path)
+                ts_path = entry['model.torchscript']
+        return ok, msg, ts_path
+
+    def _onnx_stage(self, model_type, input_path, input_size, src_hash, model=None,
+                    dynamic=False):
+        """
+        返回 (ok, msg, onnx_path, tmp_path)。tmp_path 为需要调用方清理的临时导出文件，
+        结果已进入缓存时为空。dynamic=True 时导出动态输入尺寸（多形状构建用）。
+        """
+        cfg = MODEL_REGISTRY[model_type]
+        export_args = dict(cfg.get('export_args') or {})
+        if dynamic:
+            export_args['dynamic'] = True
+        key = None
+        if self.cache:
+            key = make_key('onnx', src_hash, list(input_size), export_args,
+                           ultralytics_version())
+            hit = self.cache.get('onnx', key)
+            if hit:
+                logger.info(f'[cache] ONNX 命中 {key[:12]}，跳过导出')
+                return True, f'命中 ONNX 缓存（{key[:12]}）', hit['model.onnx'], ''
 
+        try:
+            yolo = (model or _LazyModel(input_path)).get()
+        except Exception as e:
+            return False, f'PT 模型加载失败：{e}', '', ''
+        ok, msg, onnx_path = pt_to_onnx(
+            pt_path=input_path,
+            input_size=input_size,
+            tmp_dir=os.path.dirname(input_path),
+            export_args=export_args,
+            model=yolo,
+        )
+        if not ok:
+            return False, msg, '', ''
+        if key:
+            entry = self.cache.put('onnx', key, {'model.onnx': onnx_path})
+            if entry:
+                _remove_quiet(onnx_path)
+                return True, msg, entry['model.onnx'], ''
+        return True, msg, onnx_path, onnx_path
+
+    def _onnxopt_stage(self, input_path, src_hash):
+        """
+        用户 ONNX 检测头改写（见 onnx_rewrite），按输入文件哈希缓存。
+        返回 (ok, msg, onnx_path, tmp_path, layout)；ok=False 时调用方使用原 ONNX。
+        """
+        key = None
+        if self.cache:
+            key = make_key('onnxopt', src_hash, REWRITE_VERSION,
+                           package_version('onnx'), package_version('onnxsim'))
+            hit = self.cache.get('onnxopt', key)
+            if hit:
+                logger.info(f'[cache] ONNX 改写命中 {key[:12]}，跳过改写')
+                return (True, f'命中 ONNX 改写缓存（{key[:12]}）', hit['model.onnx'], '',
+                        hit['manifest']['info'].get('layout'))
+
+        out_path = os.path.splitext(input_path)[0] + '_npu.onnx'
+        register_temp(out_path)
+        ok, msg, layout = rewrite_detect_head(input_path, out_path)
+        if not ok:
+            _remove_quiet(out_path)
+            return False, msg, '', '', None
+        if key:
+            entry = self.cache.put('onnxopt', key, {'model.onnx': out_path}, info={'layout': layout})
+            if entry:
+                _remove_quiet(out_path)
+                return True, msg, entry['model.onnx'], '', layout
+        return True, msg, out_path, out_path, layout
+
+    def export_onnx(self, model_type, input_path, input_size, dest_path, source_hash=None,
+                    model=None, dynamic=False):
+        """PT → ONNX 并保存到 dest_path（x86 模拟推理用），返回 (ok, msg, dest_path)"""
+        set_stage('export_onnx')
+        src_hash = (source_hash or file_sha256(input_path)) if self.cache else None
+        ok, msg, onnx_path, tmp = self._onnx_stage(model_type, input_path, input_size, src_hash,
+                                                   model, dynamic)
+        if not ok:
+            return False, msg, ''
+        try:
+            os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+            shutil.copy2(onnx_path, dest_path)
+        except Exception as e:
+            return False, f'保存 ONNX 失败：{e}', ''
+        finally:
+            if tmp:
+                _remove_quiet(tmp)
+        return True, msg, dest_path
+
+    # ── 导出阶段：与平台 / 量化无关，多平台构建共享 ──────────────
+
+    def export(self, model_type, input_path, input_size, source_hash=None, on_artifact=None,
+               input_shapes=None, estimate=None):
+        """
+        input_shapes 非空（多输入尺寸）时跳过 rknnopt，导出动态尺寸 ONNX。
+        estimate 为 {platforms, do_quant, limits} 时对 ONNX 做静态开销预估（见 model_estimate），
+        构建输入为 ONNX 时在构建之前执行，超出 limits 则不再构建；rknnopt 路径的构建输入为
+        torchscript，预估在模拟推理 ONNX 导出之后执行，只给出提示。
+        返回 (ok, msg, artifact)，artifact 为 dict：
+          kind         'torchscript'（rknnopt，走 load_pytorch）或 'onnx'（走 load_onnx）
+          path         RKNN 构建输入
+          onnx         x86 模拟推理用 ONNX（可能为空）
+          source_hash  上传文件哈希（未启用缓存时为 None）
+          layout       改写后的输出布局（用户 ONNX 经 onnx_rewrite 改写时），否则为 None
+          estimate     静态预估报告（未预估时不存在）
+          tmp          需由调用方在构建结束后清理的临时文件
+        on_artifact(artifact)：构建输入一就绪即回调。PT 的模拟推理 ONNX 在回调之后才导出，
+        调用方可借此让 RKNN build 与 ONNX 导出并行。
+        """
+        if model_type not in MODEL_REGISTRY:
+            return False, f"未知模型类型：{model_type}", None
         cfg = MODEL_REGISTRY[model_type]
         ext = os.path.splitext(input_path)[1].lower()
-        onnx_path = None
-        tmp_onnx = None
+        if ext not in ('.pt', '.pth', '.onnx'):
+            return False, f"不支持的文件格式：{ext}", None
+        if ext in ('.pt', '.pth') and cfg['source_type'] == 'onnx_only':
+            return False, f"{cfg['short']} 只支持 .onnx 输入，不支持 .pt", None
+
+        set_stage('export')
+        src_hash = (source_hash or file_sha256(input_path)) if self.cache else None
+        dynamic = bool(normalize_input_shapes(input_size, input_shapes))
         steps = []
 
-        try:
-            if ext in ('.pt', '.pth'):
-                if cfg['source_type'] == 'onnx_only':
-                    return False, f"{cfg['short']} 只支持 .onnx 输入，不支持 .pt", ''
-
+        if ext == '.onnx':
+            steps.append("输入为 ONNX，跳过导出步骤")
+            artifact = {'kind': 'onnx', 'path': input_path, 'onnx': input_path,
+                        'source_hash': src_hash, 'layout': None, 'tmp': []}
+            if cfg.get('onnx_rewrite'):
+                # 构建输入改用分头 ONNX；模拟推理仍使用原 ONNX（标准单输出）
+                ok, msg, opt_path, tmp, layout = self._onnxopt_stage(input_path, src_hash)
+                if ok:
+                    artifact.update(path=opt_path, layout=layout, tmp=[tmp] if tmp else [])
+                    steps.append(f"ONNX 检测头改写：{msg}")
+                else:
+                    logger.info(f'[onnx-rewrite] {msg}')
+                    steps.append(f"ONNX 检测头改写跳过：{msg}")
+        else:
+            model = _LazyModel(input_path)
+            if cfg.get('nms_free'):
+                # rknnopt 只导出 one-to-many 分头输出，会丢失端到端头，直接走 ONNX
+                logger.info("NMS-free 模型，跳过 rknnopt，直接导出端到端 ONNX...")
+                ts_ok, ts_msg, ts_path = False, 'NMS-free 模型不使用 rknnopt', ''
+            elif dynamic:
+                # rknnopt torchscript 为固定尺寸，多输入尺寸需要动态 ONNX
+                logger.info("多输入尺寸构建，跳过 rknnopt，导出动态尺寸 ONNX...")
+                ts_ok, ts_msg, ts_path = False, '多输入尺寸不使用 rknnopt', ''
+            else:
                 logger.info("检测到 PT 文件，优先尝试 rknnopt 导出...")
-                ts_ok, ts_msg, ts_path_val = pt_to_rknnopt(
-                    pt_path=input_path,
-                    input_size=input_size,
-                    tmp_dir=os.path.dirname(input_path),
+                ts_ok, ts_msg, ts_path = self._rknnopt_stage(input_path, input_size, src_hash, model)
+
+            if ts_ok:
+                logger.info('[convert] rknnopt 成功，使用 load_pytorch 量化路径')
+                steps.append(f"PT → rknnopt torchscript：{ts_msg}")
+                artifact = {'kind': 'torchscript', 'path': ts_path, 'onnx': '',
+                            'source_hash': src_hash, 'layout': None, 'tmp': []}
+                if on_artifact:
+                    on_artifact(dict(artifact))
+                # 模拟推理用的 ONNX 由同一个已加载模型导出
+                set_stage('export_onnx')
+                ok, msg, onnx_path, tmp = self._onnx_stage(
+                    model_type, input_path, input_size, src_hash, model)
+                if ok:
+                    artifact['onnx'] = onnx_path
+                    artifact['tmp'] = [tmp] if tmp else []
+                    steps.append(f"PT → ONNX（x86 模拟推理用）：{msg}")
+                    if estimate:
+                        self._estimate(artifact, onnx_path, input_size, input_shapes, estimate,
+                                       steps, enforce=False)
+                else:
+                    steps.append(f"⚠️ ONNX 生成失败（{msg}），x86 推理不可用")
+                return True, '\n'.join(steps), artifact
+
+            if not cfg.get('nms_free') and not dynamic:
+                logger.warning(f'[convert] rknnopt 失败（{ts_msg}），回退到标准 ONNX')
+                steps.append(f"⚠️ rknnopt 回退：{ts_msg}")
+            ok, msg, onnx_path, tmp = self._onnx_stage(
+                model_type, input_path, input_size, src_hash, model, dynamic)
+            if not ok:
+                return False, msg, None
+            steps.append(f"PT → ONNX：{msg}")
+            artifact = {'kind': 'onnx', 'path': onnx_path, 'onnx': onnx_path,
+                        'source_hash': src_hash, 'layout': None, 'tmp': [tmp] if tmp else []}
+
+        if cfg.get('nms_free'):
+            ok, msg = _check_e2e_output(artifact['path'])
+            if not ok:
+                for t in artifact['tmp']:
+                    _remove_quiet(t)
+                return False, msg, None
+            steps.append(f"NMS-free 输出校验：{msg}")
+        if estimate:
+            ok, msg = self._estimate(artifact, artifact['path'], input_size, input_shapes,
+                                     estimate, steps)
+            if not ok:
+                for t in artifact['tmp']:
+                    _remove_quiet(t)
+                return False, '\n'.join(steps + [f'❌ {msg}，已跳过构建']), None
+        self.output_layout = artifact['layout']
+        if on_artifact:
+            on_artifact(dict(artifact))
+        return True, '\n'.join(steps), artifact
+
+    def _estimate(self, artifact, onnx_path, input_size, input_shapes, estimate, steps,
+                  enforce=True):
+        """静态预估写入 artifact['estimate'] / self.estimate；超出上限时返回 (False, 原因)"""
+        set_stage('estimate')
+        ok, msg, report = estimate_onnx(onnx_path, input_size, estimate.get('platforms') or [],
+                                        input_shapes, estimate.get('do_quant', True))
+        if not ok:
+            logger.warning(f'[estimate] {msg}')
+            steps.append(f'⚠️ 静态预估跳过：{msg}')
+            return True, ''
+        artifact['estimate'] = self.estimate = report
+        logger.info(f'[estimate] {msg}')
+        steps.append(msg)
+        ok, reason = check_limits(report, **(estimate.get('limits') or {}))
+        if not ok and not enforce:
+            steps.append(f'⚠️ {reason}（rknnopt 构建已开始，仅提示）')
+            return True, ''
+        return ok, reason
+
+    # ── 构建阶段：每个平台一次 ────────────────────────────────
+
+    def _build_plan(self, model_type, platform, do_quant, calibration_dir, input_size, src_hash,
+                    build_options=None, batch_size=1, input_shapes=None):
+        """
+        解析校准集、裁剪构建参数并计算 .rknn 缓存键，返回 (do_quant, dataset_path, key, steps)。
+        生效的构建参数写入 self.build_options，批大小 / 输入尺寸写入 self.batch_size /
+        self.input_shapes。
+        """
+        cfg = MODEL_REGISTRY[model_type]
+        steps = []
+        dataset_path = None
+        if do_quant:
+            dataset_path = _resolve_dataset(calibration_dir, cfg['calibration_subdir'])
+            if not dataset_path:
+                do_quant = False
+                steps.append(
+                    f"⚠️ 未找到 {cfg['calibration_subdir']} 校准数据集，已回退为 FP16"
                 )
-                if ts_ok:
-                    logger.info('[convert] rknnopt 成功，使用 load_pytorch 量化路径')
-                    steps.append(f"PT → rknnopt torchscript：{ts_msg}")
-                    ok2, msg2 = torchscript_to_rknn(
-                        ts_path=ts_path_val,
-                        output_path=output_path,
-                        platform=platform,
-                        do_quant=do_quant,
-                        dataset_path=_resolve_dataset(calibration_dir, cfg['calibration_subdir']) if do_quant else None,
-                        mean_values=cfg['mean_values'],
-                        std_values=cfg['std_values'],
-                        input_size=input_size,
-                        verbose=self.verbose,
-                    )
-                    steps.append(f"rknnopt torchscript → RKNN：{msg2}")
-                    if not ok2:
-                        return False, '\n'.join(steps), ''
-                    return True, '\n'.join(steps), ''
+        self.build_options = effective_build_options(build_options, platform, do_quant)
+        self.batch_size = max(1, int(batch_size or 1))
+        self.input_shapes = normalize_input_shapes(input_size, input_shapes)
+        key = None
+        if self.cache and src_hash:
+            key = make_key('rknn', src_hash, model_type, platform, do_quant,
+                           list(input_size), dataset_hash(dataset_path), toolkit_version(),
+                           self.build_options, self.batch_size, self.input_shapes,
+                           REWRITE_VERSION if cfg.get('onnx_rewrite') else None)
+        return do_quant, dataset_path, key, steps
+
+    def build(self, model_type, artifact, platform, do_quant, calibration_dir,
+              output_path, input_size, store=True, build_options=None, batch_size=1,
+              input_shapes=None):
+        """
+        由 export() 的 artifact 构建指定平台的 .rknn，返回 (ok, msg, cached)。
+        store=False 时不写入 .rknn 缓存（由调用方连同 ONNX 一起写入）。
+        """
+        cfg = MODEL_REGISTRY[model_type]
+        self.output_layout = artifact.get('layout')
+        do_quant, dataset_path, key, steps = self._build_plan(
+            model_type, platform, do_quant, calibration_dir, input_size, artifact.get('source_hash'),
+            build_options, batch_size, input_shapes)
+        if self.input_shapes and artifact['kind'] == 'torchscript':
+            return False, 'rknnopt torchscript 不支持多输入尺寸，请以动态 ONNX 构建', False
+        if key:
+            hit = self.cache.get('rknn', key)
+            if hit:
+                self._restore_rknn(hit, key, output_path, steps)
+                return True, '\n'.join(steps), True
+
+        if cfg.get('nms_free') and do_quant:
+            # [N,6] 中坐标（0~输入尺寸）与 score（0~1）共用一个输出 scale
+            logger.warning("NMS-free 输出为单张量，INT8 下坐标与置信度共用量化 scale，"
+                           "若置信度精度不足请改用 FP16")
+
+        # verbose 构建日志另写一份到文件，构建完成后解析出算子放置报告
+        log_path = None
+        if self.verbose:
+            fd, log_path = tempfile.mkstemp(prefix='rknn_build_', suffix='.log')
+            os.close(fd)
+            register_temp(log_path)
+        try:
+            ok = False
+            if do_quant and self.cache and artifact.get('source_hash'):
+                ok, msg = self._quant_build(model_type, artifact, platform, dataset_path,
+                                            output_path, input_size, log_path)
+                if ok:
+                    steps.append(msg)
                 else:
-                    logger.warning(f'[convert] rknnopt 失败（{ts_msg}），回退到标准 ONNX')
-                    steps.append(f"⚠️ rknnopt 回退：{ts_msg}")
-                    ok, msg, onnx_path = pt_to_onnx(
-                        pt_path=input_path,
-                        input_size=input_size,
-                        tmp_dir=os.path.dirname(input_path),
-                    )
-                    if not ok:
-                        return False, msg, ''
-                    steps.append(f"PT → ONNX：{msg}")
-                    tmp_onnx = onnx_path
-
-            elif ext == '.onnx':
-                onnx_path = input_path
-                steps.append("输入为 ONNX，跳过导出步骤")
-            else:
-                return False, f"不支持的文件格式：{ext}", ''
-
-            dataset_path = None
-            if do_quant:
-                dataset_path = _resolve_dataset(calibration_dir, cfg['calibration_subdir'])
-                if not dataset_path:
-                    do_quant = False
-                    steps.append(
-                        f"⚠️ 未找到 {cfg['calibration_subdir']} 校准数据集，已回退为 FP16"
-                    )
-
-            logger.info("开始 ONNX → RKNN 转换...")
-            ok, msg = onnx_to_rknn(
-                onnx_path=onnx_path,
-                output_path=output_path,
-                platform=platform,
-                do_quant=do_quant,
-                dataset_path=dataset_path,
-                mean_values=cfg['mean_values'],
-                std_values=cfg['std_values'],
-                input_size=input_size,
-                verbose=self.verbose,
-            )
-            steps.append(f"ONNX → RKNN：{msg}")
-
-            if ok:
-                # 将 ONNX 复制到 output 目录旁边，供 simulator 推理使用
-                import shutil
-                onnx_out = os.path.splitext(output_path)[0] + '.onnx'
-                try:
-                    shutil.copy2(onnx_path, onnx_out)
-                    logger.info(f"已保存 ONNX 到：{onnx_out}")
-                except Exception as e:
-                    onnx_out = ''
-                    logger.warning(f"保存 ONNX 失败：{e}")
-                return True, '\n'.join(steps), onnx_out
-            else:
-                return False, msg, ''
-
+                    logger.warning(f'[quant] {msg}，改用常规量化构建')
+
+            if not ok:
+                if log_path:
+                    open(log_path, 'w').close()     # 丢弃失败的复用构建留下的日志
+                kwargs = dict(output_path=output_path, platform=platform, do_quant=do_quant,
+                              dataset_path=dataset_path, mean_values=cfg['mean_values'],
+                              std_values=cfg['std_values'], input_size=input_size,
+                              verbose=self.verbose, build_options=self.build_options,
+                              batch_size=self.batch_size, verbose_file=log_path)
+                if artifact['kind'] == 'torchscript':
+                    ok, msg = torchscript_to_rknn(ts_path=artifact['path'], **kwargs)
+                    steps.append(f"rknnopt torchscript → RKNN：{msg}")
+                else:
+                    logger.info("开始 ONNX → RKNN 转换...")
+                    ok, msg = onnx_to_rknn(onnx_path=artifact['path'],
+                                           input_shapes=self.input_shapes, **kwargs)
+                    steps.append(f"ONNX → RKNN：{msg}")
+            if ok and log_path:
+                self._write_op_report(log_path, output_path, steps)
+        finally:
+            if log_path:
+                _remove_quiet(log_path)
+        if ok and key and store:
+            self._store(key, output_path, '', model_type, platform, do_quant, input_size)
+        return ok, '\n'.join(steps), False
+
+    def _write_op_report(self, log_path, output_path, steps):
+        """解析构建日志，报告写到 .rknn 旁边（<name>.ops.json）并追加摘要到 steps"""
+        report = parse_log_file(log_path)
+        if report is None:
+            return
+        self.op_report = report
+        if report['parsed']:
+            try:
+                save_report(report, os.path.splitext(output_path)[0] + REPORT_SUFFIX)
+            except Exception as e:
+                logger.warning(f'[ops] 保存算子报告失败：{e}')
+        text = summary_text(report)
+        logger.info(f'[ops] {text}')
+        steps.append(text)
+
+    def _quant_build(self, model_type, artifact, platform, dataset_path, output_path, input_size,
+                     log_path=None):
+        """
+        INT8 构建：量化参数按 (模型, 构建输入类型, NPU 平台族, 输入尺寸 / 批大小, 校准集, 量化参数,
+        工具链) 缓存，与优化等级等构建参数无关。命中时 step2 直接构建；未命中时持该 key 的锁执行
+        一次 step1 校准并写入缓存，同时构建的同族平台等待后直接 step2。
+        量化参数另存一份到 .rknn 旁边（<name>.quantization.cfg）。返回 (ok, msg)
+        """
+        cfg = MODEL_REGISTRY[model_type]
+        quant_opts = {k: v for k, v in self.build_options.items() if k.startswith('quantized_')}
+        qkey = make_key('quant', artifact['source_hash'], model_type, artifact['kind'],
+                        quant_family(platform), list(input_size), dataset_hash(dataset_path),
+                        quant_opts, toolkit_version(), self.batch_size, self.input_shapes)
+        config_kw, _, _ = rknn_input_kwargs(input_size, self.batch_size, self.input_shapes)
+        common = dict(mean_values=cfg['mean_values'], std_values=cfg['std_values'],
+                      verbose=self.verbose, build_options=self.build_options,
+                      verbose_file=log_path, config_kw=config_kw)
+        work_dir = None
+        try:
+            entry = self.cache.get('quant', qkey)
+            calibrated = False
+            if not entry:
+                with self.cache.lock('quant', qkey):
+                    entry = self.cache.get('quant', qkey)       # 等锁期间其他构建可能已写入
+                    if not entry:
+                        work_dir = tempfile.mkdtemp(prefix='quant_')
+                        register_temp(work_dir)
+                        ok, msg, files = quantize_step1(
+                            artifact['kind'], artifact['path'], platform, cfg['mean_values'],
+                            cfg['std_values'], input_size, dataset_path, work_dir, self.verbose,
+                            self.build_options, self.batch_size, self.input_shapes)
+                        if not ok:
+                            return False, msg
+                        entry = self.cache.put('quant', qkey, files, info={
+                            'model_type': model_type, 'platform': platform,
+                            'input_size': list(input_size), 'quant_options': quant_opts,
+                        }) or files
+                        calibrated = True
+            if not calibrated:
+                info = entry.get('manifest', {}).get('info', {})
+                logger.info(f"[quant] 复用量化参数 {qkey[:12]}（首次校准于 {info.get('platform', '?')}），"
+                            f"跳过校准")
+            ok, msg = build_from_quant(entry, output_path, platform, **common)
+            if not ok:
+                return False, msg
+            try:
+                shutil.copy2(entry['model.quantization.cfg'],
+                             os.path.splitext(output_path)[0] + '.quantization.cfg')
+            except Exception as e:
+                logger.warning(f'[quant] 保存 .quantization.cfg 失败：{e}')
+            if calibrated:
+                return True, (f'量化参数已导出并缓存（{qkey[:12]}），'
+                              f'同模型同校准集的后续构建将跳过校准：{msg}')
+            return True, f'⚡ 复用量化参数（{qkey[:12]}），跳过校准：{msg}'
         finally:
-            if tmp_onnx and os.path.exists(tmp_onnx):
-                try:
-                    os.remove(tmp_onnx)
-                    logger.info(f"已清理临时 ONNX：{tmp_onnx}")
-                except Exception:
-                    pass
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _store(self, key, output_path, onnx_out, model_type, platform, do_quant, input_size):
+        if not key:
+            return
+        base = os.path.splitext(output_path)[0]
+        self.cache.put('rknn', key, {'model.rknn': output_path, 'model.onnx': onnx_out,
+                                     'model.quantization.cfg': base + '.quantization.cfg',
+                                     'model' + REPORT_SUFFIX: base + REPORT_SUFFIX}, info={
+            'model_type': model_type, 'platform': platform, 'do_quant': do_quant,
+            'input_size': list(input_size), 'toolkit': toolkit_version(),
+            'build_options': self.build_options, 'batch_size': self.batch_size,
+            'input_shapes': self.input_shapes, 'output_layout': self.output_layout,
+        })
+
+    def _restore_rknn(self, hit, key, output_path, steps):
+        """缓存命中：复制 .rknn 到输出位置"""
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        shutil.copy2(hit['model.rknn'], output_path)
+        base = os.path.splitext(output_path)[0]
+        if 'model.quantization.cfg' in hit:
+            shutil.copy2(hit['model.quantization.cfg'], base + '.quantization.cfg')
+        if 'model' + REPORT_SUFFIX in hit:
+            shutil.copy2(hit['model' + REPORT_SUFFIX], base + REPORT_SUFFIX)
+            self.op_report = load_report(hit['model' + REPORT_SUFFIX])
+            if self.op_report:
+                steps.append(summary_text(self.op_report))
+        self.output_layout = hit['manifest'].get('info', {}).get('output_layout')
+        self.cache_hit = True
+        logger.info(f'[cache] RKNN 命中 {key[:12]}，跳过导出与构建')
+        steps.append(f"⚡ 命中转换缓存（{key[:12]}），直接复用已构建的 RKNN")
+
+
+# ──────────────────────────────────────────────────────────────
+# 工作进程任务入口（job_executor 以 'converter:<函数名>' 调用）
+# ──────────────────────────────────────────────────────────────
+
+def run_export_job(model_type, input_path, input_size, cache_dir=None, cache_max_bytes=0,
+                   input_shapes=None, estimate=None, source_hash=None):
+    """
+    多平台任务的共享导出阶段。构建输入就绪时发出 ('artifact', artifact) 事件，
+    主进程据此立即提交各平台构建，模拟推理 ONNX 继续在本进程导出。
+    estimate 见 UniversalConverter.export（超出上限时不发出 artifact 事件）；
+    source_hash 为上传时计算的文件 SHA-256（缓存键，避免重读文件）。
+    返回 success / message / artifact
+    """
+    from job_executor import emit_event
+    converter = UniversalConverter(verbose=True, cache_dir=cache_dir,
+                                   cache_max_bytes=cache_max_bytes)
+    ok, msg, artifact = converter.export(model_type, input_path, tuple(input_size),
+                                         source_hash=source_hash,
+                                         on_artifact=lambda a: emit_event('artifact', a),
+                                         input_shapes=input_shapes, estimate=estimate)
+    return {'success': ok, 'message': msg, 'artifact': artifact}
+
+
+def run_build_job(model_type, artifact, platform, do_quant, calibration_dir,
+                  output_path, input_size, cache_dir=None, cache_max_bytes=0,
+                  build_options=None, batch_size=1, input_shapes=None):
+    """
+    单平台构建阶段，返回 success / message / cached / build_options / batch_size / input_shapes /
+    op_report
+    """
+    converter = UniversalConverter(verbose=True, cache_dir=cache_dir,
+                                   cache_max_bytes=cache_max_bytes)
+    ok, msg, cached = converter.build(model_type, artifact, platform, do_quant,
+                                      calibration_dir, output_path, tuple(input_size),
+                                      build_options=build_options, batch_size=batch_size,
+                                      input_shapes=input_shapes)
+    return {'success': ok, 'message': msg, 'cached': cached,
+            'build_options': converter.build_options, 'batch_size': converter.batch_size,
+            'input_shapes': converter.input_shapes, 'op_report': brief(converter.op_report)}
+
+
+def _remove_quiet(path):
+    try:
+        os.remove(path)
+    except Exception:
+        pass
 
 
 # 保持向后兼容
@@ -0,0 +1,226 @@
+"""
+阶段耗时历史与 ETA 预测
+
+每次成功（未命中缓存）的单平台转换记录一条历史（JSONL，追加写入）：
+  features  model_type / platform / quant_type / source_ext / params_m / input_h / input_w /
+            batch_size / calib_images
+  stages    {阶段名: 墙钟秒数}（见 stage_metrics，同名阶段累加）
+预测：按 (model_type, platform, quant_type, source_ext) → (platform, quant_type, source_ext) →
+(quant_type, source_ext) → 全部 逐级放宽匹配，取最近 MAX_SAMPLES 条记录，
+每个阶段以「耗时 / 工作量」的中位数乘以新任务的工作量：
+  export / estimate / export_onnx / load / export_rknn   工作量 ∝ 参数量
+  calibration / build                                    工作量 ∝ 参数量 × 输入像素 × batch
+                                                         （INT8 再 × 校准图片数）
+参数量在导出前由上传文件大小估算（见 params_from_file），静态预估完成后以实际参数量修正。
+EtaTracker 跟踪一个任务的实时进度：导出阶段之后各平台构建并行，模拟推理 ONNX 导出与构建并行。
+"""
+import os
+import json
+import time
+import logging
+import threading
+from statistics import median
+
+logger = logging.getLogger(__name__)
+
+EXPORT_STAGES = ('export', 'estimate', 'export_onnx')
+BUILD_STAGES = ('load', 'calibration', 'build', 'export_rknn')
+MAX_SAMPLES = 20
+MAX_RECORDS = 5000              # 超出后压缩为最近 MAX_RECORDS 条
+_MATCH_LEVELS = (('model_type', 'platform', 'quant_type', 'source_ext'),
+                 ('platform', 'quant_type', 'source_ext'),
+                 ('quant_type', 'source_ext'),
+                 ())
+
+
+def params_from_file(path):
+    """由模型文件大小粗估参数量（百万）：ONNX 权重按 FP32，.pt / .pth（ultralytics）按 FP16"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    per_param = 4 if path.lower().endswith('.onnx') else 2
+    return round(size / per_param / 1e6, 3)
+
+
+def work_units(features, stage):
+    units = max(float(features.get('params_m') or 1.0), 0.05)
+    if stage in ('calibration', 'build'):
+        units *= (features.get('input_h') or 640) * (features.get('input_w') or 640) / (640 * 640)
+        units *= max(int(features.get('batch_size') or 1), 1)
+        if features.get('quant_type') == 'i8':
+            units *= max(int(features.get('calib_images') or 1), 1)
+    return units
+
+
+def plan_seconds(plan):
+    """预测总耗时（秒），并行关系同 EtaTracker"""
+    export = plan['export']
+    pre = export.get('export', 0.0) + export.get('estimate', 0.0)
+    builds = [sum(b.values()) for b in plan['builds'].values()]
+    return round(pre + max([export.get('export_onnx', 0.0)] + builds), 1)
+
+
+class EtaHistory:
+    """阶段耗时历史（JSONL 文件，进程内缓存）"""
+    def __init__(self, path, max_records=MAX_RECORDS):
+        self.path = path
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _load(self):
+        if self._records is not None:
+            return self._records
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        self._records = records[-self.max_records:]
+        return self._records
+
+    def add(self, features, stage_records):
+        """记录一次转换：stage_records 为 stage_metrics 记录列表（upload 不计入）"""
+        stages = {}
+        for r in stage_records or []:
+            if r['stage'] in EXPORT_STAGES + BUILD_STAGES:
+                stages[r['stage']] = round(stages.get(r['stage'], 0.0) + r['wall_s'], 3)
+        if not stages:
+            return
+        record = {'ts': int(time.time()), 'features': features, 'stages': stages}
+        with self._lock:
+            records = self._load()
+            records.append(record)
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                if len(records) > self.max_records * 2:
+                    del records[:-self.max_records]
+                    with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                        for r in records:
+                            f.write(json.dumps(r, ensure_ascii=False) + '\n')
+                    os.replace(self.path + '.tmp', self.path)
+                else:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except OSError as e:
+                logger.warning(f'[eta] 写入耗时历史失败：{e}')
+
+    def _matches(self, features):
+        records = self._load()
+        for level in _MATCH_LEVELS:
+            hits = [r for r in records
+                    if all(r['features'].get(k) == features.get(k) for k in level)]
+            if hits:
+                return hits[-MAX_SAMPLES:], level
+        return [], None
+
+    def predict(self, features):
+        """
+        返回 {'export': {阶段: 秒}, 'build': {阶段: 秒}, 'samples', 'match'}；没有历史时返回 None。
+        预测的阶段集合取最近一条匹配记录（不同输入格式 / 量化方式走的阶段不同）。
+        """
+        with self._lock:
+            hits, level = self._matches(features)
+        if not hits:
+            return None
+        plan = {'export': {}, 'build': {}, 'samples': len(hits), 'match': list(level)}
+        for stage in hits[-1]['stages']:
+            rates = [r['stages'][stage] / work_units(r['features'], stage)
+                     for r in hits if stage in r['stages']]
+            seconds = round(median(rates) * work_units(features, stage), 2)
+            plan['export' if stage in EXPORT_STAGES else 'build'][stage] = seconds
+        return plan
+
+    def plan(self, features, platforms):
+        """多平台任务的预测：{'export': {...}, 'builds': {平台: {...}}, 'samples'}，没有历史时返回 None"""
+        preds = {p: self.predict(dict(features, platform=p)) for p in platforms}
+        known = [pr for pr in preds.values() if pr]
+        if not known:
+            return None
+        return {'export': known[0]['export'],
+                'builds': {p: pr['build'] if pr else {} for p, pr in preds.items()},
+                'samples': max(pr['samples'] for pr in known)}
+
+    def stats(self):
+        with self._lock:
+            records = self._load()
+            return {'records': len(records),
+                    'latest': records[-1]['ts'] if records else None}
+
+
+class EtaTracker:
+    """
+    一个任务的实时 ETA。phase 为 'export' 或平台名（各平台构建）：
+    剩余 = 导出阶段（artifact 之前）剩余 + max(模拟推理 ONNX 导出剩余, 各平台构建剩余)
+    """
+    def __init__(self, plan):
+        self.t0 = time.monotonic()
+        self.plans = {'export': dict(plan['export'])}
+        self.plans.update((p, dict(b)) for p, b in plan['builds'].items())
+        self.samples = plan['samples']
+        self._done = {phase: set() for phase in self.plans}
+        self._current = {}
+        self._lock = threading.Lock()
+
+    def update_plan(self, plan):
+        """参数量修正后重新预测：已完成的阶段不受影响"""
+        with self._lock:
+            self.plans['export'] = dict(plan['export'])
+            for p, b in plan['builds'].items():
+                if p in self.plans:
+                    self.plans[p] = dict(b)
+            self.samples = plan['samples']
+
+    def on_stage(self, phase, stage):
+        with self._lock:
+            if phase in self.plans:
+                self._current[phase] = (stage, time.monotonic())
+
+    def on_metrics(self, phase, record):
+        with self._lock:
+            if phase in self._done:
+                self._done[phase].add(record['stage'])
+                cur = self._current.get(phase)
+                if cur and cur[0] == record['stage']:
+                    self._current.pop(phase, None)
+
+    def finish(self, phase):
+        """phase 结束（含命中缓存跳过的阶段）"""
+        with self._lock:
+            if phase in self._done:
+                self._done[phase].update(self.plans[phase])
+                self._current.pop(phase, None)
+
+    def _remaining(self, phase, stages, now):
+        total = 0.0
+        cur = self._current.get(phase)
+        for stage, seconds in self.plans[phase].items():
+            if stage not in stages or stage in self._done[phase]:
+                continue
+            if cur and cur[0] == stage:
+                total += max(seconds - (now - cur[1]), 0.0)
+            else:
+                total += seconds
+        return total
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            pre = self._remaining('export', ('export', 'estimate'), now)
+            sim = self._remaining('export', ('export_onnx',), now)
+            builds = [self._remaining(p, BUILD_STAGES, now) for p in self.plans if p != 'export']
+            current = {p: s for p, (s, _) in self._current.items()}
+            samples = self.samples
+        elapsed = now - self.t0
+        remaining = pre + max([sim] + builds)
+        total = elapsed + remaining
+        return {'elapsed_s': round(elapsed, 1), 'remaining_s': round(remaining, 1),
+                'total_s': round(total, 1),
+                'progress': round(100 * elapsed / total, 1) if total > 0 else 100.0,
+                'current': current, 'samples': samples}
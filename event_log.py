@@ -0,0 +1,128 @@
+"""
+任务事件日志：可回放的 SSE 事件流
+
+每个任务一个 EventLog：
+- 事件带单调递增 id（从 1 开始），内存中只保留最近 ring_size 条（环形缓冲）
+- 全部事件同时写入压缩的逐任务日志文件 <dir>/<job_id>.jsonl.gz（每行 [id, type, data]），
+  订阅者请求的 id 早于环形缓冲时从文件补齐；进程重启后恢复的任务在同一文件上追加，id 接续
+- 多个订阅者各自持有游标（Last-Event-ID），read() 阻塞等待新事件，互不抢占
+- 写入 done 事件后日志关闭，订阅者读到 done 即结束
+任务从内存淘汰后，replay_file() 仍可从日志文件回放。
+"""
+import os
+import gzip
+import json
+import zlib
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SPILL_SUFFIX = '.jsonl.gz'
+RING_SIZE = 2000
+
+
+def spill_path(folder, job_id):
+    return os.path.join(folder, job_id + SPILL_SUFFIX)
+
+
+def _read_spill(path):
+    """
+    读取日志文件中已刷新的全部事件。写入方以 Z_SYNC_FLUSH 刷新，文件末尾可能是未结束的
+    gzip 成员，因此用 decompressobj 逐成员解压而不是 gzip.open。
+    """
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return []
+    text = b''
+    while raw:
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            text += d.decompress(raw)
+        except zlib.error:
+            break
+        raw = d.unused_data
+    events = []
+    for line in text.split(b'\n'):
+        try:
+            events.append(tuple(json.loads(line)))
+        except ValueError:
+            continue            # 空行 / 未写完整的最后一行
+    return events
+
+
+def replay_file(path, after=0):
+    """已淘汰任务：日志文件中 id > after 的事件"""
+    return [e for e in _read_spill(path) if e[0] > after]
+
+
+class EventLog:
+    def __init__(self, path, ring_size=RING_SIZE):
+        self.path = path
+        self._ring = deque(maxlen=ring_size)
+        self._cond = threading.Condition()
+        self._flushed = True
+        self.closed = False
+        self.last_id = 0
+        if os.path.exists(path):            # 重启后恢复的任务：id 接续
+            previous = _read_spill(path)
+            if previous:
+                self.last_id = previous[-1][0]
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = gzip.open(path, 'ab')
+
+    def append(self, event_type, data):
+        with self._cond:
+            if self.closed:
+                return self.last_id
+            self.last_id += 1
+            event = (self.last_id, event_type, data)
+            self._ring.append(event)
+            try:
+                self._file.write(json.dumps(event, ensure_ascii=False, default=str).encode('utf-8')
+                                 + b'\n')
+                self._flushed = False
+            except (OSError, ValueError) as e:
+                logger.warning(f'[events] 写入事件日志失败：{e}')
+            if event_type == 'done':
+                self._close_file()
+            self._cond.notify_all()
+            return self.last_id
+
+    def _close_file(self):
+        self.closed = True
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._flushed = True
+
+    def close(self):
+        with self._cond:
+            if not self.closed:
+                self._close_file()
+            self._cond.notify_all()
+
+    def read(self, after=0, timeout=None):
+        """
+        返回 id > after 的事件列表 [(id, type, data), ...]；暂无新事件时最多等待 timeout 秒，
+        超时返回空列表。
+        """
+        with self._cond:
+            if self.last_id <= after and not self.closed:
+                self._cond.wait(timeout)
+            if self.last_id <= after:
+                return []
+            first = self._ring[0][0] if self._ring else self.last_id + 1
+            if after + 1 >= first:
+                return [e for e in self._ring if e[0] > after]
+            # 游标早于环形缓冲：从日志文件补齐（先刷新压缩流）
+            if not self._flushed:
+                self._file.flush()
+                self._flushed = True
+            ring = list(self._ring)
+        older = [e for e in _read_spill(self.path) if after < e[0] < first]
+        return older + ring
@@ -0,0 +1,184 @@
+"""
+自动混合量化：按逐层精度分析把 INT8 误差大的层提升为 float16
+
+流程（在工作进程中执行，见 run_hybrid_job）：
+  1. load_onnx → hybrid_quantization_step1(dataset)，得到 .model / .data / .quantization.cfg
+  2. 按当前浮点层列表改写 .quantization.cfg 的 custom_quantize_layers
+  3. hybrid_quantization_step2 → accuracy_analysis（评估图片）→ 解析逐层余弦相似度
+  4. 输出层余弦相似度达到目标即结束；否则把单层余弦（single_cos，缺失时用整体余弦）
+     低于阈值的层按从差到好取若干个加入浮点列表，回到第 2 步
+达到迭代上限或没有可提升的层时，保留最后一次构建结果。
+报告列出每个提升的层、提升时的余弦相似度与所在迭代轮次。
+"""
+import os
+import re
+import shutil
+import logging
+import tempfile
+
+import cv2
+
+from model_registry import MODEL_REGISTRY
+from job_executor import set_stage, register_temp
+from build_options import effective_build_options
+from inferencer import letterbox, _parse_accuracy_output
+from converter import QUANT_FILES, quantize_step1
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGET_COSINE = 0.99
+DEFAULT_LAYER_THRESHOLD = 0.98
+DEFAULT_MAX_ITERS = 5
+DEFAULT_LAYERS_PER_ITER = 3
+
+
+def write_float_layers(cfg_in, cfg_out, layers):
+    """把 layers 写入 .quantization.cfg 的 custom_quantize_layers（其余内容不变）"""
+    with open(cfg_in, 'r', encoding='utf-8') as f:
+        text = f.read()
+    block = ''.join(f"    '{name}': float16\n" for name in layers)
+    pattern = re.compile(r'^custom_quantize_layers:[ \t]*(\{\})?[ \t]*\n', re.M)
+    m = pattern.search(text)
+    if m is None:
+        text = f'custom_quantize_layers:\n{block}' + text if layers else text
+    elif layers:
+        text = text[:m.start()] + f'custom_quantize_layers:\n{block}' + text[m.end():]
+    with open(cfg_out, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _output_names(onnx_path):
+    """ONNX 图的输出张量名"""
+    import onnx
+    return [o.name for o in onnx.load(onnx_path, load_external_data=False).graph.output]
+
+
+def _output_cosine(layers, output_names):
+    """按输出张量名取出逐层结果中的模型输出行，取其中最低的整体余弦相似度"""
+    rows = [l for l in layers if l['layer'] in output_names]
+    if not rows:
+        raise RuntimeError(f'accuracy_analysis 结果中未找到模型输出 {output_names}')
+    return min(l['cos_sim'] for l in rows)
+
+
+def _pick_layers(layers, promoted, threshold, limit):
+    """选出尚未提升、单层余弦低于阈值的层，从差到好最多 limit 个"""
+    scored = []
+    for l in layers:
+        if l['layer'] in promoted:
+            continue
+        cos = l['single_cos'] if l.get('single_cos') is not None else l['cos_sim']
+        if cos < threshold:
+            scored.append((cos, l))
+    scored.sort(key=lambda x: x[0])
+    return scored[:limit]
+
+
+def _step2_and_analyze(model_path, data_path, cfg_path, img_lb, output_path, accuracy_dir):
+    """step2 构建并导出，随后做逐层精度分析，返回逐层结果"""
+    from rknn.api import RKNN
+    set_stage('build')
+    rknn = RKNN(verbose=True)
+    try:
+        ret = rknn.hybrid_quantization_step2(model_input=model_path, data_input=data_path,
+                                             model_quantization_cfg=cfg_path)
+        if ret != 0:
+            raise RuntimeError(f'hybrid_quantization_step2 失败，ret={ret}')
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        set_stage('export_rknn')
+        ret = rknn.export_rknn(output_path)
+        if ret != 0:
+            raise RuntimeError(f'export_rknn 失败，ret={ret}')
+        set_stage('analyze')
+        ret = rknn.init_runtime()
+        if ret != 0:
+            raise RuntimeError(f'init_runtime 失败，ret={ret}')
+        shutil.rmtree(accuracy_dir, ignore_errors=True)
+        os.makedirs(accuracy_dir)
+        ret = rknn.accuracy_analysis(inputs=[img_lb.transpose(2, 0, 1)[None]],
+                                     output_dir=accuracy_dir)
+        if ret != 0:
+            raise RuntimeError(f'accuracy_analysis 失败，ret={ret}')
+    finally:
+        rknn.release()
+    return _parse_accuracy_output(accuracy_dir)['layers']
+
+
+# ──────────────────────────────────────────────────────────────
+# 工作进程任务入口（job_executor 以 'hybrid_quant:run_hybrid_job' 调用）
+# ──────────────────────────────────────────────────────────────
+
+def run_hybrid_job(model_type, onnx_path, platform, input_size, dataset_path, image_path,
+                   output_path, target_cosine=DEFAULT_TARGET_COSINE,
+                   layer_threshold=DEFAULT_LAYER_THRESHOLD, max_iters=DEFAULT_MAX_ITERS,
+                   layers_per_iter=DEFAULT_LAYERS_PER_ITER, build_options=None):
+    """
+    返回 success / message / output_cosine / target_met / promoted / iterations / cfg
+      promoted   [{layer, op, cos_sim, single_cos, iteration}]，按提升顺序
+      iterations [{iteration, output_cosine, float_layers}]
+      cfg        最终生效的 .quantization.cfg 文本
+    """
+    img = cv2.imread(image_path)
+    if img is None:
+        return {'success': False, 'message': f'无法读取评估图片：{image_path}'}
+    img_lb, _, _, _ = letterbox(img, input_size[1], input_size[0])
+    options = effective_build_options(build_options, platform, True)
+
+    work_dir = tempfile.mkdtemp(prefix='hybrid_')
+    register_temp(work_dir)
+    promoted, iterations = [], []
+    try:
+        output_names = _output_names(onnx_path)
+        cfg = MODEL_REGISTRY[model_type]
+        ok, msg, files = quantize_step1('onnx', onnx_path, platform, cfg['mean_values'],
+                                        cfg['std_values'], input_size, dataset_path, work_dir,
+                                        verbose=True, build_options=options)
+        if not ok:
+            raise RuntimeError(msg)
+        model_path, data_path, base_cfg = (files[name] for name in QUANT_FILES)
+        cfg_path = os.path.join(work_dir, 'hybrid.quantization.cfg')
+        accuracy_dir = os.path.join(work_dir, 'accuracy')
+        out_cos = 0.0
+        for it in range(1, max_iters + 1):
+            write_float_layers(base_cfg, cfg_path, [p['layer'] for p in promoted])
+            logger.info(f'[hybrid] 第 {it} 轮：{len(promoted)} 个浮点层，step2 构建 ...')
+            layers = _step2_and_analyze(model_path, data_path, cfg_path, img_lb,
+                                        output_path, accuracy_dir)
+            if not layers:
+                raise RuntimeError('accuracy_analysis 未输出逐层结果')
+            out_cos = _output_cosine(layers, output_names)
+            iterations.append({'iteration': it, 'output_cosine': out_cos,
+                               'float_layers': len(promoted)})
+            logger.info(f'[hybrid] 第 {it} 轮输出余弦相似度 {out_cos:.6f}（目标 {target_cosine}）')
+            if out_cos >= target_cosine:
+                break
+            picks = _pick_layers(layers, {p['layer'] for p in promoted},
+                                 layer_threshold, layers_per_iter)
+            if not picks:
+                logger.warning(f'[hybrid] 没有单层余弦低于 {layer_threshold} 的层可提升，停止迭代')
+                break
+            if it == max_iters:
+                break
+            for cos, l in picks:
+                promoted.append({'layer': l['layer'], 'op': l['op'], 'cos_sim': l['cos_sim'],
+                                 'single_cos': l.get('single_cos'), 'iteration': it})
+                logger.info(f"[hybrid] 提升为 float16：[{l['op']}] {l['layer']}（单层余弦 {cos:.4f}）")
+
+        with open(cfg_path, 'r', encoding='utf-8') as f:
+            cfg_text = f.read()
+    except Exception as e:
+        return {'success': False, 'message': f'混合量化失败：{e}',
+                'promoted': promoted, 'iterations': iterations}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    target_met = out_cos >= target_cosine
+    lines = [f"{'✅ 已达到' if target_met else '⚠️ 未达到'}目标余弦相似度 {target_cosine}："
+             f"输出 {out_cos:.6f}，{len(promoted)} 层提升为 float16（{len(iterations)} 轮）"]
+    for p in promoted:
+        cos = p['single_cos'] if p['single_cos'] is not None else p['cos_sim']
+        lines.append(f"  第 {p['iteration']} 轮 [{p['op']}] {p['layer']}：单层余弦 {cos:.4f} "
+                     f"< {layer_threshold}（整体 {p['cos_sim']:.4f}）")
+    return {'success': True, 'message': '\n'.join(lines), 'output_cosine': out_cos,
+            'target_met': target_met, 'promoted': promoted, 'iterations': iterations,
+            'build_options': options, 'cfg': cfg_text}
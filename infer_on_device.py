@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-RK3576 设备端推理脚本（使用 rknn-toolkit-lite2 / RKNNLite）
+RK3576 设备端推理脚本（默认使用 rknn-toolkit-lite2 / RKNNLite，可切换推理后端）
 
 用法
 ----
@@ -13,11 +13,37 @@ python infer_on_device.py \
     --classes "fire,smoke" \
     --output ./result.jpg
 
+推理后端（--backend）：rknnlite（默认，设备 NPU）/ simulator（x86 rknn-toolkit2）/
+opencv（OpenCV DNN 运行配套 .onnx）/ mock（回放 --save-outputs 录制的张量 + 合成延迟）：
+python infer_on_device.py --model ./model.rknn --image ./test.jpg \
+    --backend mock --mock-outputs ./outputs.npz --mock-latency 12 --benchmark 100
+
+大图切片推理（4k–8k 航拍图等，tile 重叠切分 + 全局 NMS）：
+python infer_on_device.py --model ./obb.rknn --image ./aerial.jpg --type yolov8_obb \
+    --width 1024 --height 1024 --tile --tile-overlap 0.2
+
+批量 / 多输入尺寸模型（转换时指定 batch_size / input_shapes）：不指定 --width / --height 时
+按 .meta.json 选择与图片宽高比最匹配的输入尺寸，--tile-batch 缺省读取 meta 的 batch_size：
+python infer_on_device.py --model ./det_b4.rknn --image ./aerial.jpg --tile
+
+检测 → 分类级联（检测框裁剪后按分类模型 batch 批量分类）：
+python infer_on_device.py --model ./det.rknn --image ./test.jpg --type yolov8_det \
+    --cls-model ./resnet_b8.rknn --cls-batch 8 --cls-classes "a,b,c"
+
+NMS-free 后处理与 yolov8_det（阈值 + NMS）在同一合成负载上的耗时对比（无需模型 / 图片）：
+python infer_on_device.py --compare-postprocess 200 --type yolov10_det --report ./post.json
+
+稳态延迟基准测试（固定预处理输入重复推理，分别统计预处理 / NPU 推理 / 后处理）：
+python infer_on_device.py --model ./model.rknn --image ./test.jpg \
+    --benchmark 200 --warmup 20 --core-mask 0_1_2 --report ./bench.json
+
 模型类型（--type）：
   yolov8_det   YOLOv8 目标检测
   yolov8_seg   YOLOv8 实例分割
   yolov8_pose  YOLOv8 姿态估计
   yolov8_obb   YOLOv8 旋转框检测
+  yolov10_det  YOLOv10 NMS-free 检测（输出 [1,N,6]）
+  yolo11_e2e   YOLO11 end2end 检测（输出 [1,N,6]）
   resnet       图像分类
   retinaface   人脸检测
 
@@ -27,7 +53,8 @@ python infer_on_device.py \
   pip install opencv-python numpy
 """
 
-import os, sys, argparse, time
+import os, sys, json, argparse, time, queue, threading
+from abc import ABC, abstractmethod
 import cv2
 import numpy as np
 
@@ -70,6 +97,12 @@ def letterbox(img_bgr, target_w, target_h):
     return img_rgb, scale, pad_x, pad_y
 
 
+def preprocess(img_bgr, input_w, input_h):
+    """letterbox + 增加 batch 维 → (1, H, W, 3) uint8 NHWC"""
+    img_rgb, scale, pad_x, pad_y = letterbox(img_bgr, input_w, input_h)
+    return np.expand_dims(img_rgb, axis=0), scale, pad_x, pad_y
+
+
 def restore_boxes(boxes_xyxy, scale, pad_x, pad_y, orig_w, orig_h):
     boxes = boxes_xyxy.copy().astype(float)
     boxes[:, [0, 2]] -= pad_x
@@ -109,9 +142,16 @@ def nms(boxes_xyxy, scores, iou_thresh=0.45):
 
 
 # ─────────────────────────────────────────────────────────────
-# rknnopt 格式（6 输出）后处理工具函数
+# rknnopt 格式（分头输出）后处理工具函数
+#   det  : 3 scale × (bbox_dfl[1,64,H,W], cls[1,nc,H,W] [, cls_sum])
+#   seg  : 3 scale × (bbox_dfl, cls, cls_sum, seg_coef[1,32,H,W]) + proto[1,32,H/4,W/4]
+#   pose : 3 scale × [1,64+nc,H,W]（或 bbox/cls 分离）+ kpts[1,17,3,N]
+#   obb  : 3 scale × [1,64+nc,H,W]（或 bbox/cls 分离）+ angle[1,1,N]
+# 分头格式统一解码为对应的标准 ONNX 单张量布局 [1, C, N]，复用下方的 NMS / 绘制逻辑。
 # ─────────────────────────────────────────────────────────────
 
+_DFL_CH = 64    # 4 × reg_max(16)
+
 def _dfl(position):
     """DFL 解码：softmax + 加权求和 → 4 个边界距离（纯 NumPy，无 torch 依赖）"""
     x = position.astype(np.float32)
@@ -126,12 +166,17 @@ def _dfl(position):
     return (y * acc).sum(axis=2)
 
 
+def _make_grid(grid_h, grid_w):
+    """anchor 网格 (1,2,H,W)，通道 0 为列号 x，通道 1 为行号 y"""
+    col = np.tile(np.arange(grid_w)[None, None, None, :], (1, 1, grid_h, 1))
+    row = np.tile(np.arange(grid_h)[None, None, :, None], (1, 1, 1, grid_w))
+    return np.concatenate((col, row), axis=1)
+
+
 def _box_process(position, input_wh=(640, 640)):
     """将 DFL 输出转换为 (x1,y1,x2,y2)，坐标对应 letterbox 后的图像尺寸"""
     grid_h, grid_w = position.shape[2:4]
-    col = np.tile(np.arange(grid_w)[None, None, None, :], (1, 1, grid_h, 1))
-    row = np.tile(np.arange(grid_h)[None, None, :, None], (1, 1, 1, grid_w))
-    grid = np.concatenate((col, row), axis=1)                     # (1,2,H,W)
+    grid = _make_grid(grid_h, grid_w)                             # (1,2,H,W)
     stride = np.array([input_wh[0] // grid_w, input_wh[1] // grid_h],
                       dtype=np.float32).reshape(1, 2, 1, 1)
     pos = _dfl(position)
@@ -152,11 +197,113 @@ def _class_names(names, nc):
     return [f'cls{i}' for i in range(nc)]
 
 
-def postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
-                    input_wh=(640, 640)):
-    oh, ow = img_bgr.shape[:2]
-    class_names = None
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x.astype(np.float32)))
+
 
+def _ensure_prob(x):
+    """rknnopt INT8：sigmoid 已移出，数值超出 [0,1] 时视为 logit 并还原"""
+    if x.size and (x.max() > 1.0 or x.min() < 0.0):
+        return _sigmoid(x)
+    return x
+
+
+def _split_head_branches(head_outputs, n_branch=3):
+    """
+    按 scale 拆分分头输出，返回 [(bbox_dfl, cls, extras), ...]：
+      - 每 scale 1 个张量：[1,64+nc,H,W] 合并格式，按通道切分
+      - 每 scale ≥2 个张量：bbox_dfl, cls, 其余（cls_sum / seg_coef）放入 extras
+    """
+    per = len(head_outputs) // n_branch
+    branches = []
+    for i in range(n_branch):
+        group = head_outputs[per * i: per * (i + 1)]
+        if per == 1:
+            merged = group[0]
+            branches.append((merged[:, :_DFL_CH], merged[:, _DFL_CH:], []))
+        else:
+            branches.append((group[0], group[1], list(group[2:])))
+    return branches
+
+
+def _branch_anchors(position, input_wh):
+    """单个 scale 的 DFL 输出 → (anchor 中心 (HW,2)，stride (HW,2)，ltrb 距离 (HW,4))，均为网格单位"""
+    grid_h, grid_w = position.shape[2:4]
+    anchors = _sp_flatten(_make_grid(grid_h, grid_w)).astype(np.float32) + 0.5
+    stride = np.array([input_wh[0] // grid_w, input_wh[1] // grid_h], dtype=np.float32)
+    dist = _sp_flatten(_dfl(position))
+    return anchors, np.broadcast_to(stride, anchors.shape), dist
+
+
+def _decode_branches(branches, input_wh):
+    """分头 → (anchors, strides, dist, class_scores)，沿 3 个 scale 拼接为 N = Σ H*W"""
+    anchors, strides, dists, scores = [], [], [], []
+    for box_dfl, cls, _ in branches:
+        a, st, d = _branch_anchors(box_dfl, input_wh)
+        anchors.append(a); strides.append(st); dists.append(d)
+        scores.append(_sp_flatten(cls))
+    return (np.concatenate(anchors), np.concatenate(strides),
+            np.concatenate(dists), _ensure_prob(np.concatenate(scores)))
+
+
+def _dist_to_cxcywh(anchors, strides, dist):
+    """ltrb 距离 → letterbox 像素坐标下的 (cx,cy,w,h)"""
+    xy1 = anchors - dist[:, 0:2]
+    xy2 = anchors + dist[:, 2:4]
+    return np.concatenate(((xy1 + xy2) / 2 * strides, (xy2 - xy1) * strides), axis=1)
+
+
+def _split_seg_to_standard(outputs, input_wh):
+    """seg 分头 → [pred[1,4+nc+32,N], proto]"""
+    proto = outputs[-1]
+    branches = _split_head_branches(outputs[:-1])
+    anchors, strides, dist, scores = _decode_branches(branches, input_wh)
+    coef = np.concatenate([_sp_flatten(extras[-1]) for _, _, extras in branches])
+    pred = np.concatenate((_dist_to_cxcywh(anchors, strides, dist), scores, coef), axis=1)
+    return [pred.T[None], proto]
+
+
+def _split_pose_to_standard(outputs, input_wh):
+    """pose 分头 → [pred[1,4+1+51,N]]；关键点分支已在模型内解码为像素坐标"""
+    kpts = outputs[-1]
+    branches = _split_head_branches(outputs[:-1])
+    anchors, strides, dist, scores = _decode_branches(branches, input_wh)
+    kpts = kpts.reshape(-1, kpts.shape[-1]).T.astype(np.float32)      # (N, 17*3)
+    kpts[:, 2::3] = _ensure_prob(kpts[:, 2::3])
+    pred = np.concatenate((_dist_to_cxcywh(anchors, strides, dist), scores, kpts), axis=1)
+    return [pred.T[None]]
+
+
+def _split_obb_to_standard(outputs, input_wh):
+    """obb 分头 → [pred[1,4+nc+1,N]]；角度分支输出 sigmoid 值，按 (a-0.25)·π 还原为弧度"""
+    angle = _ensure_prob(outputs[-1].reshape(-1, 1))
+    angle = (angle - 0.25) * np.pi
+    branches = _split_head_branches(outputs[:-1])
+    anchors, strides, dist, scores = _decode_branches(branches, input_wh)
+    # 旋转框解码（同 ultralytics dist2rbox）：中心偏移按角度旋转，宽高 = lt + rb
+    cos, sin = np.cos(angle), np.sin(angle)
+    xf = (dist[:, 2:3] - dist[:, 0:1]) / 2
+    yf = (dist[:, 3:4] - dist[:, 1:2]) / 2
+    cxcy = (np.concatenate((xf * cos - yf * sin, xf * sin + yf * cos), axis=1) + anchors) * strides
+    wh = (dist[:, 0:2] + dist[:, 2:4]) * strides
+    pred = np.concatenate((cxcy, wh, scores, angle), axis=1)
+    return [pred.T[None]]
+
+
+def _draw_box_label(result, box, label, score, color):
+    x1r, y1r, x2r, y2r = box
+    cv2.rectangle(result, (x1r, y1r), (x2r, y2r), color, 2)
+    txt = f'{label} {score:.2f}'
+    cv2.rectangle(result, (x1r, y1r - 18), (x1r + len(txt) * 9, y1r), color, -1)
+    cv2.putText(result, txt, (x1r + 2, y1r - 4),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.52, (255, 255, 255), 1, cv2.LINE_AA)
+
+
+def decode_det(outputs, conf, input_wh=(640, 640)):
+    """
+    检测输出解码（不含 NMS）。
+    返回 (boxes_xyxy, scores, cls_ids, nc)，坐标位于 letterbox 输入空间，已按 conf 过滤。
+    """
     # ── 格式检测 ──────────────────────────────────────────────
     if len(outputs) >= 6:
         # rknnopt 格式：6 个输出（3 scale × bbox_dfl + class_scores）
@@ -188,28 +335,23 @@ def postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
             class_scores = 1.0 / (1.0 + np.exp(-class_scores.astype(np.float32)))
 
     nc = class_scores.shape[1]
-    class_names = _class_names(names, nc)
     cls_ids    = np.argmax(class_scores, axis=1)
     max_scores = class_scores[np.arange(len(cls_ids)), cls_ids]
 
     mask = max_scores >= conf
-    boxes_xyxy = boxes_xyxy[mask]; max_scores = max_scores[mask]; cls_ids = cls_ids[mask]
+    return boxes_xyxy[mask], max_scores[mask], cls_ids[mask], nc
 
-    keep = nms(boxes_xyxy, max_scores, iou)
-    boxes_xyxy = boxes_xyxy[keep]; max_scores = max_scores[keep]; cls_ids = cls_ids[keep]
-    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, ow, oh)
 
+def _render_det(img_bgr, boxes_orig, scores, cls_ids, class_names, labels=None):
+    """labels 不为空时逐框覆盖显示的标签（级联分类结果）"""
     result = img_bgr.copy()
     dets = []
-    for i, (box, score, cid) in enumerate(zip(boxes_orig, max_scores, cls_ids)):
+    for i, (box, score, cid) in enumerate(zip(boxes_orig, scores, cls_ids)):
         x1r, y1r, x2r, y2r = map(int, box)
         label = class_names[cid] if cid < len(class_names) else f'cls{cid}'
-        color = _color(cid)
-        cv2.rectangle(result, (x1r, y1r), (x2r, y2r), color, 2)
-        txt = f'{label} {score:.2f}'
-        cv2.rectangle(result, (x1r, y1r - 18), (x1r + len(txt) * 9, y1r), color, -1)
-        cv2.putText(result, txt, (x1r + 2, y1r - 4),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.52, (255, 255, 255), 1, cv2.LINE_AA)
+        if labels is not None:
+            label = labels[i]
+        _draw_box_label(result, (x1r, y1r, x2r, y2r), label, score, _color(cid))
         dets.append({'label': label, 'score': float(score),
                      'box': [x1r, y1r, x2r, y2r]})
 
@@ -219,13 +361,111 @@ def postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
     return result, summary, dets
 
 
-def postprocess_seg(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names):
-    # 仅处理检测头；分割 mask 需要原型，暂简化
-    return postprocess_det([outputs[0]], img_bgr, scale, pad_x, pad_y, conf, iou, names)
+def postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
+                    input_wh=(640, 640)):
+    oh, ow = img_bgr.shape[:2]
+    boxes_xyxy, max_scores, cls_ids, nc = decode_det(outputs, conf, input_wh)
+
+    keep = nms(boxes_xyxy, max_scores, iou)
+    boxes_xyxy = boxes_xyxy[keep]; max_scores = max_scores[keep]; cls_ids = cls_ids[keep]
+    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, ow, oh)
+    return _render_det(img_bgr, boxes_orig, max_scores, cls_ids, _class_names(names, nc))
+
+
+# NMS-free 端到端检测头（YOLOv10 one-to-one / YOLO11 end2end）：
+# 单输出 top-k [1, N, 6] = (x1, y1, x2, y2, score, cls)，位于 letterbox 输入空间
+E2E_TYPES = ('yolov10_det', 'yolo11_e2e')
+
+
+def decode_e2e(outputs, conf):
+    """
+    端到端输出解码：只按 conf 过滤，不需要 NMS。
+    返回 (boxes_xyxy, scores, cls_ids, nc)，nc 取出现的最大类别 id + 1。
+    """
+    pred = outputs[0]
+    if pred.ndim == 3:
+        pred = pred[0]
+    if pred.shape[-1] != 6 and pred.shape[0] == 6:
+        pred = pred.T          # 兼容 [6, N] 布局
+    pred = pred.astype(np.float32, copy=False)
+    mask = pred[:, 4] >= conf
+    pred = pred[mask]
+    cls_ids = pred[:, 5].astype(np.int64)
+    nc = int(cls_ids.max()) + 1 if len(cls_ids) else 0
+    return pred[:, :4], pred[:, 4], cls_ids, nc
+
+
+def postprocess_e2e(outputs, img_bgr, scale, pad_x, pad_y, conf, names):
+    oh, ow = img_bgr.shape[:2]
+    boxes_xyxy, scores, cls_ids, nc = decode_e2e(outputs, conf)
+    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, ow, oh)
+    return _render_det(img_bgr, boxes_orig, scores, cls_ids, _class_names(names, nc))
+
+
+def postprocess_seg(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
+                    input_wh=(640, 640)):
+    oh, ow = img_bgr.shape[:2]
+    if len(outputs) > 2:
+        # rknnopt 分头格式：13 个输出（3 scale × 4 + proto）
+        outputs = _split_seg_to_standard(outputs, input_wh)
+
+    # 标准格式：outputs[0] = (1, 4+nc+32, N)，outputs[1] = proto (1, 32, H/4, W/4)
+    pred = outputs[0]
+    if pred.ndim == 3:
+        pred = pred[0]
+    pred = pred.T
+    proto = outputs[1][0].astype(np.float32)
+    nm, mh, mw = proto.shape
+    nc = pred.shape[1] - 4 - nm
+    class_names = _class_names(names, nc)
+
+    cx, cy, bw, bh = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+    boxes_xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+    class_scores = _ensure_prob(pred[:, 4:4 + nc])
+    coefs = pred[:, 4 + nc:]
+    cls_ids = np.argmax(class_scores, axis=1)
+    max_scores = class_scores[np.arange(len(cls_ids)), cls_ids]
+
+    mask = max_scores >= conf
+    boxes_xyxy, max_scores, cls_ids, coefs = boxes_xyxy[mask], max_scores[mask], cls_ids[mask], coefs[mask]
+    keep = nms(boxes_xyxy, max_scores, iou)
+    boxes_xyxy, max_scores, cls_ids, coefs = boxes_xyxy[keep], max_scores[keep], cls_ids[keep], coefs[keep]
+    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, ow, oh)
+
+    # 掩码：sigmoid(coef · proto) → letterbox 尺寸 → 去 padding → 原图尺寸，并裁剪到检测框内
+    result = img_bgr.copy()
+    if len(coefs):
+        masks = _sigmoid(coefs @ proto.reshape(nm, -1)).reshape(-1, mh, mw)
+        nw, nh = int(ow * scale), int(oh * scale)
+        overlay = result.copy()
+        for m, box, cid in zip(masks, boxes_orig, cls_ids):
+            m = cv2.resize(m, tuple(input_wh))[pad_y:pad_y + nh, pad_x:pad_x + nw]
+            m = cv2.resize(m, (ow, oh)) > 0.5
+            x1r, y1r, x2r, y2r = map(int, box)
+            region = np.zeros_like(m)
+            region[y1r:y2r, x1r:x2r] = True
+            overlay[m & region] = _color(cid)
+        result = cv2.addWeighted(overlay, 0.45, result, 0.55, 0)
+
+    dets = []
+    for box, score, cid in zip(boxes_orig, max_scores, cls_ids):
+        x1r, y1r, x2r, y2r = map(int, box)
+        label = class_names[cid] if cid < len(class_names) else f'cls{cid}'
+        _draw_box_label(result, (x1r, y1r, x2r, y2r), label, score, _color(cid))
+        dets.append({'label': label, 'score': float(score),
+                     'box': [x1r, y1r, x2r, y2r]})
+
+    summary = f'检测到 {len(dets)} 个实例'
+    for d in dets:
+        summary += f'\n  {d["label"]}  {d["score"]:.3f}  {d["box"]}'
+    return result, summary, dets
 
 
-def postprocess_pose(outputs, img_bgr, scale, pad_x, pad_y, conf, iou):
+def postprocess_pose(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, input_wh=(640, 640)):
     oh, ow = img_bgr.shape[:2]
+    if len(outputs) > 1:
+        # rknnopt 分头格式：3 scale 检测分支 + 关键点分支
+        outputs = _split_pose_to_standard(outputs, input_wh)
     pred = outputs[0]
     if pred.ndim == 3:
         pred = pred[0]
@@ -268,44 +508,45 @@ def postprocess_pose(outputs, img_bgr, scale, pad_x, pad_y, conf, iou):
     return result, summary, dets
 
 
-def postprocess_obb(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names):
-    oh, ow = img_bgr.shape[:2]
+def decode_obb(outputs, conf, input_wh=(640, 640)):
+    """
+    旋转框输出解码（不含 NMS）。
+    返回 (rboxes, scores, cls_ids, nc)；rboxes 为 (K,5) 的 cx,cy,w,h,angle(rad)，letterbox 输入空间。
+    """
+    if len(outputs) > 1:
+        # rknnopt 分头格式：3 scale 检测分支 + 角度分支
+        outputs = _split_obb_to_standard(outputs, input_wh)
     pred = outputs[0]
     if pred.ndim == 3:
         pred = pred[0]
     pred = pred.T   # (8400, 4+nc+1)
     nc = pred.shape[1] - 5
-    class_names = _class_names(names, nc)
 
-    cx, cy, bw, bh = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
     class_scores = pred[:, 4:4 + nc]
     # RKNN INT8 设备端：sigmoid 被移出模型，需手动还原
     if class_scores.max() > 1.0 or class_scores.min() < 0.0:
         class_scores = 1.0 / (1.0 + np.exp(-class_scores.astype(np.float32)))
-    angles = pred[:, 4 + nc]
     cls_ids = np.argmax(class_scores, axis=1)
     max_scores = class_scores[np.arange(len(cls_ids)), cls_ids]
 
     mask = max_scores >= conf
-    cx, cy, bw, bh = cx[mask], cy[mask], bw[mask], bh[mask]
-    max_scores, cls_ids, angles = max_scores[mask], cls_ids[mask], angles[mask]
+    rboxes = np.concatenate((pred[mask, 0:4], pred[mask, 4 + nc:5 + nc]), axis=1)
+    return rboxes, max_scores[mask], cls_ids[mask], nc
 
-    x1 = cx - bw / 2;  y1 = cy - bh / 2
-    x2 = cx + bw / 2;  y2 = cy + bh / 2
-    boxes_xyxy = np.stack([x1, y1, x2, y2], axis=1)
-    keep = nms(boxes_xyxy, max_scores, iou)
 
+def _rbox_to_xyxy(rboxes):
+    """旋转框的外接轴对齐框（近似 NMS 用）"""
+    cx, cy, bw, bh = rboxes[:, 0], rboxes[:, 1], rboxes[:, 2], rboxes[:, 3]
+    return np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+
+
+def _render_obb(img_bgr, rboxes_orig, scores, cls_ids, class_names):
     result = img_bgr.copy()
     dets = []
-    for k in keep:
-        cxk = (cx[k] - pad_x) / scale
-        cyk = (cy[k] - pad_y) / scale
-        bwk = bw[k] / scale;  bhk = bh[k] / scale
-        angle = float(angles[k])
+    for (cxk, cyk, bwk, bhk, angle), score, cid in zip(rboxes_orig, scores, cls_ids):
         rect = ((float(cxk), float(cyk)), (float(bwk), float(bhk)),
                 float(np.degrees(angle)))
         pts = cv2.boxPoints(rect).astype(int)
-        cid = cls_ids[k]; score = max_scores[k]
         color = _color(cid)
         cv2.drawContours(result, [pts], 0, color, 2)
         label = class_names[cid] if cid < len(class_names) else f'cls{cid}'
@@ -317,6 +558,17 @@ def postprocess_obb(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names):
     return result, summary, dets
 
 
+def postprocess_obb(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
+                    input_wh=(640, 640)):
+    rboxes, max_scores, cls_ids, nc = decode_obb(outputs, conf, input_wh)
+    keep = nms(_rbox_to_xyxy(rboxes), max_scores, iou)
+    rboxes = rboxes[keep].astype(np.float32)
+    rboxes[:, 0] = (rboxes[:, 0] - pad_x) / scale
+    rboxes[:, 1] = (rboxes[:, 1] - pad_y) / scale
+    rboxes[:, 2:4] /= scale
+    return _render_obb(img_bgr, rboxes, max_scores[keep], cls_ids[keep], _class_names(names, nc))
+
+
 def postprocess_resnet(outputs, img_bgr, names, topk=5):
     logits = outputs[0].flatten()
     nc = len(logits)
@@ -339,27 +591,734 @@ def postprocess_resnet(outputs, img_bgr, names, topk=5):
     return result, summary.rstrip(), dets
 
 
+def postprocess(model_type, outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names,
+                input_wh=(640, 640)):
+    """按模型类型分发后处理，返回 (result, summary, dets)"""
+    if model_type == 'yolov8_det':
+        return postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names, input_wh)
+    if model_type in E2E_TYPES:
+        return postprocess_e2e(outputs, img_bgr, scale, pad_x, pad_y, conf, names)
+    if model_type == 'yolov8_seg':
+        return postprocess_seg(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names, input_wh)
+    if model_type == 'yolov8_pose':
+        return postprocess_pose(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, input_wh)
+    if model_type == 'yolov8_obb':
+        return postprocess_obb(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names, input_wh)
+    if model_type == 'resnet':
+        return postprocess_resnet(outputs, img_bgr, names)
+    if model_type == 'retinaface':
+        # 简化：直接展示各输出张量形状
+        lines = ['RetinaFace 输出张量：']
+        for i, o in enumerate(outputs):
+            lines.append(f'  output[{i}]: shape={list(o.shape)}'
+                         f'  min={o.min():.3f}  max={o.max():.3f}')
+        return img_bgr.copy(), '\n'.join(lines), []
+    lines = [f'未知模型类型 {model_type}，原始输出摘要：']
+    for i, o in enumerate(outputs):
+        lines.append(f'  output[{i}]: shape={list(o.shape)}')
+    return img_bgr.copy(), '\n'.join(lines), []
+
+
 # ─────────────────────────────────────────────────────────────
-# 主流程
+# 切片（tiled）推理：大图按输入尺寸切成重叠 tile，逐批送入后端，
+# 各 tile 结果映射回全图坐标后统一做一次全局 NMS
 # ─────────────────────────────────────────────────────────────
 
-def run(args):
-    # 导入 RKNNLite（只在设备端有效）
+TILED_TYPES = ('yolov8_det', 'yolov8_obb') + E2E_TYPES
+MAX_TILE_OVERLAP = 0.5      # 重叠过大时 tile 数按 1/(1-overlap)² 增长
+
+
+def check_tile_overlap(overlap):
+    """overlap 须在 [0, MAX_TILE_OVERLAP] 内：≥ 1 时步长退化为 1 像素，负数会在 tile 之间留下空隙"""
+    if not 0 <= overlap <= MAX_TILE_OVERLAP:
+        raise ValueError(f'tile 重叠比例须在 0 ~ {MAX_TILE_OVERLAP} 之间，收到 {overlap}')
+
+
+def make_tiles(img_w, img_h, tile_w, tile_h, overlap=0.2):
+    """返回覆盖全图的 tile 列表 [(x0, y0, x1, y1)]，相邻 tile 重叠 overlap 比例，最后一行/列贴边"""
+    check_tile_overlap(overlap)
+
+    def _starts(size, tile):
+        if size <= tile:
+            return [0]
+        step = max(1, int(tile * (1 - overlap)))
+        starts = list(range(0, size - tile + 1, step))
+        if starts[-1] + tile < size:
+            starts.append(size - tile)
+        return starts
+
+    return [(x, y, min(x + tile_w, img_w), min(y + tile_h, img_h))
+            for y in _starts(img_h, tile_h) for x in _starts(img_w, tile_w)]
+
+
+def _tile_batches(img_bgr, tiles, input_w, input_h, batch):
+    """逐批裁剪 + letterbox；不足一批时用空白 tile 补齐（RKNN 模型 batch 固定）"""
+    for i in range(0, len(tiles), batch):
+        chunk = tiles[i:i + batch]
+        inputs, metas = [], []
+        for x0, y0, x1, y1 in chunk:
+            img_rgb, scale, pad_x, pad_y = letterbox(img_bgr[y0:y1, x0:x1], input_w, input_h)
+            inputs.append(img_rgb)
+            metas.append((scale, pad_x, pad_y))
+        while len(inputs) < batch:
+            inputs.append(np.zeros_like(inputs[0]))
+        yield chunk, np.stack(inputs), metas
+
+
+def prefetch(gen, depth=2):
+    """后台线程预取生成器结果，使下一批 tile 的预处理与当前批的推理重叠（inferencer 共用）"""
+    q = queue.Queue(maxsize=depth)
+    done = object()
+
+    def _producer():
+        try:
+            for item in gen:
+                q.put(item)
+        except BaseException as e:     # 异常转交给消费者线程抛出
+            q.put(e)
+        q.put(done)
+
+    threading.Thread(target=_producer, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+def run_tiled(backend, img_bgr, model_type, input_wh, conf, iou, names,
+              overlap=0.2, batch=1):
+    """
+    切片推理（det / obb / 端到端 det）。返回 (result, summary, dets, stats)，
+    端到端模型单 tile 内无需 NMS，但 tile 重叠区域的重复框仍需全局 NMS 合并。
+    stats 含 tile 数与推理 / 总耗时（ms）。
+    """
+    if model_type not in TILED_TYPES:
+        raise ValueError(f'切片推理仅支持 {", ".join(TILED_TYPES)}')
+    input_w, input_h = input_wh
+    oh, ow = img_bgr.shape[:2]
+    tiles = make_tiles(ow, oh, input_w, input_h, overlap)
+
+    all_boxes, all_scores, all_cls = [], [], []
+    nc = 0
+    infer_ns = 0
+    t_start = time.perf_counter_ns()
+    for chunk, batch_input, metas in prefetch(_tile_batches(img_bgr, tiles, input_w, input_h, batch)):
+        t0 = time.perf_counter_ns()
+        outputs = backend.inference(batch_input)
+        infer_ns += time.perf_counter_ns() - t0
+        for i, ((x0, y0, x1, y1), (scale, pad_x, pad_y)) in enumerate(zip(chunk, metas)):
+            tile_outputs = [o[i:i + 1] for o in outputs] if batch > 1 else outputs
+            if model_type != 'yolov8_obb':
+                if model_type in E2E_TYPES:
+                    boxes, scores, cls_ids, tile_nc = decode_e2e(tile_outputs, conf)
+                    nc = max(nc, tile_nc)
+                else:
+                    boxes, scores, cls_ids, nc = decode_det(tile_outputs, conf, input_wh)
+                boxes = restore_boxes(boxes, scale, pad_x, pad_y, x1 - x0, y1 - y0)
+                boxes[:, [0, 2]] += x0
+                boxes[:, [1, 3]] += y0
+            else:
+                boxes, scores, cls_ids, nc = decode_obb(tile_outputs, conf, input_wh)
+                boxes = boxes.astype(np.float32)
+                boxes[:, 0] = (boxes[:, 0] - pad_x) / scale + x0
+                boxes[:, 1] = (boxes[:, 1] - pad_y) / scale + y0
+                boxes[:, 2:4] /= scale
+            all_boxes.append(boxes); all_scores.append(scores); all_cls.append(cls_ids)
+
+    boxes = np.concatenate(all_boxes) if all_boxes else np.zeros((0, 4), np.float32)
+    scores = np.concatenate(all_scores) if all_scores else np.zeros((0,), np.float32)
+    cls_ids = np.concatenate(all_cls) if all_cls else np.zeros((0,), np.int64)
+    class_names = _class_names(names, nc)
+    if model_type != 'yolov8_obb':
+        keep = nms(boxes, scores, iou)
+        result, summary, dets = _render_det(img_bgr, boxes[keep], scores[keep], cls_ids[keep], class_names)
+    else:
+        keep = nms(_rbox_to_xyxy(boxes), scores, iou)
+        result, summary, dets = _render_obb(img_bgr, boxes[keep], scores[keep], cls_ids[keep], class_names)
+    stats = {
+        'tiles': len(tiles),
+        'infer_ms': infer_ns / 1e6,
+        'total_ms': (time.perf_counter_ns() - t_start) / 1e6,
+    }
+    summary += f'\n（切片推理：{len(tiles)} 个 tile，重叠 {overlap:.0%}，全局 NMS 合并）'
+    return result, summary, dets, stats
+
+
+# ─────────────────────────────────────────────────────────────
+# 检测 → 分类级联：检测框裁剪后合并为一个 batch 缓冲区，
+# 分类模型每帧只调用 ceil(K / batch) 次，而不是每个框调用一次
+# ─────────────────────────────────────────────────────────────
+
+def _softmax(logits):
+    x = logits.astype(np.float32)
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def crop_batch(img_bgr, boxes_orig, cls_w=224, cls_h=224, out=None):
+    """
+    将检测框裁剪并缩放到分类输入尺寸，写入 (K, cls_h, cls_w, 3) uint8 RGB 缓冲区
+    （NHWC，RKNNLite 的输入布局；等价于 NCHW 的 [K,3,H,W]）。
+    out 容量足够时复用，避免逐帧分配。
+    """
+    k = len(boxes_orig)
+    if out is None or out.shape[0] < k or out.shape[1:3] != (cls_h, cls_w):
+        out = np.empty((max(k, 1), cls_h, cls_w, 3), dtype=np.uint8)
+    oh, ow = img_bgr.shape[:2]
+    for i, box in enumerate(boxes_orig):
+        x1, y1, x2, y2 = [int(v) for v in box]
+        x1, y1 = min(max(0, x1), ow - 1), min(max(0, y1), oh - 1)
+        x2, y2 = min(ow, max(x2, x1 + 1)), min(oh, max(y2, y1 + 1))
+        crop = cv2.resize(img_bgr[y1:y2, x1:x2], (cls_w, cls_h), interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=out[i])
+    return out
+
+
+def classify_crops(cls_backend, crops, k, batch=1):
+    """分类 K 个裁剪图，按模型构建 batch 分块推理（不足一块时补零）。返回 (cls_ids, probs, 调用次数)"""
+    if k == 0:
+        return np.zeros((0,), np.int64), np.zeros((0,), np.float32), 0
+    logits, calls = [], 0
+    for i in range(0, k, batch):
+        n = min(batch, k - i)
+        chunk = crops[i:i + n]
+        if n < batch:
+            chunk = np.concatenate([chunk, np.zeros((batch - n,) + chunk.shape[1:], chunk.dtype)])
+        out = cls_backend.inference(chunk)[0]
+        logits.append(out.reshape(out.shape[0], -1)[:n])
+        calls += 1
+    probs = _softmax(np.concatenate(logits))
+    cls_ids = probs.argmax(axis=1)
+    return cls_ids, probs[np.arange(k), cls_ids], calls
+
+
+def run_cascade(det_backend, cls_backend, img_bgr, input_wh, conf, iou, names,
+                cls_names, cls_wh=(224, 224), cls_batch=1):
+    """检测 → 裁剪 → 批量分类，分类结果附加到检测结果中。返回 (result, summary, dets, stats)"""
+    oh, ow = img_bgr.shape[:2]
+    t0 = time.perf_counter_ns()
+    img_input, scale, pad_x, pad_y = preprocess(img_bgr, *input_wh)
+    outputs = infer_single(det_backend, img_input)
+    t1 = time.perf_counter_ns()
+    boxes, scores, cls_ids, nc = decode_det(outputs, conf, input_wh)
+    keep = nms(boxes, scores, iou)
+    boxes, scores, cls_ids = boxes[keep], scores[keep], cls_ids[keep]
+    boxes_orig = restore_boxes(boxes, scale, pad_x, pad_y, ow, oh)
+
+    t2 = time.perf_counter_ns()
+    crops = crop_batch(img_bgr, boxes_orig, *cls_wh)
+    sub_ids, sub_scores, calls = classify_crops(cls_backend, crops, len(boxes_orig), cls_batch)
+    t3 = time.perf_counter_ns()
+
+    det_names = _class_names(names, nc)
+    sub_names = list(cls_names) if cls_names else []
+    labels = []       # (检测类别, 分类类别)，类别名本身可能含 '/'，显示文字只用于绘制
+    for cid, sid in zip(cls_ids, sub_ids):
+        det_label = det_names[cid] if cid < len(det_names) else f'cls{cid}'
+        sub_label = sub_names[sid] if sid < len(sub_names) else f'class_{sid}'
+        labels.append((det_label, sub_label))
+    result, _, dets = _render_det(img_bgr, boxes_orig, scores, cls_ids, det_names,
+                                  labels=[f'{a}/{b}' for a, b in labels])
+    for d, (det_label, sub_label), sid, sscore in zip(dets, labels, sub_ids, sub_scores):
+        d['label'] = det_label
+        d['cls_label'] = sub_label
+        d['cls_id'] = int(sid)
+        d['cls_score'] = float(sscore)
+
+    summary = f'检测到 {len(dets)} 个目标，分类调用 {calls} 次（batch={cls_batch}）'
+    for d in dets:
+        summary += f'\n  {d["label"]} {d["score"]:.3f} → {d["cls_label"]} {d["cls_score"]:.3f}  {d["box"]}'
+    stats = {
+        'det_ms': (t1 - t0) / 1e6,
+        'cls_ms': (t3 - t2) / 1e6,
+        'cls_calls': calls,
+        'crops': len(dets),
+    }
+    return result, summary, dets, stats
+
+
+# ─────────────────────────────────────────────────────────────
+# 推理后端
+#   rknnlite  设备端 NPU（rknn-toolkit-lite2）
+#   simulator x86 rknn-toolkit2 模拟器（使用配套 .onnx 重新 build）
+#   opencv    OpenCV DNN 直接运行配套 .onnx（CPU，无需任何 RKNN 依赖）
+#   mock      回放录制的输出张量 + 可配置的合成延迟（CI / 无板卡开发用）
+# ─────────────────────────────────────────────────────────────
+
+class InferenceBackend(ABC):
+    """推理后端接口：load() → inference(img_input) → release()
+
+    img_input 统一为 letterbox 后的 (N, H, W, 3) uint8 RGB（NHWC），
+    inference() 返回与 RKNNLite.inference 相同的 list[np.ndarray]。
+    batch 为模型构建 batch：批量模型每次推理须输入 batch 张（见 infer_single）。
+    """
+    name = 'base'
+    batch = 1
+
+    @abstractmethod
+    def load(self):
+        """加载模型；失败时抛出 RuntimeError"""
+
+    @abstractmethod
+    def inference(self, img_input):
+        """(N, H, W, 3) uint8 输入 → list[np.ndarray]"""
+
+    def release(self):
+        pass
+
+
+def infer_single(backend, img_input):
+    """单张 (1, H, W, 3) 输入：批量模型复制到 batch 张推理，只保留第一张的输出"""
+    if backend.batch <= 1:
+        return backend.inference(img_input)
+    outputs = backend.inference(np.repeat(img_input, backend.batch, axis=0))
+    return [o[:1] for o in outputs]
+
+
+def _companion_onnx(model_path, meta):
+    """查找与 .rknn 配套的 .onnx（优先同目录同名，其次 meta 中记录的路径）"""
+    candidates = [os.path.splitext(model_path)[0] + '.onnx']
+    if meta.get('onnx_path'):
+        candidates.append(meta['onnx_path'])
+        candidates.append(os.path.join(os.path.dirname(model_path),
+                                       os.path.basename(meta['onnx_path'])))
+    for c in candidates:
+        if c and os.path.exists(c):
+            return c
+    raise RuntimeError(f'找不到 {os.path.basename(model_path)} 的配套 ONNX 文件')
+
+
+class RKNNLiteBackend(InferenceBackend):
+    name = 'rknnlite'
+
+    def __init__(self, model_path, core_mask='auto', batch=1):
+        self.model_path = model_path
+        self.core_mask = core_mask
+        self.batch = batch
+        self._rknn = None
+
+    def load(self):
+        try:
+            from rknnlite.api import RKNNLite
+        except ImportError:
+            raise RuntimeError('rknnlite 未安装。请在设备上安装 rknn-toolkit-lite2：'
+                               'pip install rknn_toolkit_lite2-*.whl')
+        self._rknn = RKNNLite(verbose=False)
+        ret = self._rknn.load_rknn(self.model_path)
+        if ret != 0:
+            raise RuntimeError(f'load_rknn 失败，返回码 {ret}')
+        ret = self._rknn.init_runtime(core_mask=getattr(RKNNLite, _CORE_MASKS[self.core_mask]))
+        if ret != 0:
+            raise RuntimeError(f'init_runtime 失败，返回码 {ret}')
+
+    def inference(self, img_input):
+        return self._rknn.inference(inputs=[img_input], data_format='nhwc')
+
+    def release(self):
+        if self._rknn is not None:
+            self._rknn.release()
+            self._rknn = None
+
+
+class SimulatorBackend(InferenceBackend):
+    """
+    rknn-toolkit2 模拟器：.rknn 无法在 x86 上直接运行，使用配套 ONNX 重新 build。
+    批量模型按 meta 的 batch_size 以 rknn_batch_size 构建；多输入尺寸模型的配套 ONNX
+    为动态尺寸，按本次 input_w × input_h 加载。
+    """
+    name = 'simulator'
+
+    def __init__(self, model_path, meta, input_w, input_h):
+        self.model_path = model_path
+        self.meta = meta
+        self.input_w, self.input_h = input_w, input_h
+        self.batch = int(meta.get('batch_size', 1))
+        self._rknn = None
+
+    def load(self):
+        try:
+            from rknn.api import RKNN
+        except ImportError:
+            raise RuntimeError('未安装 rknn-toolkit2：请运行 pip install rknn-toolkit2')
+        onnx_path = _companion_onnx(self.model_path, self.meta)
+        self._rknn = RKNN(verbose=False)
+        ret = self._rknn.config(mean_values=self.meta.get('mean_values') or [[0, 0, 0]],
+                                std_values=self.meta.get('std_values') or [[255, 255, 255]],
+                                target_platform=self.meta.get('platform') or 'rk3576')
+        if ret != 0:
+            raise RuntimeError(f'RKNN config 失败，返回码 {ret}')
+        ret = self._rknn.load_onnx(model=onnx_path,
+                                   input_size_list=[[1, 3, self.input_h, self.input_w]])
+        if ret != 0:
+            raise RuntimeError(f'load_onnx 失败，返回码 {ret}')
+        ret = self._rknn.build(do_quantization=False,
+                               **({'rknn_batch_size': self.batch} if self.batch > 1 else {}))
+        if ret != 0:
+            raise RuntimeError(f'RKNN build 失败，返回码 {ret}')
+        ret = self._rknn.init_runtime()
+        if ret != 0:
+            raise RuntimeError(f'init_runtime 失败，返回码 {ret}')
+
+    def inference(self, img_input):
+        return self._rknn.inference(inputs=[img_input])
+
+    def release(self):
+        if self._rknn is not None:
+            self._rknn.release()
+            self._rknn = None
+
+
+class OpenCVDnnBackend(InferenceBackend):
+    """OpenCV DNN 运行配套 ONNX；mean/std 按 meta 在主机侧归一化（RKNN 中由 NPU 完成）"""
+    name = 'opencv'
+
+    def __init__(self, model_path, meta):
+        self.model_path = model_path
+        self.meta = meta
+        self._net = None
+        self._out_names = None
+
+    def load(self):
+        onnx_path = _companion_onnx(self.model_path, self.meta)
+        self._net = cv2.dnn.readNetFromONNX(onnx_path)
+        self._out_names = self._net.getUnconnectedOutLayersNames()
+        mean = np.asarray(self.meta.get('mean_values') or [[0, 0, 0]], dtype=np.float32)
+        std = np.asarray(self.meta.get('std_values') or [[255, 255, 255]], dtype=np.float32)
+        self._mean = mean.reshape(1, 3, 1, 1)
+        self._std = std.reshape(1, 3, 1, 1)
+
+    def inference(self, img_input):
+        blob = img_input.transpose(0, 3, 1, 2).astype(np.float32)    # NHWC → NCHW
+        blob = (blob - self._mean) / self._std
+        self._net.setInput(np.ascontiguousarray(blob))
+        return list(self._net.forward(self._out_names))
+
+    def release(self):
+        self._net = None
+
+
+def _synthetic_outputs(model_type, input_w, input_h, seed=0, nc=80, peaks=32):
+    """
+    按模型类型生成确定性的合成输出（标准 ONNX 单输出格式），用于未录制时的 mock。
+    peaks 为超过默认阈值的 anchor 数；端到端类型由同种子的 yolov8_det 输出取 top-k 得到，
+    两者描述的是同一批候选框。
+    """
+    if model_type in E2E_TYPES:
+        det = _synthetic_outputs('yolov8_det', input_w, input_h, seed, nc, peaks)
+        return [_det_to_e2e(det)]
+    rng = np.random.default_rng(seed)
+    n = sum((input_w // s) * (input_h // s) for s in (8, 16, 32))
+
+    def _boxes():
+        cxcy = rng.random((2, n), dtype=np.float32) * np.array([[input_w], [input_h]], np.float32)
+        wh = 8 + rng.random((2, n), dtype=np.float32) * 120
+        return np.concatenate([cxcy, wh], axis=0)
+
+    def _scores(c, k=peaks):
+        # 大部分 anchor 低分，k 个 anchor 超过默认阈值，使 NMS / 绘制路径被真实执行
+        scores = rng.random((c, n), dtype=np.float32) * 0.05
+        scores[rng.integers(0, c, k), rng.integers(0, n, k)] = rng.uniform(0.3, 0.95, k)
+        return scores
+
+    if model_type == 'yolov8_det':
+        return [np.concatenate([_boxes(), _scores(nc)])[None]]
+    if model_type == 'yolov8_seg':
+        coef = rng.standard_normal((32, n), dtype=np.float32)
+        proto = rng.standard_normal((1, 32, input_h // 4, input_w // 4), dtype=np.float32)
+        return [np.concatenate([_boxes(), _scores(nc), coef])[None], proto]
+    if model_type == 'yolov8_pose':
+        kpts = rng.random((51, n), dtype=np.float32) * max(input_w, input_h)
+        return [np.concatenate([_boxes(), _scores(1), kpts])[None]]
+    if model_type == 'yolov8_obb':
+        angle = (rng.random((1, n), dtype=np.float32) - 0.25) * np.pi
+        return [np.concatenate([_boxes(), _scores(15), angle])[None]]
+    if model_type == 'resnet':
+        return [rng.standard_normal((1, 1000), dtype=np.float32)]
+    return [rng.standard_normal((1, n, k), dtype=np.float32) for k in (4, 2, 10)]
+
+
+def _det_to_e2e(det_outputs, topk=300):
+    """标准 det 输出 [1, 4+nc, N] → 端到端 [1, topk, 6]，模拟 one-to-one 头的 top-k 选择"""
+    pred = det_outputs[0][0].T
+    scores = pred[:, 4:]
+    cls_ids = scores.argmax(axis=1)
+    best = scores[np.arange(len(cls_ids)), cls_ids]
+    idx = np.argsort(-best)[:topk]
+    cx, cy, bw, bh = pred[idx, 0], pred[idx, 1], pred[idx, 2], pred[idx, 3]
+    out = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2,
+                    best[idx], cls_ids[idx].astype(np.float32)], axis=1)
+    return out[None].astype(np.float32)
+
+
+class MockBackend(InferenceBackend):
+    """
+    确定性 mock：回放 --mock-outputs 指定的 .npz（由 --save-outputs 在真机上录制），
+    未指定时按模型类型生成固定种子的合成输出。每次 inference() 按
+    latency_ms ± jitter_ms 忙等，模拟 NPU 耗时（jitter 由固定种子生成，可复现）。
+    """
+    name = 'mock'
+
+    def __init__(self, model_type, input_w, input_h, outputs_path='',
+                 latency_ms=0.0, jitter_ms=0.0, seed=0):
+        self.model_type = model_type
+        self.input_w, self.input_h = input_w, input_h
+        self.outputs_path = outputs_path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.seed = seed
+        self._outputs = None
+        self._rng = None
+
+    def load(self):
+        if self.outputs_path:
+            if not os.path.exists(self.outputs_path):
+                raise RuntimeError(f'mock 输出文件不存在：{self.outputs_path}')
+            with np.load(self.outputs_path) as data:
+                keys = sorted(data.files, key=lambda k: int(k.split('_')[-1]))
+                self._outputs = [data[k] for k in keys]
+        else:
+            self._outputs = _synthetic_outputs(self.model_type, self.input_w,
+                                               self.input_h, seed=self.seed)
+        self._rng = np.random.default_rng(self.seed)
+
+    def inference(self, img_input):
+        delay_ms = self.latency_ms
+        if self.jitter_ms:
+            delay_ms += float(self._rng.uniform(-self.jitter_ms, self.jitter_ms))
+        if delay_ms > 0:
+            deadline = time.perf_counter_ns() + int(delay_ms * 1e6)
+            while time.perf_counter_ns() < deadline:
+                pass
+        batch = img_input.shape[0] if img_input is not None else 1
+        # 录制的是 batch=1 输出时，按输入 batch 复制，便于模拟批量模型
+        return [np.repeat(o, batch, axis=0) if o.shape[0] == 1 and batch > 1 else o.copy()
+                for o in self._outputs]
+
+
+BACKENDS = ('rknnlite', 'simulator', 'opencv', 'mock')
+
+
+def create_backend(args, meta):
+    """根据 --backend 创建推理后端（尚未 load）"""
+    if args.backend == 'rknnlite':
+        return RKNNLiteBackend(args.model, core_mask=args.core_mask,
+                               batch=int(meta.get('batch_size', 1)))
+    if args.backend == 'simulator':
+        return SimulatorBackend(args.model, meta, args.width, args.height)
+    if args.backend == 'opencv':
+        return OpenCVDnnBackend(args.model, meta)
+    if args.backend == 'mock':
+        return MockBackend(args.type, args.width, args.height,
+                           outputs_path=args.mock_outputs,
+                           latency_ms=args.mock_latency,
+                           jitter_ms=args.mock_jitter,
+                           seed=args.mock_seed)
+    raise ValueError(f'未知推理后端：{args.backend}')
+
+
+# ─────────────────────────────────────────────────────────────
+# 稳态延迟基准测试
+# ─────────────────────────────────────────────────────────────
+
+# --core-mask 取值 → RKNNLite 常量名
+_CORE_MASKS = {
+    'auto':  'NPU_CORE_AUTO',
+    '0':     'NPU_CORE_0',
+    '1':     'NPU_CORE_1',
+    '2':     'NPU_CORE_2',
+    '0_1':   'NPU_CORE_0_1',
+    '0_1_2': 'NPU_CORE_0_1_2',
+}
+
+
+def _latency_stats(samples_ns):
+    """ns 采样 → 毫秒统计 {min, mean, p50, p90, p99, max}"""
+    if not samples_ns:
+        return {}
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        'min':  round(float(ms.min()), 3),
+        'mean': round(float(ms.mean()), 3),
+        'p50':  round(float(p50), 3),
+        'p90':  round(float(p90), 3),
+        'p99':  round(float(p99), 3),
+        'max':  round(float(ms.max()), 3),
+    }
+
+
+def select_input_shape(shapes, img_w, img_h):
+    """多输入尺寸模型：选出 letterbox 后填充比例最高的 (W, H)（相同时取面积较大者）"""
+    def _score(shape):
+        w, h = shape
+        scale = min(w / img_w, h / img_h)
+        return (img_w * scale) * (img_h * scale) / (w * h), w * h
+
+    w, h = max(shapes, key=_score)
+    return int(w), int(h)
+
+
+def resolve_input_size(args, meta, img_bgr):
+    """
+    --width / --height 未指定（0）时按 meta 决定输入尺寸：
+    多输入尺寸模型选与图片最匹配的尺寸，否则用 meta 的 input_w / input_h，缺省 640。
+    """
+    if args.width and args.height:
+        return
+    if meta.get('input_shapes'):
+        w, h = select_input_shape(meta['input_shapes'], img_bgr.shape[1], img_bgr.shape[0])
+    else:
+        w, h = int(meta.get('input_w', 640)), int(meta.get('input_h', 640))
+    args.width, args.height = args.width or w, args.height or h
+
+
+def _load_model_meta(model_path):
+    """读取转换工具生成的 <model>.meta.json（拷贝到设备时可选带上）"""
+    meta_path = model_path + '.meta.json'
+    if not os.path.exists(meta_path):
+        return {}
     try:
-        from rknnlite.api import RKNNLite
-    except ImportError:
-        print('[ERROR] rknnlite 未安装。请在 RK3576 设备上安装 rknn-toolkit-lite2。')
-        print('        pip install rknn_toolkit_lite2-*.whl')
-        sys.exit(1)
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def run_benchmark(backend, img_bgr, args, names):
+    """
+    对同一张图重复执行 预处理 → NPU 推理 → 后处理，分别用 perf_counter_ns 计时。
+    NPU 推理始终使用第一次预处理得到的固定输入，避免预处理抖动影响推理统计。
+    返回可直接 json.dump 的报告 dict。
+    """
+    input_w, input_h = args.width, args.height
+    img_input, scale, pad_x, pad_y = preprocess(img_bgr, input_w, input_h)
+
+    print(f'[INFO] 预热 {args.warmup} 次…')
+    for _ in range(args.warmup):
+        infer_single(backend, img_input)
+
+    print(f'[INFO] 基准测试 {args.benchmark} 次…')
+    pre_ns, infer_ns, post_ns, total_ns = [], [], [], []
+    outputs = None
+    for _ in range(args.benchmark):
+        t0 = time.perf_counter_ns()
+        preprocess(img_bgr, input_w, input_h)
+        t1 = time.perf_counter_ns()
+        outputs = infer_single(backend, img_input)
+        t2 = time.perf_counter_ns()
+        postprocess(args.type, outputs, img_bgr, scale, pad_x, pad_y,
+                    args.conf, args.iou, names, (input_w, input_h))
+        t3 = time.perf_counter_ns()
+        pre_ns.append(t1 - t0)
+        infer_ns.append(t2 - t1)
+        post_ns.append(t3 - t2)
+        total_ns.append(t3 - t0)
+
+    meta = _load_model_meta(args.model)
+    infer_stats = _latency_stats(infer_ns)
+    return {
+        'model': os.path.basename(args.model),
+        'model_type': args.type,
+        'platform': meta.get('platform', ''),
+        'quant_type': meta.get('quant_type', ''),
+        'input_w': input_w,
+        'input_h': input_h,
+        'batch': backend.batch,
+        'backend': backend.name,
+        'core_mask': args.core_mask,
+        'warmup': args.warmup,
+        'iterations': args.benchmark,
+        'num_outputs': len(outputs) if outputs is not None else 0,
+        'latency_ms': {
+            'preprocess': _latency_stats(pre_ns),
+            'inference':  infer_stats,
+            'postprocess': _latency_stats(post_ns),
+            'total':      _latency_stats(total_ns),
+        },
+        'npu_fps': round(1000.0 / infer_stats['mean'], 2) if infer_stats.get('mean') else 0.0,
+    }
+
+
+def _print_benchmark(report):
+    print()
+    print('─' * 64)
+    print(f'{report["model"]}  type={report["model_type"]}  '
+          f'quant={report["quant_type"] or "?"}  backend={report["backend"]}  '
+          f'core_mask={report["core_mask"]}')
+    print(f'{"阶段":<12}{"min":>9}{"mean":>9}{"p50":>9}{"p90":>9}{"p99":>9}  (ms)')
+    for stage, st in report['latency_ms'].items():
+        print(f'{stage:<12}{st["min"]:>9.2f}{st["mean"]:>9.2f}{st["p50"]:>9.2f}'
+              f'{st["p90"]:>9.2f}{st["p99"]:>9.2f}')
+    print(f'NPU 吞吐：{report["npu_fps"]:.1f} FPS（按推理均值）')
+    print('─' * 64)
+
+
+def compare_postprocess(input_wh, conf, iou, iterations=200, peaks_list=(8, 32, 128, 512),
+                        e2e_type='yolov10_det', seed=0):
+    """
+    在相同的合成工作负载上对比 yolov8_det（阈值 + NMS）与 NMS-free 端到端（仅阈值）后处理耗时。
+    每个 peaks 值生成一份同种子的 det 输出，端到端输出由其 top-k 得到。
+    返回可直接 json.dump 的报告 dict。
+    """
+    input_w, input_h = input_wh
+    canvas = np.zeros((input_h, input_w, 3), np.uint8)
+    rows = []
+    for peaks in peaks_list:
+        row = {'peaks': peaks}
+        for model_type in ('yolov8_det', e2e_type):
+            outputs = _synthetic_outputs(model_type, input_w, input_h, seed, peaks=peaks)
+            _, _, dets = postprocess(model_type, outputs, canvas, 1.0, 0, 0, conf, iou, [], input_wh)
+            samples = []
+            for _ in range(iterations):
+                t0 = time.perf_counter_ns()
+                postprocess(model_type, outputs, canvas, 1.0, 0, 0, conf, iou, [], input_wh)
+                samples.append(time.perf_counter_ns() - t0)
+            key = 'det' if model_type == 'yolov8_det' else 'e2e'
+            row[key] = {'detections': len(dets), 'latency_ms': _latency_stats(samples)}
+        row['speedup'] = round(row['det']['latency_ms']['mean'] /
+                               max(row['e2e']['latency_ms']['mean'], 1e-6), 2)
+        rows.append(row)
+    return {
+        'input_w': input_w,
+        'input_h': input_h,
+        'conf': conf,
+        'iou': iou,
+        'iterations': iterations,
+        'e2e_type': e2e_type,
+        'workloads': rows,
+    }
+
+
+def _print_compare(report):
+    print()
+    print('─' * 64)
+    print(f'后处理对比：yolov8_det（NMS）vs {report["e2e_type"]}（NMS-free），'
+          f'{report["input_w"]}×{report["input_h"]}，{report["iterations"]} 次')
+    print(f'{"peaks":>6}{"det 框":>8}{"det mean":>11}{"det p99":>10}'
+          f'{"e2e 框":>8}{"e2e mean":>11}{"e2e p99":>10}{"加速":>8}')
+    for r in report['workloads']:
+        d, e = r['det'], r['e2e']
+        print(f'{r["peaks"]:>6}{d["detections"]:>8}{d["latency_ms"]["mean"]:>11.3f}'
+              f'{d["latency_ms"]["p99"]:>10.3f}{e["detections"]:>8}'
+              f'{e["latency_ms"]["mean"]:>11.3f}{e["latency_ms"]["p99"]:>10.3f}'
+              f'{r["speedup"]:>7.1f}x')
+    print('─' * 64)
 
+
+# ─────────────────────────────────────────────────────────────
+# 主流程
+# ─────────────────────────────────────────────────────────────
+
+def run(args):
     model_path = args.model
     img_path   = args.image
     model_type = args.type
     conf       = args.conf
     iou        = args.iou
     names      = [n.strip() for n in args.classes.split(',') if n.strip()] if args.classes else []
-    input_w    = args.width
-    input_h    = args.height
     out_path   = args.output
     debug      = args.debug
 
@@ -369,42 +1328,113 @@ def run(args):
         print(f'[ERROR] 无法读取图片：{img_path}')
         sys.exit(1)
 
+    meta = _load_model_meta(model_path)
+    resolve_input_size(args, meta, img_bgr)
+    input_w, input_h = args.width, args.height
+
     # 预处理
-    img_rgb, scale, pad_x, pad_y = letterbox(img_bgr, input_w, input_h)
-    img_input = np.expand_dims(img_rgb, axis=0)   # (1, H, W, 3) uint8
-
-    # 加载 RKNN
-    rknn_lite = RKNNLite(verbose=False)
-    print(f'[INFO] 加载模型：{model_path}')
-    ret = rknn_lite.load_rknn(model_path)
-    if ret != 0:
-        print(f'[ERROR] load_rknn 失败，返回码 {ret}')
-        sys.exit(1)
+    img_input, scale, pad_x, pad_y = preprocess(img_bgr, input_w, input_h)   # (1, H, W, 3) uint8
 
-    print('[INFO] 初始化运行时（NPU）…')
-    ret = rknn_lite.init_runtime(core_mask=RKNNLite.NPU_CORE_AUTO)
-    if ret != 0:
-        print(f'[ERROR] init_runtime 失败，返回码 {ret}')
-        rknn_lite.release()
+    # 加载模型（rknnlite 只在设备端有效，x86 上可用 simulator / opencv / mock）
+    backend = create_backend(args, meta)
+    print(f'[INFO] 加载模型：{model_path}（backend={backend.name}，输入 {input_w}x{input_h}，'
+          f'batch={backend.batch}）')
+    try:
+        backend.load()
+    except RuntimeError as e:
+        print(f'[ERROR] {e}')
+        backend.release()
         sys.exit(1)
 
+    if args.benchmark > 0:
+        try:
+            report = run_benchmark(backend, img_bgr, args, names)
+        finally:
+            backend.release()
+        _print_benchmark(report)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f'[INFO] 基准报告已保存到：{args.report}')
+        return
+
+    if args.tile:
+        tile_batch = args.tile_batch or backend.batch
+        print(f'[INFO] 切片推理（{model_type}，overlap={args.tile_overlap}，batch={tile_batch}）…')
+        try:
+            result, summary, dets, stats = run_tiled(
+                backend, img_bgr, model_type, (input_w, input_h), conf, iou, names,
+                overlap=args.tile_overlap, batch=tile_batch)
+        except ValueError as e:
+            print(f'[ERROR] {e}')
+            sys.exit(1)
+        finally:
+            backend.release()
+        print(f'[INFO] {stats["tiles"]} 个 tile，NPU 推理 {stats["infer_ms"]:.1f} ms，'
+              f'总耗时 {stats["total_ms"]:.1f} ms')
+        print()
+        print('─' * 50)
+        print(summary)
+        print('─' * 50)
+        cv2.imwrite(out_path, result)
+        print(f'\n[INFO] 结果已保存到：{out_path}')
+        return
+
+    if args.cls_model:
+        if model_type != 'yolov8_det':
+            print('[ERROR] 级联分类仅支持 --type yolov8_det')
+            backend.release()
+            sys.exit(1)
+        cls_args = argparse.Namespace(**vars(args))
+        cls_args.model, cls_args.type = args.cls_model, 'resnet'
+        cls_args.width = cls_args.height = args.cls_size
+        cls_args.mock_outputs = ''
+        cls_meta = _load_model_meta(args.cls_model)
+        cls_batch = args.cls_batch or int(cls_meta.get('batch_size', 1))
+        cls_backend = create_backend(cls_args, cls_meta)
+        cls_names = [n.strip() for n in args.cls_classes.split(',') if n.strip()] if args.cls_classes else []
+        try:
+            cls_backend.load()
+            result, summary, dets, stats = run_cascade(
+                backend, cls_backend, img_bgr, (input_w, input_h), conf, iou, names,
+                cls_names, (args.cls_size, args.cls_size), cls_batch)
+        except RuntimeError as e:
+            print(f'[ERROR] {e}')
+            sys.exit(1)
+        finally:
+            cls_backend.release()
+            backend.release()
+        print(f'[INFO] 检测 {stats["det_ms"]:.1f} ms，分类 {stats["crops"]} 个框 / '
+              f'{stats["cls_calls"]} 次调用 {stats["cls_ms"]:.1f} ms')
+        print()
+        print('─' * 50)
+        print(summary)
+        print('─' * 50)
+        cv2.imwrite(out_path, result)
+        print(f'\n[INFO] 结果已保存到：{out_path}')
+        return
+
     # 推理
     print(f'[INFO] 开始推理（{model_type}）…')
-    t0 = time.time()
-    outputs = rknn_lite.inference(inputs=[img_input], data_format='nhwc')
-    infer_ms = (time.time() - t0) * 1000
+    t0 = time.perf_counter()
+    outputs = infer_single(backend, img_input)
+    infer_ms = (time.perf_counter() - t0) * 1000
     print(f'[INFO] 推理完成，耗时 {infer_ms:.1f} ms')
 
-    rknn_lite.release()
+    backend.release()
 
     if outputs is None or len(outputs) == 0:
         print('[ERROR] inference() 返回空结果')
         sys.exit(1)
 
+    if args.save_outputs:
+        np.savez(args.save_outputs, *outputs)
+        print(f'[INFO] 原始输出已保存到：{args.save_outputs}（可用 --backend mock 回放）')
+
     # ── debug 模式：打印原始输出统计，帮助诊断检测为 0 的问题 ──
     if debug:
         print('\n[DEBUG] 原始输出张量统计：')
-        fmt = 'rknnopt(6输出)' if len(outputs) >= 6 else '标准ONNX(1输出)'
+        fmt = 'rknnopt(分头)' if len(outputs) >= 4 else '标准ONNX'
         print(f'  输出格式：{fmt}，共 {len(outputs)} 个张量')
         for i, o in enumerate(outputs):
             print(f'  output[{i}]: shape={list(o.shape)}  dtype={o.dtype}'
@@ -466,33 +1496,8 @@ def run(args):
         print()
 
     # 后处理
-    oh, ow = img_bgr.shape[:2]
-    if model_type == 'yolov8_det':
-        result, summary, dets = postprocess_det(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names)
-    elif model_type == 'yolov8_seg':
-        result, summary, dets = postprocess_seg(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names)
-    elif model_type == 'yolov8_pose':
-        result, summary, dets = postprocess_pose(outputs, img_bgr, scale, pad_x, pad_y, conf, iou)
-    elif model_type == 'yolov8_obb':
-        result, summary, dets = postprocess_obb(outputs, img_bgr, scale, pad_x, pad_y, conf, iou, names)
-    elif model_type == 'resnet':
-        result, summary, dets = postprocess_resnet(outputs, img_bgr, names)
-    elif model_type == 'retinaface':
-        # 简化：直接展示各输出张量形状
-        result = img_bgr.copy()
-        lines = ['RetinaFace 输出张量：']
-        for i, o in enumerate(outputs):
-            lines.append(f'  output[{i}]: shape={list(o.shape)}'
-                         f'  min={o.min():.3f}  max={o.max():.3f}')
-        summary = '\n'.join(lines)
-        dets = []
-    else:
-        result = img_bgr.copy()
-        lines = [f'未知模型类型 {model_type}，原始输出摘要：']
-        for i, o in enumerate(outputs):
-            lines.append(f'  output[{i}]: shape={list(o.shape)}')
-        summary = '\n'.join(lines)
-        dets = []
+    result, summary, dets = postprocess(model_type, outputs, img_bgr, scale, pad_x, pad_y,
+                                        conf, iou, names, (input_w, input_h))
 
     # 保存 / 显示
     print()
@@ -514,20 +1519,76 @@ if __name__ == '__main__':
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog=__doc__,
     )
-    parser.add_argument('--model',   required=True,  help='RKNN 模型路径')
-    parser.add_argument('--image',   required=True,  help='测试图片路径')
+    parser.add_argument('--model',   default='', help='RKNN 模型路径')
+    parser.add_argument('--image',   default='', help='测试图片路径')
     parser.add_argument('--type',    default='yolov8_det',
                         choices=['yolov8_det', 'yolov8_seg', 'yolov8_pose',
-                                 'yolov8_obb', 'resnet', 'retinaface'],
+                                 'yolov8_obb', 'yolov10_det', 'yolo11_e2e',
+                                 'resnet', 'retinaface'],
                         help='模型类型（默认 yolov8_det）')
     parser.add_argument('--conf',    type=float, default=0.25, help='置信度阈值')
     parser.add_argument('--iou',     type=float, default=0.45, help='NMS IoU 阈值')
     parser.add_argument('--classes', default='',
                         help='类别名称，逗号分隔，例：fire,smoke（空则用 cls0/cls1/…）')
-    parser.add_argument('--width',   type=int, default=640, help='模型输入宽度（默认 640）')
-    parser.add_argument('--height',  type=int, default=640, help='模型输入高度（默认 640）')
+    parser.add_argument('--width',   type=int, default=0,
+                        help='模型输入宽度（默认读取 .meta.json，多输入尺寸模型按图片选择，缺省 640）')
+    parser.add_argument('--height',  type=int, default=0,
+                        help='模型输入高度（默认读取 .meta.json，多输入尺寸模型按图片选择，缺省 640）')
     parser.add_argument('--output',  default='result.jpg', help='输出图片路径（默认 result.jpg）')
     parser.add_argument('--debug',   action='store_true',
                         help='打印原始输出张量统计信息，用于诊断检测为 0 的问题')
-
-    run(parser.parse_args())
+    parser.add_argument('--backend', default='rknnlite', choices=BACKENDS,
+                        help='推理后端（默认 rknnlite；x86 可用 simulator / opencv / mock）')
+    parser.add_argument('--core-mask', default='auto', choices=list(_CORE_MASKS),
+                        help='NPU 核心掩码（默认 auto；RK3588 可选 0_1_2 三核）')
+    parser.add_argument('--benchmark', type=int, default=0, metavar='N',
+                        help='基准测试模式：重复推理 N 次并统计延迟（0 = 关闭）')
+    parser.add_argument('--warmup',  type=int, default=10, metavar='K',
+                        help='基准测试前的预热次数（默认 10）')
+    parser.add_argument('--report',  default='',
+                        help='基准测试 JSON 报告输出路径，便于跨模型 / 量化类型 / 核心掩码对比')
+    parser.add_argument('--tile', action='store_true',
+                        help='切片推理：大图切成重叠的输入尺寸 tile，结果全局 NMS 合并（det / obb）')
+    parser.add_argument('--tile-overlap', type=float, default=0.2,
+                        help=f'相邻 tile 的重叠比例（默认 0.2，范围 0 ~ {MAX_TILE_OVERLAP}）')
+    parser.add_argument('--tile-batch', type=int, default=0,
+                        help='每次推理的 tile 数，须与 RKNN 模型构建时的 batch 一致'
+                             '（默认读取 .meta.json 的 batch_size，缺省为 1）')
+    parser.add_argument('--cls-model', default='',
+                        help='级联分类模型（.rknn）：对检测框裁剪后批量分类，仅 yolov8_det')
+    parser.add_argument('--cls-classes', default='', help='级联分类模型的类别名称，逗号分隔')
+    parser.add_argument('--cls-size', type=int, default=224, help='分类模型输入尺寸（默认 224）')
+    parser.add_argument('--cls-batch', type=int, default=0,
+                        help='分类模型构建 batch（默认读取 .meta.json 的 batch_size，缺省为 1）')
+    parser.add_argument('--save-outputs', default='',
+                        help='将原始输出张量保存为 .npz，供 --backend mock 回放')
+    parser.add_argument('--mock-outputs', default='',
+                        help='mock 后端回放的 .npz（空则按模型类型生成确定性合成输出）')
+    parser.add_argument('--mock-latency', type=float, default=0.0,
+                        help='mock 后端每次推理的合成延迟（ms）')
+    parser.add_argument('--mock-jitter', type=float, default=0.0,
+                        help='mock 后端合成延迟的抖动幅度（±ms，固定种子）')
+    parser.add_argument('--mock-seed', type=int, default=0, help='mock 后端随机种子')
+    parser.add_argument('--compare-postprocess', type=int, default=0, metavar='N',
+                        help='在合成输出上对比 yolov8_det 与 NMS-free 后处理耗时，每个负载重复 N 次'
+                             '（不需要 --model / --image；--type 指定端到端类型）')
+
+    args = parser.parse_args()
+    if args.compare_postprocess > 0:
+        e2e_type = args.type if args.type in E2E_TYPES else E2E_TYPES[0]
+        report = compare_postprocess((args.width or 640, args.height or 640), args.conf, args.iou,
+                                     args.compare_postprocess, e2e_type=e2e_type,
+                                     seed=args.mock_seed)
+        _print_compare(report)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f'[INFO] 对比报告已保存到：{args.report}')
+        sys.exit(0)
+    if not args.model or not args.image:
+        parser.error('需要 --model 与 --image（--compare-postprocess 除外）')
+    try:
+        check_tile_overlap(args.tile_overlap)
+    except ValueError as e:
+        parser.error(str(e))
+    run(args)
@@ -7,6 +7,7 @@ RKNN 推理测试模块
   yolov8_seg  — 实例分割，双输出（检测 + 分割 proto）
   yolov8_pose — 姿态估计，单输出 [1, 56, 8400]（17 关键点）
   yolov8_obb  — 旋转框检测，单输出 [1, 4+nc+1, 8400]
+  yolov10_det / yolo11_e2e — NMS-free 端到端检测，单输出 [1, N, 6]（x1,y1,x2,y2,score,cls）
   resnet      — 图像分类，单输出 [1, 1000]
   retinaface  — 人脸检测，多输出（anchor-based）
 
@@ -22,6 +23,9 @@ import logging
 import time
 import numpy as np
 
+# 切片推理的 tile 划分 / 预取与设备端脚本共用同一实现
+from infer_on_device import make_tiles, prefetch, check_tile_overlap
+
 logger = logging.getLogger(__name__)
 
 # ─────────────────────────────────────────────────────────────
@@ -98,6 +102,40 @@ def nms(boxes_xyxy, scores, iou_thresh=0.45):
     return np.array(keep, dtype=np.int64)
 
 
+# ─────────────────────────────────────────────────────────────
+# NMS-free 端到端检测（YOLOv10 one-to-one 头 / YOLO11 end2end 导出）
+# 输出已是 top-k [1, N, 6]，只需按置信度过滤
+# ─────────────────────────────────────────────────────────────
+
+E2E_TYPES = ('yolov10_det', 'yolo11_e2e')
+
+
+def decode_e2e(outputs, conf_thresh):
+    """
+    端到端输出解码：outputs[0] shape [1, N, 6]
+    返回 (boxes_xyxy, class_ids, class_scores)，letterbox 输入空间，已按 conf 过滤。
+    """
+    pred = outputs[0]
+    if pred.ndim == 3:
+        pred = pred[0]
+    if pred.shape[-1] != 6 and pred.shape[0] == 6:
+        pred = pred.T
+    pred = pred[pred[:, 4] >= conf_thresh].astype(np.float32)
+    return pred[:, :4], pred[:, 5].astype(np.int64), pred[:, 4]
+
+
+def postprocess_e2e(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, class_names):
+    """YOLOv10 / YOLO11-E2E: outputs[0] shape [1, N, 6]，无需 NMS"""
+    h, w = orig_bgr.shape[:2]
+
+    boxes_xyxy, cids, cscores = decode_e2e(outputs, conf_thresh)
+    if len(boxes_xyxy) == 0:
+        return orig_bgr.copy(), '未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh), []
+
+    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, w, h)
+    return _render_det(orig_bgr, boxes_orig, cids, cscores, class_names)
+
+
 # ─────────────────────────────────────────────────────────────
 # YOLOv8 单输出后处理（Det / Seg / Pose / OBB）
 # 标准 ultralytics ONNX export 格式：[1, 4+nc(+extra), 8400]
@@ -129,61 +167,75 @@ def _decode_yolo_common(pred, conf_thresh, iou_thresh, num_extra=0):
     return boxes_cxcywh, class_ids, class_scores, extra_filtered
 
 
-def postprocess_det(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_thresh, class_names):
-    """YOLOv8-Det: outputs[0] shape [1, 4+nc, 8400]"""
-    result = orig_bgr.copy()
-    h, w = orig_bgr.shape[:2]
-    summary_lines = []
-
+def decode_det(outputs, conf_thresh):
+    """
+    YOLOv8-Det 输出解码（不含 NMS）：outputs[0] shape [1, 4+nc, 8400]
+    返回 (boxes_xyxy, class_ids, class_scores)，letterbox 输入空间，已按 conf 过滤。
+    """
     raw = outputs[0]  # [1, 4+nc, 8400]
     if raw.ndim == 3:
         raw = raw[0]              # [4+nc, 8400]
     pred = raw.T                  # [8400, 4+nc]
 
-    boxes_cxcywh, cids, cscores, _ = _decode_yolo_common(pred, conf_thresh, iou_thresh)
-    if len(boxes_cxcywh) == 0:
-        summary_lines.append('未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh))
-        return result, '\n'.join(summary_lines), []
-
+    boxes_cxcywh, cids, cscores, _ = _decode_yolo_common(pred, conf_thresh, None)
     # cxcywh → xyxy
     x1 = boxes_cxcywh[:, 0] - boxes_cxcywh[:, 2] / 2
     y1 = boxes_cxcywh[:, 1] - boxes_cxcywh[:, 3] / 2
     x2 = boxes_cxcywh[:, 0] + boxes_cxcywh[:, 2] / 2
     y2 = boxes_cxcywh[:, 1] + boxes_cxcywh[:, 3] / 2
-    boxes_xyxy = np.stack([x1, y1, x2, y2], axis=1)
+    return np.stack([x1, y1, x2, y2], axis=1), cids, cscores
 
-    # NMS per class
+
+def _nms_per_class(boxes_xyxy, cids, cscores, iou_thresh):
+    """按类别分别 NMS，返回保留下标列表"""
     keep_all = []
     for cid in np.unique(cids):
         idx = np.where(cids == cid)[0]
         keep = nms(boxes_xyxy[idx], cscores[idx], iou_thresh)
         keep_all.extend(idx[keep].tolist())
+    return keep_all
 
-    boxes_xyxy = boxes_xyxy[keep_all]
-    cids = cids[keep_all]
-    cscores = cscores[keep_all]
-
-    # restore to original coords
-    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, w, h)
 
+def _render_det(orig_bgr, boxes_orig, cids, cscores, class_names, labels=None):
+    """labels 不为空时逐框覆盖显示的标签（级联分类结果）"""
+    result = orig_bgr.copy()
     detections = []
     for i, (box, cid, score) in enumerate(zip(boxes_orig, cids, cscores)):
         x1o, y1o, x2o, y2o = [int(v) for v in box]
         name = class_names[int(cid)] if class_names and int(cid) < len(class_names) else 'cls{}'.format(int(cid))
         color = _color(int(cid))
         cv2.rectangle(result, (x1o, y1o), (x2o, y2o), color, 2)
-        label = '{} {:.2f}'.format(name, float(score))
+        label = '{} {:.2f}'.format(labels[i] if labels is not None else name, float(score))
         (lw, lh), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.55, 1)
         cv2.rectangle(result, (x1o, y1o - lh - 6), (x1o + lw, y1o), color, -1)
         cv2.putText(result, label, (x1o, y1o - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.55, (255, 255, 255), 1)
         detections.append({'class': name, 'score': round(float(score), 3), 'box': [x1o, y1o, x2o, y2o]})
 
-    summary_lines.append('检测到 {} 个目标'.format(len(detections)))
+    summary_lines = ['检测到 {} 个目标'.format(len(detections))]
     for d in detections:
         summary_lines.append('  {} {:.3f}  {}'.format(d['class'], d['score'], d['box']))
     return result, '\n'.join(summary_lines), detections
 
 
+def postprocess_det(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_thresh, class_names):
+    """YOLOv8-Det: outputs[0] shape [1, 4+nc, 8400]"""
+    h, w = orig_bgr.shape[:2]
+
+    boxes_xyxy, cids, cscores = decode_det(outputs, conf_thresh)
+    if len(boxes_xyxy) == 0:
+        return orig_bgr.copy(), '未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh), []
+
+    # NMS per class
+    keep_all = _nms_per_class(boxes_xyxy, cids, cscores, iou_thresh)
+    boxes_xyxy = boxes_xyxy[keep_all]
+    cids = cids[keep_all]
+    cscores = cscores[keep_all]
+
+    # restore to original coords
+    boxes_orig = restore_boxes(boxes_xyxy, scale, pad_x, pad_y, w, h)
+    return _render_det(orig_bgr, boxes_orig, cids, cscores, class_names)
+
+
 def postprocess_seg(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_thresh, class_names):
     """YOLOv8-Seg: outputs[0]=[1,4+nc+32,8400], outputs[1]=[1,32,160,160]
     简化处理：只绘制检测框，不渲染掩码（掩码解码需要额外内存）"""
@@ -271,81 +323,68 @@ def postprocess_pose(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_th
     return result, '\n'.join(summary_lines), detections
 
 
-def postprocess_obb(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_thresh, class_names):
-    """YOLOv8-OBB: output [1, 4+nc+1, 8400] (cx,cy,w,h + classes + angle)"""
-    import math
-
-    result = orig_bgr.copy()
-    h, w = orig_bgr.shape[:2]
-    summary_lines = []
-
+def decode_obb(outputs, conf_thresh):
+    """
+    YOLOv8-OBB 输出解码（不含 NMS）：output [1, 4+nc+1, 8400] (cx,cy,w,h + classes + angle)
+    返回 (rboxes[K,5] = cx,cy,w,h,angle(rad), class_ids, class_scores)，letterbox 输入空间。
+    """
     raw = outputs[0]
     if raw.ndim == 3:
         raw = raw[0]
     pred = raw.T  # [8400, 4+nc+1]
 
-    nc = pred.shape[1] - 5
-    boxes_cxcywh = pred[:, :4]
-    class_probs = pred[:, 4:4+nc]
-    angles = pred[:, 4+nc]
-
-    class_ids = np.argmax(class_probs, axis=1)
-    class_scores = class_probs[np.arange(len(class_probs)), class_ids]
-
-    mask = class_scores >= conf_thresh
-    boxes_cxcywh = boxes_cxcywh[mask]
-    class_ids = class_ids[mask]
-    class_scores = class_scores[mask]
-    angles_f = angles[mask]
+    boxes_cxcywh, class_ids, class_scores, angles = _decode_yolo_common(pred, conf_thresh, None, num_extra=1)
+    return np.concatenate([boxes_cxcywh, angles], axis=1), class_ids, class_scores
 
-    if len(boxes_cxcywh) == 0:
-        summary_lines.append('未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh))
-        return result, '\n'.join(summary_lines), []
 
-    # axis-aligned NMS for OBB (approximate)
-    x1 = boxes_cxcywh[:, 0] - boxes_cxcywh[:, 2] / 2
-    y1 = boxes_cxcywh[:, 1] - boxes_cxcywh[:, 3] / 2
-    x2 = boxes_cxcywh[:, 0] + boxes_cxcywh[:, 2] / 2
-    y2 = boxes_cxcywh[:, 1] + boxes_cxcywh[:, 3] / 2
-    boxes_xyxy = np.stack([x1, y1, x2, y2], axis=1)
+def _rbox_to_xyxy(rboxes):
+    """旋转框的外接轴对齐框（axis-aligned NMS for OBB, approximate）"""
+    x1 = rboxes[:, 0] - rboxes[:, 2] / 2
+    y1 = rboxes[:, 1] - rboxes[:, 3] / 2
+    x2 = rboxes[:, 0] + rboxes[:, 2] / 2
+    y2 = rboxes[:, 1] + rboxes[:, 3] / 2
+    return np.stack([x1, y1, x2, y2], axis=1)
 
-    keep_all = []
-    for cid in np.unique(class_ids):
-        idx = np.where(class_ids == cid)[0]
-        keep = nms(boxes_xyxy[idx], class_scores[idx], iou_thresh)
-        keep_all.extend(idx[keep].tolist())
 
-    boxes_cxcywh = boxes_cxcywh[keep_all]
-    class_ids = class_ids[keep_all]
-    class_scores = class_scores[keep_all]
-    angles_f = angles_f[keep_all]
+def _render_obb(orig_bgr, rboxes_orig, class_ids, class_scores, class_names):
+    import math
 
+    result = orig_bgr.copy()
     detections = []
-    for i, (box, cid, score, angle) in enumerate(zip(boxes_cxcywh, class_ids, class_scores, angles_f)):
-        cx, cy, bw, bh = box
-        # restore center to original image space
-        cx_r = (cx - pad_x) / scale
-        cy_r = (cy - pad_y) / scale
-        bw_r = bw / scale
-        bh_r = bh / scale
-
+    for i, (rbox, cid, score) in enumerate(zip(rboxes_orig, class_ids, class_scores)):
+        cx_r, cy_r, bw_r, bh_r, angle = [float(v) for v in rbox]
         name = class_names[int(cid)] if class_names and int(cid) < len(class_names) else 'cls{}'.format(int(cid))
         color = _color(int(cid))
 
         # draw rotated rectangle
-        rect = ((cx_r, cy_r), (bw_r, bh_r), math.degrees(float(angle)))
+        rect = ((cx_r, cy_r), (bw_r, bh_r), math.degrees(angle))
         pts = cv2.boxPoints(rect).astype(np.int32)
         cv2.drawContours(result, [pts], 0, color, 2)
         label = '{} {:.2f}'.format(name, float(score))
         cv2.putText(result, label, (int(cx_r), int(cy_r)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-        detections.append({'class': name, 'score': round(float(score), 3), 'angle_deg': round(math.degrees(float(angle)), 1)})
+        detections.append({'class': name, 'score': round(float(score), 3), 'angle_deg': round(math.degrees(angle), 1)})
 
-    summary_lines.append('检测到 {} 个旋转框目标'.format(len(detections)))
+    summary_lines = ['检测到 {} 个旋转框目标'.format(len(detections))]
     for d in detections:
         summary_lines.append('  {} {:.3f}  angle={:.1f}°'.format(d['class'], d['score'], d['angle_deg']))
     return result, '\n'.join(summary_lines), detections
 
 
+def postprocess_obb(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh, iou_thresh, class_names):
+    """YOLOv8-OBB: output [1, 4+nc+1, 8400] (cx,cy,w,h + classes + angle)"""
+    rboxes, class_ids, class_scores = decode_obb(outputs, conf_thresh)
+    if len(rboxes) == 0:
+        return orig_bgr.copy(), '未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh), []
+
+    keep_all = _nms_per_class(_rbox_to_xyxy(rboxes), class_ids, class_scores, iou_thresh)
+    rboxes = rboxes[keep_all].astype(np.float32)
+    # restore center to original image space
+    rboxes[:, 0] = (rboxes[:, 0] - pad_x) / scale
+    rboxes[:, 1] = (rboxes[:, 1] - pad_y) / scale
+    rboxes[:, 2:4] /= scale
+    return _render_obb(orig_bgr, rboxes, class_ids[keep_all], class_scores[keep_all], class_names)
+
+
 def postprocess_resnet(outputs, orig_bgr, class_names, topk=5):
     """ResNet 分类：output [1, num_classes]，返回 top-k 结果。"""
     result = orig_bgr.copy()
@@ -444,38 +483,111 @@ def postprocess_retinaface(outputs, orig_bgr, scale, pad_x, pad_y, conf_thresh,
     return result, '\n'.join(summary_lines), []
 
 
+# ─────────────────────────────────────────────────────────────
+# 切片（tiled）推理：大图切成重叠的输入尺寸 tile，结果映射回全图后全局 NMS
+# ─────────────────────────────────────────────────────────────
+
+TILED_TYPES = ('yolov8_det', 'yolov8_obb') + E2E_TYPES
+
+
+def _tile_batches(tiles, img_bgr, input_w, input_h, batch):
+    """按 batch 个 tile 一组预处理，末组不足时补零，产出 (tile 信息列表, (batch, H, W, 3) 输入)"""
+    group = []
+    for x0, y0, x1, y1 in tiles:
+        img_lb, scale, pad_x, pad_y = letterbox(img_bgr[y0:y1, x0:x1], input_w, input_h)
+        group.append(((x0, y0, x1, y1), img_lb, scale, pad_x, pad_y))
+        if len(group) == batch:
+            yield group, np.stack([g[1] for g in group])
+            group = []
+    if group:
+        buf = np.zeros((batch, input_h, input_w, 3), np.uint8)
+        buf[:len(group)] = [g[1] for g in group]
+        yield group, buf
+
+
+def _run_tiled(rknn, img_bgr, model_type, input_w, input_h, conf_thresh, iou_thresh,
+               class_names, overlap, batch=1):
+    """
+    在已初始化的 RKNN 运行时上执行切片推理，返回 (result, summary, dets, infer_ms)。
+    batch > 1 时每次推理 batch 个 tile（运行时须按同一 batch 初始化）。
+    """
+    h, w = img_bgr.shape[:2]
+    tiles = make_tiles(w, h, input_w, input_h, overlap)
+
+    def _per_tile():
+        nonlocal infer_ms
+        for group, inputs in prefetch(_tile_batches(tiles, img_bgr, input_w, input_h, batch)):
+            t0 = time.time()
+            outputs = rknn.inference(inputs=[inputs if batch > 1 else inputs[0]])
+            infer_ms += (time.time() - t0) * 1000
+            for i, (box, _, scale, pad_x, pad_y) in enumerate(group):
+                yield box, scale, pad_x, pad_y, [o[i:i + 1] for o in outputs]
+
+    boxes_list, cids_list, scores_list = [], [], []
+    infer_ms = 0.0
+    for (x0, y0, x1, y1), scale, pad_x, pad_y, outputs in _per_tile():
+        if model_type != 'yolov8_obb':
+            if model_type in E2E_TYPES:
+                boxes, cids, cscores = decode_e2e(outputs, conf_thresh)
+            else:
+                boxes, cids, cscores = decode_det(outputs, conf_thresh)
+            boxes = restore_boxes(boxes, scale, pad_x, pad_y, x1 - x0, y1 - y0)
+            boxes[:, [0, 2]] += x0
+            boxes[:, [1, 3]] += y0
+        else:
+            boxes, cids, cscores = decode_obb(outputs, conf_thresh)
+            boxes = boxes.astype(np.float32)
+            boxes[:, 0] = (boxes[:, 0] - pad_x) / scale + x0
+            boxes[:, 1] = (boxes[:, 1] - pad_y) / scale + y0
+            boxes[:, 2:4] /= scale
+        boxes_list.append(boxes)
+        cids_list.append(cids)
+        scores_list.append(cscores)
+
+    boxes = np.concatenate(boxes_list)
+    cids = np.concatenate(cids_list)
+    cscores = np.concatenate(scores_list)
+    if model_type != 'yolov8_obb':
+        # 端到端模型单 tile 内无重复框，但 tile 重叠区域的重复仍需全局 NMS
+        keep = _nms_per_class(boxes, cids, cscores, iou_thresh)
+        result, summary, dets = _render_det(img_bgr, boxes[keep], cids[keep], cscores[keep], class_names)
+    else:
+        keep = _nms_per_class(_rbox_to_xyxy(boxes), cids, cscores, iou_thresh)
+        result, summary, dets = _render_obb(img_bgr, boxes[keep], cids[keep], cscores[keep], class_names)
+    summary += '\n（切片推理：{} 个 tile，重叠 {:.0%}，全局 NMS 合并）'.format(len(tiles), overlap)
+    if batch > 1:
+        summary += '\n（batch={}，推理调用 {} 次）'.format(batch, -(-len(tiles) // batch))
+    return result, summary, dets, infer_ms
+
+
 # ─────────────────────────────────────────────────────────────
 # 主推理函数
 # ─────────────────────────────────────────────────────────────
 
-def run_inference(rknn_path, img_bgr, model_type, input_w, input_h,
-                  conf_thresh=0.25, iou_thresh=0.45, class_names=None,
-                  onnx_path=None, mean_values=None, std_values=None,
-                  platform='rk3576'):
+def _resolve_onnx(rknn_path, onnx_path=None):
+    """返回与 rknn 配套的 .onnx 路径（未传入时自动查找同名文件）"""
+    if onnx_path and os.path.exists(onnx_path):
+        return onnx_path
+    candidate = os.path.splitext(rknn_path)[0] + '.onnx'
+    if os.path.exists(candidate):
+        return candidate
+    raise RuntimeError(
+        '找不到对应的 ONNX 文件，无法在 x86 模拟器上推理。\n'
+        '请重新转换模型（重新转换后会自动保存 ONNX）。'
+    )
+
+
+def _init_simulator(onnx_path, input_w, input_h, mean_values=None, std_values=None,
+                    platform='rk3576', batch=1):
     """
-    使用 rknn-toolkit2 simulator 模式推理。
-    必须提供 onnx_path（与 rknn 同名的 .onnx 文件），
-    通过 load_onnx → config → build → init_runtime() 运行。
+    load_onnx → config → build → init_runtime()，返回已初始化的 RKNN 对象（调用方负责 release）。
+    多输入尺寸模型的 ONNX 为动态尺寸导出，按本次 input_w × input_h 加载即可。
     """
     try:
         from rknn.api import RKNN
     except ImportError:
         raise RuntimeError('未安装 rknn-toolkit2：请运行 pip install rknn-toolkit2')
 
-    # 自动查找同名 .onnx（若未传入）
-    if not onnx_path or not os.path.exists(onnx_path):
-        candidate = os.path.splitext(rknn_path)[0] + '.onnx'
-        if os.path.exists(candidate):
-            onnx_path = candidate
-        else:
-            raise RuntimeError(
-                '找不到对应的 ONNX 文件，无法在 x86 模拟器上推理。\n'
-                '请重新转换模型（重新转换后会自动保存 ONNX）。'
-            )
-
-    orig_h, orig_w = img_bgr.shape[:2]
-    img_lb, scale, pad_x, pad_y = letterbox(img_bgr, input_w, input_h)
-
     # 默认 mean/std（YOLO 常用值）
     mv = mean_values if mean_values else [[0, 0, 0]]
     sv = std_values  if std_values  else [[255, 255, 255]]
@@ -497,13 +609,59 @@ def run_inference(rknn_path, img_bgr, model_type, input_w, input_h,
         if ret != 0:
             raise RuntimeError('load_onnx 失败，返回码 {}'.format(ret))
 
-        ret = rknn.build(do_quantization=False)   # simulator 不需要量化
+        # simulator 不需要量化；batch > 1 与转换时一致，以 rknn_batch_size 构建
+        ret = rknn.build(do_quantization=False,
+                         **({'rknn_batch_size': batch} if batch > 1 else {}))
         if ret != 0:
             raise RuntimeError('RKNN build 失败，返回码 {}'.format(ret))
 
         ret = rknn.init_runtime()                 # x86 simulator 模式
         if ret != 0:
             raise RuntimeError('init_runtime 失败，返回码 {}'.format(ret))
+    except Exception:
+        rknn.release()
+        raise
+    return rknn
+
+
+def select_input_shape(shapes, img_w, img_h):
+    """
+    多输入尺寸模型：选出 letterbox 后填充比例最高的输入尺寸（相同时取面积较大者）。
+    shapes 为 [[W, H], ...]，返回 (W, H)。
+    """
+    def _score(shape):
+        w, h = shape
+        scale = min(w / img_w, h / img_h)
+        return (img_w * scale) * (img_h * scale) / (w * h), w * h
+
+    w, h = max(shapes, key=_score)
+    return int(w), int(h)
+
+
+def run_inference(rknn_path, img_bgr, model_type, input_w, input_h,
+                  conf_thresh=0.25, iou_thresh=0.45, class_names=None,
+                  onnx_path=None, mean_values=None, std_values=None,
+                  platform='rk3576', tiled=False, tile_overlap=0.2, batch=1):
+    """
+    使用 rknn-toolkit2 simulator 模式推理。
+    必须提供 onnx_path（与 rknn 同名的 .onnx 文件），
+    通过 load_onnx → config → build → init_runtime() 运行。
+    tiled=True 时（仅 det / obb / 端到端 det）将大图切成重叠 tile 推理并全局 NMS 合并，
+    batch > 1（批量构建的模型）时每次推理 batch 个 tile。
+    """
+    if tiled and model_type not in TILED_TYPES:
+        raise RuntimeError('切片推理仅支持 {}'.format(', '.join(TILED_TYPES)))
+    onnx_path = _resolve_onnx(rknn_path, onnx_path)
+
+    orig_h, orig_w = img_bgr.shape[:2]
+    img_lb, scale, pad_x, pad_y = letterbox(img_bgr, input_w, input_h)
+
+    batch = batch if tiled else 1
+    rknn = _init_simulator(onnx_path, input_w, input_h, mean_values, std_values, platform, batch)
+    try:
+        if tiled:
+            return _run_tiled(rknn, img_bgr, model_type, input_w, input_h,
+                              conf_thresh, iou_thresh, class_names, tile_overlap, batch)
 
         t0 = time.time()
         outputs = rknn.inference(inputs=[img_lb])
@@ -518,6 +676,9 @@ def run_inference(rknn_path, img_bgr, model_type, input_w, input_h,
     if model_type == 'yolov8_det':
         result, summary, dets = postprocess_det(outputs, img_bgr, scale, pad_x, pad_y,
                                                  conf_thresh, iou_thresh, class_names)
+    elif model_type in E2E_TYPES:
+        result, summary, dets = postprocess_e2e(outputs, img_bgr, scale, pad_x, pad_y,
+                                                conf_thresh, class_names)
     elif model_type == 'yolov8_seg':
         result, summary, dets = postprocess_seg(outputs, img_bgr, scale, pad_x, pad_y,
                                                   conf_thresh, iou_thresh, class_names)
@@ -545,6 +706,101 @@ def run_inference(rknn_path, img_bgr, model_type, input_w, input_h,
     return result, summary, dets, infer_ms
 
 
+# ─────────────────────────────────────────────────────────────
+# 检测 → 分类级联（模拟器）
+# ─────────────────────────────────────────────────────────────
+
+def _crop_batch(img_bgr, boxes_orig, cls_w, cls_h):
+    """检测框裁剪缩放为 (K, cls_h, cls_w, 3) uint8 RGB batch 缓冲区"""
+    h, w = img_bgr.shape[:2]
+    out = np.empty((len(boxes_orig), cls_h, cls_w, 3), dtype=np.uint8)
+    for i, box in enumerate(boxes_orig):
+        x1, y1, x2, y2 = [int(v) for v in box]
+        x1, y1 = min(max(0, x1), w - 1), min(max(0, y1), h - 1)
+        x2, y2 = min(w, max(x2, x1 + 1)), min(h, max(y2, y1 + 1))
+        crop = cv2.resize(img_bgr[y1:y2, x1:x2], (cls_w, cls_h), interpolation=cv2.INTER_LINEAR)
+        out[i] = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)
+    return out
+
+
+def run_cascade_inference(rknn_path, img_bgr, input_w, input_h, cls_rknn_path,
+                          cls_input_w=224, cls_input_h=224, cls_batch=1,
+                          conf_thresh=0.25, iou_thresh=0.45,
+                          class_names=None, cls_class_names=None,
+                          onnx_path=None, mean_values=None, std_values=None,
+                          cls_onnx_path=None, cls_mean_values=None, cls_std_values=None,
+                          platform='rk3576'):
+    """
+    YOLOv8-Det → 分类模型级联（模拟器）。
+    检测框裁剪后合并为一个 batch，分类模型按其构建 batch（cls_batch）分块推理，
+    每帧调用 ceil(K / cls_batch) 次；分类标签附加到每个检测结果上。
+    返回 (result_bgr, summary, detections, infer_ms)
+    """
+    onnx_path = _resolve_onnx(rknn_path, onnx_path)
+    cls_onnx_path = _resolve_onnx(cls_rknn_path, cls_onnx_path)
+    h, w = img_bgr.shape[:2]
+    img_lb, scale, pad_x, pad_y = letterbox(img_bgr, input_w, input_h)
+
+    rknn = _init_simulator(onnx_path, input_w, input_h, mean_values, std_values, platform)
+    try:
+        t0 = time.time()
+        outputs = rknn.inference(inputs=[img_lb])
+        infer_ms = (time.time() - t0) * 1000
+    finally:
+        rknn.release()
+
+    boxes_xyxy, cids, cscores = decode_det(outputs, conf_thresh)
+    keep = _nms_per_class(boxes_xyxy, cids, cscores, iou_thresh)
+    boxes_orig = restore_boxes(boxes_xyxy[keep], scale, pad_x, pad_y, w, h)
+    cids, cscores = cids[keep], cscores[keep]
+    if len(boxes_orig) == 0:
+        return img_bgr.copy(), '未检测到目标（置信度阈值 {:.2f}）'.format(conf_thresh), [], infer_ms
+
+    crops = _crop_batch(img_bgr, boxes_orig, cls_input_w, cls_input_h)
+    k = len(crops)
+    logits, calls = [], 0
+    cls_rknn = _init_simulator(cls_onnx_path, cls_input_w, cls_input_h,
+                               cls_mean_values, cls_std_values, platform, batch=cls_batch)
+    try:
+        for i in range(0, k, cls_batch):
+            n = min(cls_batch, k - i)
+            chunk = crops[i:i + n]
+            if n < cls_batch:
+                chunk = np.concatenate([chunk, np.zeros((cls_batch - n,) + chunk.shape[1:], np.uint8)])
+            t0 = time.time()
+            out = cls_rknn.inference(inputs=[chunk])[0]
+            infer_ms += (time.time() - t0) * 1000
+            logits.append(out.reshape(out.shape[0], -1)[:n].astype(np.float32))
+            calls += 1
+    finally:
+        cls_rknn.release()
+
+    logits = np.concatenate(logits)
+    e = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probs = e / e.sum(axis=1, keepdims=True)
+    sub_ids = probs.argmax(axis=1)
+    sub_probs = probs[np.arange(k), sub_ids]
+
+    labels = []
+    for cid, sid in zip(cids, sub_ids):
+        det_name = class_names[int(cid)] if class_names and int(cid) < len(class_names) else 'cls{}'.format(int(cid))
+        sub_name = cls_class_names[int(sid)] if cls_class_names and int(sid) < len(cls_class_names) else 'class_{}'.format(int(sid))
+        labels.append((det_name, sub_name))
+    result, _, detections = _render_det(img_bgr, boxes_orig, cids, cscores, class_names,
+                                        labels=['{}/{}'.format(a, b) for a, b in labels])
+    for d, (det_name, sub_name), sid, sp in zip(detections, labels, sub_ids, sub_probs):
+        d['class'] = det_name
+        d['cls_class'] = sub_name
+        d['cls_id'] = int(sid)
+        d['cls_prob'] = round(float(sp), 4)
+
+    summary_lines = ['检测到 {} 个目标，分类调用 {} 次（batch={}）'.format(len(detections), calls, cls_batch)]
+    for d in detections:
+        summary_lines.append('  {} {:.3f} → {} {:.2%}  {}'.format(
+            d['class'], d['score'], d['cls_class'], d['cls_prob'], d['box']))
+    return result, '\n'.join(summary_lines), detections, infer_ms
+
+
 def img_to_base64(img_bgr, quality=88):
     """将 BGR numpy 图像编码为 base64 JPEG 字符串。"""
     ok, buf = cv2.imencode('.jpg', img_bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
@@ -560,7 +816,7 @@ def img_to_base64(img_bgr, quality=88):
 def _parse_accuracy_output(output_dir):
     """
     解析 accuracy_analysis() 输出目录，提取逐层余弦相似度。
-    返回 {layers: [{name, cos_sim}], summary, raw_text}
+    返回 {layers: [{name, layer, op, cos_sim, single_cos}], summary, raw_text}
 
     rknn-toolkit2 error_analysis.txt 格式（每行）：
       [LayerType] layer_name    <entire_cos> | <entire_euc>    <single_cos> | <single_euc>
@@ -595,11 +851,14 @@ def _parse_accuracy_output(output_dir):
         if not line or line.startswith('#'):
             continue
         # 必须以 [ 开头才是数据行
-        m = re.match(r'\[([^\]]+)\]\s+(\S+)\s+([\d.]+)\s*\|', line)
+        m = re.match(r'\[([^\]]+)\]\s+(\S+)\s+([\d.]+)\s*\|(?:\s*\S+\s+([\d.]+)\s*\|)?', line)
         if m:
             layer_name = f'[{m.group(1)}] {m.group(2)}'
             cos_sim = round(float(m.group(3)), 6)
-            layers.append({'name': layer_name, 'cos_sim': cos_sim})
+            # single_cos：该层单独量化（输入取浮点结果）时的误差，用于定位问题层
+            single = round(float(m.group(4)), 6) if m.group(4) else None
+            layers.append({'name': layer_name, 'layer': m.group(2), 'op': m.group(1),
+                           'cos_sim': cos_sim, 'single_cos': single})
 
     # 统计摘要
     cos_vals = [l['cos_sim'] for l in layers]
@@ -0,0 +1,521 @@
+"""
+转换任务执行器：独立工作进程 + 有界并发 + 优先级队列
+
+- 每个转换任务在工作进程中执行（spawn 上下文），rknn.build / ultralytics 导出 / torch
+  不再与 Flask 主进程争抢 GIL 与内存
+- 同时运行的任务数不超过 max_workers，其余任务按 (优先级降序, 提交顺序) 排队，
+  队列变化时向每个排队任务推送 ('queue', {'position', 'running'}) 事件
+- 每个工作进程执行 jobs_per_worker 个任务后退出并按需重建，回收工具链累积的内存
+- 工作进程内的 logging 与 stdout/stderr 按行缓冲，每 LOG_BATCH_INTERVAL 秒合并为一个
+  ('logs', [line, ...]) 事件转发（其他事件发出前先送出缓冲，保持顺序）；tqdm 进度行只在
+  百分比变化时转发。由主进程回调推送到对应任务的 SSE 流
+- 工作进程（spawn）不导入主模块，任务函数所在模块按需导入
+- 每个工作进程使用独立的事件管道：进程崩溃或被终止时不会留下被占用的共享锁，
+  不影响其他工作进程的事件转发
+- cancel() 取消排队 / 运行中的任务：运行中的任务直接终止其工作进程（rknn.build 等无法
+  从内部中断），并删除任务登记的临时文件（register_temp）
+- 看门狗：任务函数以 set_stage() 声明当前阶段（export / load / build / export_rknn …），
+  某阶段运行超过 stage_timeouts 中的时限时按超时终止
+  终止的任务 on_done 收到 {'success': False, 'status': 'cancelled' / 'timeout', 'stage', 'message'}
+- 阶段统计：每个阶段结束时记录墙钟 / CPU 时间、峰值内存与读写字节数（见 stage_metrics），
+  以 ('stage_metrics', record) 事件发出；任务返回 dict 时全部记录写入其 'stages'，
+  计时起点（Unix 时间）写入 'stages_started_at'
+
+任务函数以 'module:function' 字符串指定，在工作进程内导入后以 kwargs 调用，
+返回值（须可 pickle）通过 on_done 回调交给主进程。
+"""
+import os
+import re
+import sys
+import time
+import heapq
+import shutil
+import atexit
+import logging
+import importlib
+import contextlib
+import itertools
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+
+from stage_metrics import StageRecorder
+
+logger = logging.getLogger(__name__)
+
+
+# ──────────────────────────────────────────────────────────────
+# 工作进程侧
+# ──────────────────────────────────────────────────────────────
+
+LOG_BATCH_INTERVAL = 0.1
+LOG_BATCH_MAX = 500               # 缓冲行数达到该值时立即送出
+
+_current = {'conn': None, 'job_id': None, 'recorder': None}
+_send_lock = threading.Lock()     # 任务线程与 log-flusher 线程共用管道
+_log_buf = []
+_tqdm_last = {}                   # tqdm 描述 → 上次转发的百分比
+_TQDM = re.compile(r'^(.*?)\s*(\d{1,3})%\s?\|')
+
+
+def _flush_logs():
+    """送出缓冲的日志行（调用方持有 _send_lock）"""
+    if _log_buf:
+        _current['conn'].send((_current['job_id'], 'logs', _log_buf[:]))
+        _log_buf.clear()
+
+
+def _emit(kind, data):
+    conn, job_id = _current['conn'], _current['job_id']
+    if conn is not None and job_id is not None:
+        with _send_lock:
+            _flush_logs()
+            conn.send((job_id, kind, data))
+
+
+def emit_event(kind, data):
+    """供任务函数在工作进程内向主进程发送自定义事件（on_event 回调收到 (kind, data)）"""
+    _emit(kind, data)
+
+
+def set_stage(name):
+    """声明当前执行阶段，主进程看门狗按阶段计时并记录上一阶段的资源统计（不在工作进程中时无效果）"""
+    recorder = _current['recorder']
+    if recorder is not None:
+        rec = recorder.start(name)
+        if rec:
+            _emit('stage_metrics', rec)
+    _emit('stage', name)
+
+
+def register_temp(path):
+    """登记临时文件 / 目录：任务被取消或超时终止时由主进程删除"""
+    if path:
+        _emit('temp', os.path.abspath(path))
+
+
+def _emit_lines(text):
+    if _current['conn'] is None or _current['job_id'] is None:
+        return
+    with _send_lock:
+        for line in text.replace('\r', '\n').split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            m = _TQDM.match(line) if '%' in line else None
+            if m:
+                if _tqdm_last.get(m.group(1)) == m.group(2):
+                    continue
+                _tqdm_last[m.group(1)] = m.group(2)
+            _log_buf.append(line)
+        if len(_log_buf) >= LOG_BATCH_MAX:
+            _flush_logs()
+
+
+def _log_flusher():
+    while True:
+        time.sleep(LOG_BATCH_INTERVAL)
+        with _send_lock:
+            if _current['job_id'] is not None:
+                _flush_logs()
+
+
+class _StreamForwarder:
+    """替换工作进程的 stdout/stderr：原样输出并逐行转发为 log 事件"""
+    def __init__(self, orig):
+        self._orig = orig
+
+    def write(self, s):
+        self._orig.write(s)
+        if s and not s.isspace():
+            _emit_lines(s)
+
+    def flush(self):
+        self._orig.flush()
+
+    def fileno(self):
+        return self._orig.fileno()
+
+    def isatty(self):
+        return False
+
+
+class _ForwardLogHandler(logging.Handler):
+    def emit(self, record):
+        try:
+            _emit_lines(self.format(record))
+        except Exception:
+            pass
+
+
+def _worker_main(task_q, conn):
+    # 先配置根 logger 输出到原始 stderr，避免之后导入的模块 basicConfig 到转发流上造成重复
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    handler = _ForwardLogHandler()
+    handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logging.getLogger().addHandler(handler)
+    sys.stdout = _StreamForwarder(sys.stdout)
+    sys.stderr = _StreamForwarder(sys.stderr)
+    _current['conn'] = conn
+    threading.Thread(target=_log_flusher, name='log-flusher', daemon=True).start()
+
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+        job_id, target, kwargs = task
+        _current['job_id'] = job_id
+        _tqdm_last.clear()
+        recorder = _current['recorder'] = StageRecorder()
+        try:
+            module_name, func_name = target.split(':')
+            func = getattr(importlib.import_module(module_name), func_name)
+            result = func(**kwargs)
+        except BaseException as e:
+            result = {'success': False, 'message': f'转换失败: {e}'}
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        rec = recorder.finish()
+        if rec:
+            _emit('stage_metrics', rec)
+        if isinstance(result, dict):
+            result.setdefault('stages', recorder.records)
+            result.setdefault('stages_started_at', recorder.started_at)
+        _emit('result', result)
+        with _send_lock:
+            _log_buf.clear()
+            _current['job_id'] = _current['recorder'] = None
+
+
+# ──────────────────────────────────────────────────────────────
+# 主进程侧
+# ──────────────────────────────────────────────────────────────
+
+_spawn_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _main_module_hidden():
+    """
+    spawn 的子进程默认重新执行主模块（python app.py 时即整个 Flask 应用、任务存储、耗时历史）。
+    工作进程只需要本模块：启动期间暂时隐藏主模块的 __spec__ / __file__，子进程不再导入它。
+    """
+    main = sys.modules['__main__']
+    saved = {k: main.__dict__[k] for k in ('__spec__', '__file__') if k in main.__dict__}
+    with _spawn_lock:
+        main.__spec__ = None
+        main.__dict__.pop('__file__', None)
+        try:
+            yield
+        finally:
+            main.__dict__.pop('__spec__', None)
+            main.__dict__.update(saved)
+
+
+class _Worker:
+    def __init__(self, ctx, index):
+        self.task_q = ctx.Queue()
+        self.events, child_conn = ctx.Pipe(duplex=False)
+        self.proc = ctx.Process(target=_worker_main, args=(self.task_q, child_conn),
+                                name=f'rknn-worker-{index}')
+        with _main_module_hidden():
+            self.proc.start()
+        child_conn.close()                # 只保留子进程持有写端，子进程退出时读端收到 EOF
+        self.job_id = None
+        self.jobs_done = 0
+        self.stop = None                  # (status, message)：被取消 / 超时终止时设置
+
+    def release(self, flush=True):
+        """
+        进程已结束后关闭事件管道与任务队列（含 feeder 线程），否则每次回收都泄漏文件描述符。
+        flush=False（进程崩溃 / 被终止）时不等待队列中未送达的数据。
+        """
+        try:
+            self.events.close()
+        except OSError:
+            pass
+        if not flush:
+            self.task_q.cancel_join_thread()
+        self.task_q.close()
+        self.task_q.join_thread()
+
+
+class _Job:
+    def __init__(self, job_id, target, kwargs, priority, on_event, on_done, timeouts):
+        self.job_id = job_id
+        self.target = target
+        self.kwargs = kwargs
+        self.priority = priority
+        self.on_event = on_event
+        self.on_done = on_done
+        self.timeouts = timeouts
+        self.stage = None
+        self.stage_since = None
+        self.temp_paths = []
+
+
+_STOP_MESSAGES = {'cancelled': '任务已取消', 'timeout': '任务超时'}
+
+
+def _stopped_result(status, message, stage):
+    return {'success': False, 'status': status, 'stage': stage,
+            'message': message or _STOP_MESSAGES.get(status, status)}
+
+
+def _remove_paths(paths):
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class ConversionExecutor:
+    """
+    submit(job_id, target, kwargs, on_event, on_done, priority=0, timeouts=None)
+      on_event(kind, data)：('queue' / 'started' / 'stage' / 'logs' …) 事件，在主进程的事件线程中调用
+      on_done(result)：任务结束（包括工作进程异常退出、被取消 / 超时终止）时调用一次
+      timeouts：{阶段: 秒}，覆盖 stage_timeouts 中的同名阶段（0 / None 表示不限制）
+    """
+
+    def __init__(self, max_workers=2, jobs_per_worker=5, mp_context='spawn', stage_timeouts=None):
+        self.max_workers = max(1, int(max_workers))
+        self.jobs_per_worker = max(1, int(jobs_per_worker))
+        self.stage_timeouts = dict(stage_timeouts or {})
+        self._ctx = multiprocessing.get_context(mp_context)
+        self._lock = threading.Lock()
+        self._pending = []                 # heap: (-priority, seq, _Job)
+        self._seq = itertools.count()
+        self._workers = []
+        self._running = {}                 # job_id -> (_Job, _Worker)
+        self._worker_index = itertools.count(1)
+        self._pump_thread = None
+        self._stopping = False
+
+    # ── 公共接口 ─────────────────────────────────────────────
+
+    def submit(self, job_id, target, kwargs, on_event, on_done, priority=0, timeouts=None):
+        job = _Job(job_id, target, kwargs, priority, on_event, on_done,
+                   dict(self.stage_timeouts, **(timeouts or {})))
+        with self._lock:
+            self._ensure_started()
+            heapq.heappush(self._pending, (-priority, next(self._seq), job))
+        self._dispatch()
+
+    def cancel(self, job_id, status='cancelled', message=None):
+        """
+        取消 job_id 以及以 'job_id:' 开头的同组任务：排队中的移出队列，运行中的终止工作进程。
+        返回取消的任务数。
+        """
+        def _match(jid):
+            return jid == job_id or jid.startswith(job_id + ':')
+
+        with self._lock:
+            dropped = [item[2] for item in self._pending if _match(item[2].job_id)]
+            if dropped:
+                self._pending = [item for item in self._pending if not _match(item[2].job_id)]
+                heapq.heapify(self._pending)
+            killed = []
+            for jid, (job, worker) in self._running.items():
+                if _match(jid) and worker.stop is None:
+                    worker.stop = (status, message)
+                    killed.append(worker)
+        for job in dropped:
+            self._safe_call(job.on_done, _stopped_result(status, message, None))
+        for worker in killed:
+            self._terminate(worker)
+        if dropped:
+            self._dispatch()
+        return len(dropped) + len(killed)
+
+    def position(self, job_id):
+        """排队位置（1 起），运行中返回 0，未知任务返回 None"""
+        with self._lock:
+            if job_id in self._running:
+                return 0
+            for i, (_, _, job) in enumerate(sorted(self._pending)):
+                if job.job_id == job_id:
+                    return i + 1
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'jobs_per_worker': self.jobs_per_worker,
+                'running': len(self._running),
+                'queued': len(self._pending),
+                'workers': [{'pid': w.proc.pid, 'busy': w.job_id is not None,
+                             'job_id': w.job_id, 'jobs_done': w.jobs_done}
+                            for w in self._workers],
+            }
+
+    def shutdown(self, timeout=5.0):
+        with self._lock:
+            self._stopping = True
+            workers = list(self._workers)
+            self._workers = []
+        for w in workers:
+            try:
+                w.task_q.put(None)
+            except Exception:
+                pass
+        for w in workers:
+            w.proc.join(timeout)
+            if w.proc.is_alive():
+                w.proc.terminate()
+                w.proc.join(timeout)
+            w.release(flush=not w.proc.is_alive())
+
+    # ── 内部实现 ─────────────────────────────────────────────
+
+    def _ensure_started(self):
+        if self._pump_thread is None:
+            self._pump_thread = threading.Thread(target=self._pump, name='executor-pump', daemon=True)
+            self._pump_thread.start()
+            atexit.register(self.shutdown)
+
+    def _dispatch(self):
+        """把排队任务分配给空闲工作进程（按需创建），并向仍在排队的任务推送位置"""
+        started, waiting = [], []
+        with self._lock:
+            if self._stopping:
+                return
+            while self._pending:
+                worker = next((w for w in self._workers if w.job_id is None), None)
+                if worker is None and len(self._workers) < self.max_workers:
+                    worker = _Worker(self._ctx, next(self._worker_index))
+                    self._workers.append(worker)
+                if worker is None:
+                    break
+                _, _, job = heapq.heappop(self._pending)
+                worker.job_id = job.job_id
+                self._running[job.job_id] = (job, worker)
+                worker.task_q.put((job.job_id, job.target, job.kwargs))
+                started.append((job, worker.proc.pid))
+            running = len(self._running)
+            waiting = [job for _, _, job in sorted(self._pending)]
+        for job, pid in started:
+            self._safe_call(job.on_event, 'started', {'pid': pid})
+        for i, job in enumerate(waiting):
+            self._safe_call(job.on_event, 'queue', {'position': i + 1, 'running': running})
+
+    def _pump(self):
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+                conns = {w.events: w for w in self._workers}
+            if not conns:
+                time.sleep(0.2)
+                continue
+            for conn in wait(list(conns), timeout=0.5):
+                with self._lock:
+                    if conns[conn] not in self._workers:
+                        continue          # 本轮中已被回收（管道可能已关闭）
+                try:
+                    job_id, kind, data = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(conns[conn])
+                    continue
+                if kind == 'result':
+                    self._finish(job_id, data)
+                    continue
+                with self._lock:
+                    entry = self._running.get(job_id)
+                    if entry and kind == 'stage':
+                        entry[0].stage, entry[0].stage_since = data, time.monotonic()
+                    elif entry and kind == 'temp':
+                        entry[0].temp_paths.append(data)
+                if entry and kind != 'temp':
+                    self._safe_call(entry[0].on_event, kind, data)
+            self._check_timeouts()
+
+    def _check_timeouts(self):
+        """看门狗：当前阶段运行超过时限的任务按超时终止"""
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            for job, worker in self._running.values():
+                limit = job.timeouts.get(job.stage) if job.stage else None
+                if limit and worker.stop is None and now - job.stage_since > limit:
+                    worker.stop = ('timeout', f'阶段 {job.stage} 超时（超过 {limit}s），已终止工作进程')
+                    expired.append((job, worker))
+        for job, worker in expired:
+            logger.warning(f'[executor] {job.job_id}：{worker.stop[1]}')
+            self._terminate(worker)
+
+    @staticmethod
+    def _terminate(worker):
+        """终止工作进程（后台执行）；事件管道随之 EOF，由 _worker_exited 结束任务"""
+        def _kill():
+            worker.proc.terminate()
+            worker.proc.join(5)
+            if worker.proc.is_alive():
+                worker.proc.kill()
+        threading.Thread(target=_kill, name='executor-kill', daemon=True).start()
+
+    def _finish(self, job_id, result, dead_worker=False):
+        retire = None
+        with self._lock:
+            entry = self._running.pop(job_id, None)
+            if entry is None:
+                return
+            job, worker = entry
+            worker.job_id = None
+            worker.jobs_done += 1
+            if dead_worker or worker.stop or worker.jobs_done >= self.jobs_per_worker:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+                retire = worker
+        if retire is not None and not dead_worker:
+            # 达到任务上限：通知退出；被取消 / 超时的进程正由 _terminate 结束。
+            # 均在后台等待进程结束后释放管道与队列，下次分配时按需重建
+            if not worker.stop:
+                retire.task_q.put(None)
+            threading.Thread(target=self._reap, args=(retire,), name='executor-reap',
+                             daemon=True).start()
+        self._safe_call(job.on_done, result)
+        self._dispatch()
+
+    @staticmethod
+    def _reap(worker):
+        worker.proc.join(30)
+        if worker.proc.is_alive():
+            worker.proc.kill()
+            worker.proc.join(5)
+        worker.release(flush=not worker.stop)
+
+    def _worker_exited(self, worker):
+        """事件管道 EOF：工作进程已退出（崩溃 / 被终止）"""
+        worker.proc.join(5)
+        if worker.job_id is not None:
+            with self._lock:
+                entry = self._running.get(worker.job_id)
+            job = entry[0] if entry else None
+            if job is not None:
+                _remove_paths(job.temp_paths)     # 被终止的任务来不及自行清理
+            if worker.stop:
+                result = _stopped_result(worker.stop[0], worker.stop[1], job and job.stage)
+            else:
+                result = {'success': False,
+                          'message': f'转换失败: 工作进程异常退出（exitcode={worker.proc.exitcode}）'}
+            self._finish(worker.job_id, result, dead_worker=True)
+        else:
+            with self._lock:
+                if worker in self._workers:
+                    self._workers.remove(worker)
+        worker.release(flush=False)
+
+    @staticmethod
+    def _safe_call(fn, *args):
+        if fn is None:
+            return
+        try:
+            fn(*args)
+        except Exception as e:
+            logger.warning(f'[executor] 回调异常：{e}')
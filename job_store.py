@@ -0,0 +1,177 @@
+"""
+任务存储：SQLite 持久化转换 / 量化搜索 / 混合量化任务
+
+每个任务一行：
+  job_id / kind（convert / sweep / hybrid）/ status / params（重新提交所需参数，JSON）/
+  stages（阶段统计，见 stage_metrics）/ result（done 事件内容）/ log_offset（已推送的日志行数）/
+  message / created / updated / finished
+状态：queued → running → success / failed / cancelled / timeout
+服务重启时（recover）：running 的任务标记为 failed（任务中断），queued 的任务交由调用方重新提交。
+日志行数与阶段统计先累积在内存中，由 flush()（定期）与 finish() 批量写入，避免每行日志一次写库。
+已结束的任务超过 ttl 由 evict() 删除。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    params      TEXT,
+    stages      TEXT,
+    result      TEXT,
+    log_offset  INTEGER NOT NULL DEFAULT 0,
+    message     TEXT,
+    created     REAL NOT NULL,
+    updated     REAL NOT NULL,
+    finished    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished);
+"""
+_JSON_FIELDS = ('params', 'stages', 'result')
+
+
+class JobStore:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._pending = {}      # job_id -> {'log_offset', 'stages'}，尚未写库的增量
+
+    def _execute(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args)
+
+    # ── 写入 ─────────────────────────────────────────────────
+
+    def create(self, job_id, kind, params):
+        now = time.time()
+        self._execute(
+            'INSERT OR REPLACE INTO jobs (job_id, kind, status, params, stages, log_offset, '
+            'created, updated) VALUES (?, ?, ?, ?, ?, 0, ?, ?)',
+            (job_id, kind, STATUS_QUEUED, json.dumps(params, ensure_ascii=False), '[]', now, now))
+
+    def set_status(self, job_id, status, message=None):
+        self._execute('UPDATE jobs SET status = ?, message = COALESCE(?, message), updated = ? '
+                      'WHERE job_id = ?', (status, message, time.time(), job_id))
+
+    def on_event(self, job_id, event_type, data):
+        """SSE 事件 → 内存增量（日志行数 / 阶段统计），done 事件写入结果"""
+        if not job_id:
+            return
+        if event_type == 'done':
+            status = data.get('status') or ('success' if data.get('success') else 'failed')
+            self.finish(job_id, status, data)
+            return
+        if event_type not in ('log', 'logs', 'stage_metrics'):
+            return
+        with self._lock:
+            pending = self._pending.setdefault(job_id, {'log_offset': 0, 'stages': []})
+            if event_type == 'log':
+                pending['log_offset'] += 1
+            elif event_type == 'logs':
+                pending['log_offset'] += len(data)
+            else:
+                pending['stages'].append(data)
+
+    def flush(self, job_id=None):
+        """内存增量写库（job_id 为空时写全部）"""
+        with self._lock:
+            ids = [job_id] if job_id else list(self._pending)
+            for jid in ids:
+                pending = self._pending.pop(jid, None)
+                if not pending:
+                    continue
+                row = self._conn.execute('SELECT stages FROM jobs WHERE job_id = ?',
+                                         (jid,)).fetchone()
+                if row is None:
+                    continue
+                stages = json.loads(row['stages'] or '[]') + pending['stages']
+                self._conn.execute(
+                    'UPDATE jobs SET log_offset = log_offset + ?, stages = ?, updated = ? '
+                    'WHERE job_id = ?',
+                    (pending['log_offset'], json.dumps(stages, ensure_ascii=False), time.time(), jid))
+
+    def finish(self, job_id, status, result):
+        self.flush(job_id)
+        now = time.time()
+        message = (result or {}).get('message', '')
+        self._execute('UPDATE jobs SET status = ?, result = ?, message = ?, updated = ?, '
+                      'finished = ? WHERE job_id = ?',
+                      (status, json.dumps(result, ensure_ascii=False, default=str),
+                       message[:2000], now, now, job_id))
+
+    # ── 读取 ─────────────────────────────────────────────────
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        for field in _JSON_FIELDS:
+            item[field] = json.loads(item[field]) if item.get(field) else None
+        return item
+
+    def get(self, job_id):
+        self.flush(job_id)
+        row = self._execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """最近的任务（不含 params / result 明细）"""
+        sql = ('SELECT job_id, kind, status, log_offset, message, created, updated, finished '
+               'FROM jobs')
+        args = []
+        if status:
+            sql += ' WHERE status = ?'
+            args.append(status)
+        sql += ' ORDER BY created DESC LIMIT ?'
+        args.append(int(limit))
+        return [dict(r) for r in self._execute(sql, args).fetchall()]
+
+    def stats(self):
+        rows = self._execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {r['status']: r['n'] for r in rows}
+
+    # ── 重启恢复 / 淘汰 ──────────────────────────────────────
+
+    def recover(self):
+        """
+        服务启动时调用：运行中的任务标记为 failed，返回 (被中断的任务, 排队中的任务) 两个列表，
+        排队任务保持 queued，由调用方重新提交或结束。
+        """
+        interrupted = [self._row(r) for r in self._execute(
+            'SELECT * FROM jobs WHERE status = ?', (STATUS_RUNNING,)).fetchall()]
+        for item in interrupted:
+            self.finish(item['job_id'], 'failed',
+                        {'success': False, 'status': 'failed', 'message': '服务重启，任务已中断'})
+        queued = [self._row(r) for r in self._execute(
+            'SELECT * FROM jobs WHERE status = ? ORDER BY created', (STATUS_QUEUED,)).fetchall()]
+        return interrupted, queued
+
+    def evict(self, ttl):
+        """删除结束超过 ttl 秒的任务，返回删除条数"""
+        cur = self._execute('DELETE FROM jobs WHERE finished IS NOT NULL AND finished < ?',
+                            (time.time() - ttl,))
+        if cur.rowcount:
+            logger.info(f'[jobs] 淘汰 {cur.rowcount} 个过期任务记录')
+        return cur.rowcount
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,290 @@
+"""
+ONNX 静态开销预估：构建前评估模型规模、NPU 不友好算子与相对延迟
+
+逐节点统计（需要形状推断，输入为动态尺寸时按给定输入尺寸固定）：
+  macs        乘加次数：Conv / ConvTranspose / MatMul / Gemm（其余算子记 0）
+  params      权重元素数（initializer，多个节点共用时只计一次）
+  activation  输出张量元素数
+按平台估算延迟（屋顶线模型，单核 NPU）：
+  每层耗时 = max(MACs / 有效算力, (输入 + 输出 + 权重字节) / 内存带宽)
+  预计回退 CPU 的算子按 (输入 + 输出字节) / CPU 带宽 + 固定同步开销计
+  平台参数为粗略的经验值，结果只用于比较（不同输入尺寸 / 平台之间的相对快慢），
+  不代表板端实测延迟。
+不同输入尺寸按输入面积比例缩放各层 MACs 与激活大小（卷积网络近似成立），权重不变。
+"""
+import os
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# 单个模型默认只占用一个 NPU 核，tops 为单核 INT8 算力
+PLATFORM_PROFILES = {
+    'rk3562': {'tops': 1.0, 'bandwidth_gbps': 6,  'cpu_gbps': 2},
+    'rk3566': {'tops': 0.8, 'bandwidth_gbps': 8,  'cpu_gbps': 2},
+    'rk3568': {'tops': 0.8, 'bandwidth_gbps': 8,  'cpu_gbps': 2},
+    'rk3576': {'tops': 3.0, 'bandwidth_gbps': 16, 'cpu_gbps': 4},
+    'rk3588': {'tops': 2.0, 'bandwidth_gbps': 20, 'cpu_gbps': 5},
+}
+NPU_EFFICIENCY = 0.35          # 实际可达到的算力比例
+FP16_SPEED = 0.25              # FP16 相对 INT8 的算力比例
+CPU_OP_OVERHEAD_MS = 0.2       # 每个回退 CPU 的算子：NPU ↔ CPU 同步与搬运开销
+
+# 预计回退 CPU 或在 NPU 上效率很低的算子（参考 rknn-toolkit2 算子支持列表，按平台）
+_UNFRIENDLY_COMMON = {
+    'NonMaxSuppression', 'NonZero', 'TopK', 'ScatterND', 'ScatterElements', 'GatherND',
+    'GatherElements', 'Loop', 'If', 'Scan', 'Einsum', 'RoiAlign', 'Range', 'CumSum', 'Unique',
+    'Mod', 'Round',
+}
+_UNFRIENDLY_RK356X = _UNFRIENDLY_COMMON | {
+    'GridSample', 'LayerNormalization', 'InstanceNormalization', 'Erf', 'Gelu', 'Where',
+    'Equal', 'Greater', 'Less', 'Not', 'And', 'Or',
+}
+UNFRIENDLY_OPS = {
+    'rk3562': _UNFRIENDLY_RK356X,
+    'rk3566': _UNFRIENDLY_RK356X,
+    'rk3568': _UNFRIENDLY_RK356X,
+    'rk3576': _UNFRIENDLY_COMMON,
+    'rk3588': _UNFRIENDLY_COMMON,
+}
+
+TOP_LAYERS = 10
+
+
+def _numel(shape):
+    n = 1
+    for d in shape or ():
+        n *= d
+    return n
+
+
+def _static_shape(vi):
+    """ValueInfo → [int, ...]；含未知维度时返回 None"""
+    dims = vi.type.tensor_type.shape.dim
+    shape = [d.dim_value if d.HasField('dim_value') else None for d in dims]
+    return shape if shape and all(isinstance(d, int) and d > 0 for d in shape) else None
+
+
+def _fix_input_shape(model, input_size, batch_size=1):
+    """把第一个图输入的动态维度固定为 [B, 3, H, W]"""
+    inits = {t.name for t in model.graph.initializer}
+    inputs = [i for i in model.graph.input if i.name not in inits]
+    if not inputs:
+        return None
+    dims = inputs[0].type.tensor_type.shape.dim
+    if len(dims) == 4:
+        for d, v in zip(dims, (batch_size, 3, input_size[0], input_size[1])):
+            if not d.HasField('dim_value') or d.dim_value <= 0:
+                d.dim_value = v
+    return inputs[0].name, [d.dim_value for d in dims]
+
+
+def analyze_onnx(onnx_path, input_size):
+    """
+    逐节点统计 MACs / 权重 / 激活，返回 (ok, msg, stats)：
+      input_shape, layers [{name, op_type, macs, params, activation, in_activation, shape}],
+      op_counts {OpType: 个数}, unknown（形状未知、无法计算的节点数）
+    """
+    try:
+        import onnx
+        from onnx import helper, shape_inference
+    except ImportError:
+        return False, '未安装 onnx，无法预估', None
+    try:
+        model = onnx.load(onnx_path)
+    except Exception as e:
+        return False, f'无法读取 ONNX：{e}', None
+    fixed = _fix_input_shape(model, input_size)
+    try:
+        model = shape_inference.infer_shapes(model, data_prop=True)
+    except Exception as e:
+        logger.warning(f'[estimate] 形状推断失败（{e}），部分层无法统计')
+
+    graph = model.graph
+    inits = {t.name: t for t in graph.initializer}
+    shapes = {}
+    for vi in list(graph.input) + list(graph.value_info) + list(graph.output):
+        s = _static_shape(vi)
+        if s:
+            shapes[vi.name] = s
+    for name, t in inits.items():
+        shapes[name] = list(t.dims)
+
+    def _itemsize(t):
+        try:
+            return helper.tensor_dtype_to_np_dtype(t.data_type).itemsize
+        except Exception:
+            return 4
+
+    layers, op_counts, seen, unknown = [], {}, set(), 0
+    for i, node in enumerate(graph.node):
+        op_counts[node.op_type] = op_counts.get(node.op_type, 0) + 1
+        if node.op_type in ('Constant', 'Identity'):
+            continue
+        params = param_bytes = 0
+        for name in node.input:
+            if name in inits and name not in seen:
+                seen.add(name)
+                n = _numel(inits[name].dims)
+                params += n
+                param_bytes += n * _itemsize(inits[name])
+        out = shapes.get(node.output[0]) if node.output else None
+        acts = [shapes.get(n) for n in node.input if n and n not in inits]
+        in_act = sum(_numel(s) for s in acts if s)
+        macs = 0
+        a = acts[0] if acts else None
+        w = shapes.get(node.input[1]) if len(node.input) > 1 else None
+        if out is None:
+            unknown += 1
+        elif node.op_type == 'Conv' and w:
+            macs = _numel(out) * _numel(w[1:])
+        elif node.op_type == 'ConvTranspose' and w and a:
+            macs = _numel(a) * _numel(w[1:])
+        elif node.op_type == 'MatMul' and a:
+            macs = _numel(out) * a[-1]
+        elif node.op_type == 'Gemm' and a:
+            trans_a = any(at.name == 'transA' and at.i for at in node.attribute)
+            macs = _numel(out) * (a[0] if trans_a else a[-1])
+        layers.append({'name': node.name or f'{node.op_type}_{i}', 'op_type': node.op_type,
+                       'macs': macs, 'params': params, 'param_bytes': param_bytes,
+                       'activation': _numel(out) if out else 0, 'in_activation': in_act,
+                       'shape': out})
+    return True, 'ok', {'input_shape': fixed[1] if fixed else None, 'layers': layers,
+                        'op_counts': op_counts, 'unknown': unknown}
+
+
+def _latency_ms(layers, platform, do_quant, scale=1.0):
+    """屋顶线模型估算单次推理耗时（ms），返回 (total, npu_ms, cpu_ms)"""
+    prof = PLATFORM_PROFILES[platform]
+    unfriendly = UNFRIENDLY_OPS[platform]
+    act_bytes = 1 if do_quant else 2
+    macs_per_s = prof['tops'] * 1e12 / 2 * NPU_EFFICIENCY * (1.0 if do_quant else FP16_SPEED)
+    bw = prof['bandwidth_gbps'] * 1e9
+    cpu_bw = prof['cpu_gbps'] * 1e9
+    npu_ms = cpu_ms = 0.0
+    for l in layers:
+        traffic = (l['activation'] + l['in_activation']) * scale * act_bytes
+        if l['op_type'] in unfriendly:
+            # CPU 上以 float32 计算
+            cpu_ms += traffic * 4 / act_bytes / cpu_bw * 1e3 + CPU_OP_OVERHEAD_MS
+            continue
+        weight = l['params'] * act_bytes
+        npu_ms += max(l['macs'] * scale / macs_per_s, (traffic + weight) / bw) * 1e3
+    return npu_ms + cpu_ms, npu_ms, cpu_ms
+
+
+def estimate_onnx(onnx_path, input_size, platforms, sizes=None, do_quant=True):
+    """
+    input_size 为 (H, W)，sizes 为额外的候选输入尺寸 [[H, W], ...]。
+    返回 (ok, msg, report)：
+      input_size / gmacs / params_m / param_mb（INT8 或 FP16 权重体积）/ peak_activation_mb /
+      activation_mb（全部层输出之和）/ op_counts / unknown_layers / top_layers /
+      platforms {平台: {unfriendly {OpType: 个数}, est_ms, npu_ms, cpu_ms}} /
+      sizes [{input_size, gmacs, est_ms {平台: ms}, relative}]（按首个平台预估耗时从快到慢）
+    """
+    platforms = [p for p in platforms if p in PLATFORM_PROFILES]
+    if not platforms:
+        return False, '没有可预估的目标平台', None
+    ok, msg, stats = analyze_onnx(onnx_path, input_size)
+    if not ok:
+        return False, msg, None
+    layers = stats['layers']
+    w_bytes = 1 if do_quant else 2
+    macs = sum(l['macs'] for l in layers)
+    params = sum(l['params'] for l in layers)
+    report = {
+        'input_size': list(input_size), 'quant': bool(do_quant),
+        'gmacs': round(macs / 1e9, 3), 'params_m': round(params / 1e6, 3),
+        'param_mb': round(params * w_bytes / 1e6, 2),
+        'peak_activation_mb': round(max((l['activation'] for l in layers), default=0)
+                                    * w_bytes / 1e6, 2),
+        'activation_mb': round(sum(l['activation'] for l in layers) * w_bytes / 1e6, 2),
+        'op_counts': stats['op_counts'], 'unknown_layers': stats['unknown'],
+        'top_layers': [{k: l[k] for k in ('name', 'op_type', 'macs', 'params', 'shape')}
+                       for l in sorted(layers, key=lambda l: -l['macs'])[:TOP_LAYERS]
+                       if l['macs']],
+        'platforms': {},
+    }
+    for p in platforms:
+        unfriendly = {op: n for op, n in stats['op_counts'].items() if op in UNFRIENDLY_OPS[p]}
+        total, npu_ms, cpu_ms = _latency_ms(layers, p, do_quant)
+        report['platforms'][p] = {'unfriendly': unfriendly, 'est_ms': round(total, 2),
+                                  'npu_ms': round(npu_ms, 2), 'cpu_ms': round(cpu_ms, 2)}
+
+    base_area = input_size[0] * input_size[1]
+    candidates = [list(input_size)] + [list(s) for s in (sizes or [])
+                                       if list(s) != list(input_size)]
+    rows = []
+    for h, w in candidates:
+        scale = h * w / base_area
+        rows.append({'input_size': [h, w], 'gmacs': round(macs * scale / 1e9, 3),
+                     'est_ms': {p: round(_latency_ms(layers, p, do_quant, scale)[0], 2)
+                                for p in platforms}})
+    rows.sort(key=lambda r: r['est_ms'][platforms[0]])
+    fastest = rows[0]['est_ms'][platforms[0]]
+    for r in rows:
+        r['relative'] = round(r['est_ms'][platforms[0]] / fastest, 2) if fastest else 1.0
+    report['sizes'] = rows
+    return True, summary_text(report), report
+
+
+def check_limits(report, max_gmacs=0, max_params_m=0):
+    """超过上限（0 表示不限制）时返回 (False, 原因)"""
+    reasons = []
+    if max_gmacs and report['gmacs'] > max_gmacs:
+        reasons.append(f"计算量 {report['gmacs']:.2f} GMACs 超过上限 {max_gmacs}")
+    if max_params_m and report['params_m'] > max_params_m:
+        reasons.append(f"参数量 {report['params_m']:.2f} M 超过上限 {max_params_m}")
+    if reasons:
+        return False, '模型超出预估上限：' + '；'.join(reasons)
+    return True, ''
+
+
+def summary_text(report):
+    h, w = report['input_size']
+    lines = [f"📐 静态预估（{w}x{h}，{'INT8' if report['quant'] else 'FP16'}）："
+             f"{report['gmacs']:.2f} GMACs，参数 {report['params_m']:.2f} M"
+             f"（{report['param_mb']:.1f} MB），峰值激活 {report['peak_activation_mb']:.1f} MB"]
+    if report['unknown_layers']:
+        lines.append(f"  {report['unknown_layers']} 个节点形状未知，未计入")
+    for p, info in report['platforms'].items():
+        line = f"  {p}：预估 {info['est_ms']:.1f} ms（相对值）"
+        if info['unfriendly']:
+            line += '，NPU 不友好算子 ' + ', '.join(f'{k}×{v}' for k, v in info['unfriendly'].items())
+        lines.append(line)
+    if len(report['sizes']) > 1:
+        lines.append('  输入尺寸排名：' + ' < '.join(
+            f"{r['input_size'][1]}x{r['input_size'][0]}（×{r['relative']:.2f}）"
+            for r in report['sizes']))
+    return '\n'.join(lines)
+
+
+# ──────────────────────────────────────────────────────────────
+# 工作进程任务入口（job_executor 以 'model_estimate:run_estimate_job' 调用）
+# ──────────────────────────────────────────────────────────────
+
+def run_estimate_job(model_type, input_path, input_size, platforms, sizes=None, do_quant=True,
+                     cache_dir=None, cache_max_bytes=0):
+    """
+    /api/estimate：ONNX 直接预估；PT 先导出 ONNX（写入转换缓存，后续转换可复用）。
+    返回 success / message / report
+    """
+    from converter import UniversalConverter, _remove_quiet
+    from job_executor import register_temp
+    onnx_path, tmp = input_path, None
+    if os.path.splitext(input_path)[1].lower() in ('.pt', '.pth'):
+        converter = UniversalConverter(verbose=False, cache_dir=cache_dir,
+                                       cache_max_bytes=cache_max_bytes)
+        fd, tmp = tempfile.mkstemp(suffix='.onnx')
+        os.close(fd)
+        register_temp(tmp)
+        ok, msg, onnx_path = converter.export_onnx(model_type, input_path, tuple(input_size), tmp)
+        if not ok:
+            _remove_quiet(tmp)
+            return {'success': False, 'message': f'ONNX 导出失败：{msg}'}
+    try:
+        ok, msg, report = estimate_onnx(onnx_path, tuple(input_size), platforms, sizes, do_quant)
+    finally:
+        if tmp:
+            _remove_quiet(tmp)
+    return {'success': ok, 'message': msg, 'report': report}
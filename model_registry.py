@@ -19,6 +19,7 @@ MODEL_REGISTRY = {
         'mean_values': [[0, 0, 0]],
         'std_values': [[255, 255, 255]],
         'calibration_subdir': 'coco',
+        'onnx_rewrite': True,               # .onnx 输入改写为分头输出（见 onnx_rewrite）
         'hint': '上传 YOLOv8/YOLOv5 等目标检测 .pt 或导出的 .onnx'
     },
     'yolov8_seg': {
@@ -64,6 +65,43 @@ MODEL_REGISTRY = {
         'hint': '上传 yolov8n-obb.pt 或对应 .onnx（DOTA 数据集训练）'
     },
 
+    # -------------------------------------------------------
+    # NMS-free 端到端检测头 - 输出 top-k [1, N, 6]（x1,y1,x2,y2,score,cls），
+    # 设备端只需按阈值过滤，无需 NMS
+    # -------------------------------------------------------
+    'yolov10_det': {
+        'name': 'YOLOv10 目标检测 (NMS-free)',
+        'short': 'YOLOv10-Det',
+        'icon': '⚡',
+        'description': 'one-to-one 检测头，输出 top-k [N,6]，免 NMS',
+        'accepted_exts': ['pt', 'pth', 'onnx'],
+        'source_type': 'pt_or_onnx',
+        'ultralytics_task': 'detect',
+        'nms_free': True,                   # 跳过 rknnopt 分头导出（会丢弃 one-to-one 头）
+        'export_args': {},                  # YOLOv10 默认即导出 end2end 头
+        'input_size_default': [640, 640],
+        'mean_values': [[0, 0, 0]],
+        'std_values': [[255, 255, 255]],
+        'calibration_subdir': 'coco',
+        'hint': '上传 yolov10n.pt 等 YOLOv10 模型或其导出的 .onnx（输出 [1,300,6]）'
+    },
+    'yolo11_e2e': {
+        'name': 'YOLO11 端到端检测 (End2End)',
+        'short': 'YOLO11-E2E',
+        'icon': '🚀',
+        'description': 'YOLO11 end2end 导出，输出 top-k [N,6]，免 NMS',
+        'accepted_exts': ['pt', 'pth', 'onnx'],
+        'source_type': 'pt_or_onnx',
+        'ultralytics_task': 'detect',
+        'nms_free': True,
+        'export_args': {'end2end': True},   # 需要支持 end2end 导出参数的 ultralytics 版本
+        'input_size_default': [640, 640],
+        'mean_values': [[0, 0, 0]],
+        'std_values': [[255, 255, 255]],
+        'calibration_subdir': 'coco',
+        'hint': '上传 YOLO11 检测 .pt（将以 end2end 方式导出）或已导出的 [1,N,6] .onnx'
+    },
+
     # -------------------------------------------------------
     # 图像分类 / 人脸检测 - 仅接受 .onnx
     # -------------------------------------------------------
@@ -115,6 +153,7 @@ def get_model_types_meta():
             'input_size_default': cfg['input_size_default'],
             'hint': cfg['hint'],
             'calibration_subdir': cfg['calibration_subdir'],
+            'nms_free': cfg.get('nms_free', False),
         })
     return result
 
@@ -131,16 +170,93 @@ def validate_file_ext(model_type: str, filename: str) :
     return True, "ok"
 
 
+# 检测头模块名 → ultralytics task（用于 checkpoint 未记录 train_args 时推断）
+_HEAD_TASKS = {
+    'Detect': 'detect', 'v10Detect': 'detect', 'RTDETRDecoder': 'detect',
+    'Segment': 'segment', 'Pose': 'pose', 'OBB': 'obb', 'Classify': 'classify',
+}
+
+
+class _Stub:
+    """peek_pt_task 反序列化占位对象：接受任意构造参数与状态，不加载任何张量"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):   # (dict_state, slots_state)
+            state = state[0]
+        if isinstance(state, dict):
+            self.__dict__.update(state)
+
+    def __setitem__(self, key, value):
+        pass
+
+
+def peek_pt_task(pt_path: str):
+    """
+    不加载 torch / 模型权重，直接读取 ultralytics checkpoint 中的 task。
+    .pt 为 zip（torch.save 格式），只解析其中的 data.pkl：所有类替换为占位对象，
+    张量存储（persistent_load）跳过，耗时与文件大小基本无关。
+    无法判断时返回 None。
+    """
+    import io
+    import pickle
+    import zipfile
+
+    class _Unpickler(pickle.Unpickler):
+        _SAFE = {('collections', 'OrderedDict'), ('builtins', 'set'),
+                 ('builtins', 'frozenset'), ('builtins', 'slice'), ('builtins', 'tuple')}
+
+        def find_class(self, module, name):
+            if (module, name) in self._SAFE:
+                return super().find_class(module, name)
+            return type(name, (_Stub,), {})
+
+        def persistent_load(self, pid):
+            return None
+
+    try:
+        with zipfile.ZipFile(pt_path) as zf:
+            pkl = next((n for n in zf.namelist() if n.endswith('data.pkl')), None)
+            if pkl is None:
+                return None
+            ckpt = _Unpickler(io.BytesIO(zf.read(pkl))).load()
+    except Exception:
+        return None
+    if not isinstance(ckpt, dict):
+        return None
+
+    train_args = ckpt.get('train_args')
+    if isinstance(train_args, dict) and train_args.get('task'):
+        return train_args['task']
+    model = ckpt.get('ema') or ckpt.get('model')
+    attrs = getattr(model, '__dict__', {})
+    args = attrs.get('args')
+    if isinstance(args, dict) and args.get('task'):
+        return args['task']
+    yaml_cfg = attrs.get('yaml')
+    if isinstance(yaml_cfg, dict) and yaml_cfg.get('head'):
+        head = yaml_cfg['head'][-1]
+        if isinstance(head, (list, tuple)) and len(head) >= 3:
+            return _HEAD_TASKS.get(str(head[2]))
+    return None
+
+
 def validate_pt_task(model_type: str, pt_path: str) :
-    """对 .pt/.pth 文件，用 ultralytics 加载并校验 task"""
+    """
+    对 .pt/.pth 文件校验 task。优先用 peek_pt_task 直接读取 checkpoint 元数据，
+    只有读取不到时才回退到用 ultralytics 完整加载模型（转换任务内还会再加载一次）。
+    """
     cfg = MODEL_REGISTRY[model_type]
     expected_task = cfg.get('ultralytics_task')
     if expected_task is None:
         return True, "不需要 task 校验"
     try:
-        from ultralytics import YOLO
-        model = YOLO(pt_path)
-        actual_task = getattr(model, 'task', None)
+        actual_task = peek_pt_task(pt_path)
+        if actual_task is None:
+            from ultralytics import YOLO
+            model = YOLO(pt_path)
+            actual_task = getattr(model, 'task', None)
         if actual_task and actual_task != expected_task:
             task_map = {
                 'detect': 'YOLOv8-Det 目标检测',
@@ -0,0 +1,149 @@
+"""
+用户 ONNX 的 NPU 友好改写：ultralytics 检测头分头输出
+
+ultralytics 标准导出的检测头尾部为
+  每个 scale：Concat(box_conv[1,64,H,W], cls_conv[1,nc,H,W]) → Reshape
+  三个 scale：Concat → Split → DFL(Softmax + Conv) → 框解码 / Sigmoid → Concat[1,4+nc,N]
+尾部算子在 INT8 下共用一个输出 scale，且多数回退到 CPU 执行。
+改写在每个 scale 的 Concat 之前截断，输出 3 × (box_dfl[1,64,H,W], cls_logits[1,nc,H,W])，
+与 rknnopt 分头导出的布局一致（sigmoid 不在图内，DFL / 解码 / sigmoid 由后处理完成），
+随后做常量折叠与图化简（需要 onnxsim，未安装时跳过）。
+
+输出布局记录为 dict（写入 .meta.json 的 output_layout）：
+  format   'split_head'
+  reg_max  DFL 分布长度（16）
+  nc       类别数
+  sigmoid  False（cls 输出为 logit）
+  outputs  [{name, role: 'box_dfl' / 'cls_logits', scale, shape}]，按 stride 从小到大排列
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 改写逻辑变化时递增，使缓存的改写结果与 .rknn 失效
+REWRITE_VERSION = 1
+
+REG_MAX = 16
+N_SCALES = 3
+
+
+def _attr(node, name, default=None):
+    for a in node.attribute:
+        if a.name == name:
+            import onnx
+            return onnx.helper.get_attribute_value(a)
+    return default
+
+
+def _conv_out_channels(node, inits):
+    if node is None or node.op_type != 'Conv' or len(node.input) < 2:
+        return None
+    w = inits.get(node.input[1])
+    return int(w.dims[0]) if w is not None and len(w.dims) == 4 else None
+
+
+def _shape_of(name, shapes):
+    vi = shapes.get(name)
+    if vi is None:
+        return None
+    dims = vi.type.tensor_type.shape.dim
+    return [d.dim_value if d.HasField('dim_value') else (d.dim_param or '?') for d in dims]
+
+
+def find_detect_head(model):
+    """
+    查找 ultralytics Detect 头：3 个 axis=1 的 Concat，输入分别为 64 通道的框回归 Conv
+    与 nc 通道的分类 Conv。返回 [(box_name, cls_name, nc), ...]（按 stride 从小到大），
+    未匹配时返回 None。model 应已做过形状推断（用于按特征图尺寸排序）。
+    """
+    graph = model.graph
+    producers = {out: node for node in graph.node for out in node.output}
+    inits = {t.name: t for t in graph.initializer}
+
+    heads = []
+    for node in graph.node:
+        if node.op_type != 'Concat' or len(node.input) != 2 or _attr(node, 'axis') != 1:
+            continue
+        box_name, cls_name = node.input
+        cls_node = producers.get(cls_name)
+        if cls_node is not None and cls_node.op_type == 'Sigmoid':
+            cls_name = cls_node.input[0]          # 去掉分类分支上的 sigmoid
+            cls_node = producers.get(cls_name)
+        box_ch = _conv_out_channels(producers.get(box_name), inits)
+        nc = _conv_out_channels(cls_node, inits)
+        if box_ch == 4 * REG_MAX and nc:
+            heads.append((box_name, cls_name, nc))
+    if len(heads) != N_SCALES or len({nc for _, _, nc in heads}) != 1:
+        return None
+
+    # 按特征图高度从大到小（stride 从小到大）排序；动态尺寸时保持图中顺序（ultralytics 即 P3→P5）
+    shapes = {vi.name: vi for vi in graph.value_info}
+    heights = [(_shape_of(b, shapes) or [0, 0, 0])[2] for b, _, _ in heads]
+    if all(isinstance(h, int) and h > 0 for h in heights):
+        heads = [h for _, h in sorted(zip(heights, heads), key=lambda x: -x[0])]
+    return heads
+
+
+def _simplify(model):
+    """常量折叠 + 图化简，返回 (model, 说明)"""
+    try:
+        from onnxsim import simplify
+    except ImportError:
+        return model, '未安装 onnxsim，跳过常量折叠'
+    try:
+        simplified, ok = simplify(model)
+    except Exception as e:
+        return model, f'onnxsim 化简失败（{e}），保留未化简图'
+    if not ok:
+        return model, 'onnxsim 校验未通过，保留未化简图'
+    return simplified, '已常量折叠并化简'
+
+
+def rewrite_detect_head(onnx_path, output_path):
+    """
+    改写 ultralytics 检测 ONNX 为分头输出并保存到 output_path。
+    返回 (ok, msg, layout)；未识别出检测头或未安装 onnx 时 ok=False，调用方使用原 ONNX。
+    """
+    try:
+        import onnx
+        from onnx.utils import Extractor
+    except ImportError:
+        return False, '未安装 onnx，跳过检测头改写', None
+    try:
+        model = onnx.load(onnx_path)
+    except Exception as e:
+        return False, f'无法读取 ONNX（{e}），跳过检测头改写', None
+    try:
+        model = onnx.shape_inference.infer_shapes(model)    # 截取子图需要中间张量的形状
+    except Exception as e:
+        logger.warning(f'[onnx-rewrite] 形状推断失败（{e}）')
+
+    heads = find_detect_head(model)
+    if heads is None:
+        return False, '未识别出 ultralytics 检测头（可能已是分头输出），使用原 ONNX', None
+
+    output_names = [name for box, cls, _ in heads for name in (box, cls)]
+    input_names = [i.name for i in model.graph.input
+                   if i.name not in {t.name for t in model.graph.initializer}]
+    try:
+        cut = Extractor(model).extract_model(input_names, output_names)
+        cut, simplify_msg = _simplify(cut)
+        onnx.checker.check_model(cut)
+        onnx.save(cut, output_path)
+    except Exception as e:
+        return False, f'检测头改写失败（{e}），使用原 ONNX', None
+
+    shapes = {vi.name: vi for vi in cut.graph.output}
+    nc = heads[0][2]
+    layout = {'format': 'split_head', 'reg_max': REG_MAX, 'nc': nc, 'sigmoid': False,
+              'outputs': []}
+    for scale, (box, cls, _) in enumerate(heads):
+        layout['outputs'].append({'name': box, 'role': 'box_dfl', 'scale': scale,
+                                  'shape': _shape_of(box, shapes)})
+        layout['outputs'].append({'name': cls, 'role': 'cls_logits', 'scale': scale,
+                                  'shape': _shape_of(cls, shapes)})
+    removed = len(model.graph.node) - len(cut.graph.node)
+    msg = (f'检测头改写为 {N_SCALES} × (box_dfl, cls_logits) 分头输出（nc={nc}），'
+           f'移除 {removed} 个尾部节点，{simplify_msg}')
+    logger.info(f'[onnx-rewrite] {msg}')
+    return True, msg, layout
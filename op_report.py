@@ -0,0 +1,143 @@
+"""
+RKNN 构建日志解析：算子放置与 CPU 回退报告
+
+rknn-toolkit2 以 verbose 构建时会输出逐算子表（RKNN(verbose_file=...) 同时写入文件）：
+  ID  OpType  DataType  Target  InputShape  OutputShape  Cycles(DDR/NPU/Total)  RW(KB)  FullName
+  0   InputOperator  INT8  CPU  \\  (1,3,640,640)  ...  InputOperator:images
+  1   ConvRelu       INT8  NPU  (1,3,640,640),...  ...  Conv:/model.0/conv/Conv
+以及不支持 / 回退到 CPU 的算子告警（W / E 级别日志）。
+解析结果：
+  ops / npu_ops / cpu_ops   算子总数、NPU 算子数、CPU 算子数（不含输入 / 输出边界算子）
+  cpu_op_types              {OpType: 个数}
+  cpu_layers                [{id, op_type, dtype, name}]
+  dtypes                    {DataType: 个数}
+  layers                    逐层 [{id, op_type, dtype, target, name}]（只写入报告文件）
+  warnings                  与算子支持 / 回退相关的告警
+  transitions               NPU ↔ CPU 切换次数（每次切换都有一次同步与数据搬运）
+  status                    ok / warn（只有尾部算子在 CPU）/ cpu_bound
+"""
+import re
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+REPORT_SUFFIX = '.ops.json'
+
+# CPU 算子占比达到该值，或 CPU 算子位于 NPU 算子之间时视为 CPU 受限
+CPU_BOUND_RATIO = 0.1
+
+_BOUNDARY_OPS = ('InputOperator', 'OutputOperator')
+_DTYPES = ('INT4', 'INT8', 'UINT8', 'INT16', 'INT32', 'INT64', 'FLOAT16', 'FLOAT32', 'BFLOAT16', 'BOOL')
+_PREFIX = re.compile(r'^\s*[DIWE]\s+(?:RKNN:\s*)?(?:\[[^\]]*\]\s*)?')
+_ROW = re.compile(r'^(\d+)\s+(\S+)\s+(' + '|'.join(_DTYPES) + r')\s+(NPU|CPU|GPU)\b(.*)$')
+_WARN = re.compile(r'^\s*([WE])\s+(.*)$')
+_WARN_KEYWORDS = ('not support', 'unsupport', 'fallback', 'fall back', 'cpu')
+
+
+def parse_build_log(lines):
+    """构建日志行 → 报告 dict（见模块说明）"""
+    layers, warnings = [], []
+    in_table = False
+    for raw in lines:
+        raw = raw.rstrip('\n')
+        body = _PREFIX.sub('', raw, count=1).strip()
+        if 'OpType' in body and 'Target' in body:
+            in_table = True
+            continue
+        m = _ROW.match(body) if in_table else None
+        if m:
+            tail = m.group(5).split()
+            name = tail[-1] if tail and ':' in tail[-1] else ''
+            layers.append({'id': int(m.group(1)), 'op_type': m.group(2), 'dtype': m.group(3),
+                           'target': m.group(4), 'name': name})
+            continue
+        w = _WARN.match(raw)
+        if w and body and any(k in body.lower() for k in _WARN_KEYWORDS):
+            if body not in warnings:
+                warnings.append(body)
+    return summarize(layers, warnings)
+
+
+def summarize(layers, warnings=()):
+    # 同一模型的表可能输出多次（如量化前后），按 ID 去重保留最后一次
+    by_id = {}
+    for layer in layers:
+        by_id[layer['id']] = layer
+    layers = [by_id[k] for k in sorted(by_id)]
+    body = [l for l in layers if l['op_type'] not in _BOUNDARY_OPS]
+    cpu = [l for l in body if l['target'] == 'CPU']
+
+    cpu_types, dtypes = {}, {}
+    for l in cpu:
+        cpu_types[l['op_type']] = cpu_types.get(l['op_type'], 0) + 1
+    for l in body:
+        dtypes[l['dtype']] = dtypes.get(l['dtype'], 0) + 1
+
+    transitions = sum(1 for a, b in zip(body, body[1:]) if a['target'] != b['target'])
+    last_npu = max((i for i, l in enumerate(body) if l['target'] != 'CPU'), default=-1)
+    mid_cpu = any(l['target'] == 'CPU' for l in body[:last_npu])
+    ratio = len(cpu) / len(body) if body else 0.0
+    if not cpu:
+        status = 'ok'
+    elif mid_cpu or ratio >= CPU_BOUND_RATIO:
+        status = 'cpu_bound'
+    else:
+        status = 'warn'
+    return {
+        'ops': len(body), 'npu_ops': len(body) - len(cpu), 'cpu_ops': len(cpu),
+        'cpu_ratio': round(ratio, 4), 'transitions': transitions, 'status': status,
+        'cpu_op_types': cpu_types,
+        'cpu_layers': [{k: l[k] for k in ('id', 'op_type', 'dtype', 'name')} for l in cpu],
+        'dtypes': dtypes, 'warnings': list(warnings), 'layers': layers,
+        'parsed': bool(layers),
+    }
+
+
+def summary_text(report):
+    """报告 → 日志 / 前端展示用的多行摘要"""
+    if not report or not report.get('parsed'):
+        return 'ℹ️ 构建日志中未找到逐算子表（需要 verbose 构建），未生成 CPU 回退报告'
+    head = {'ok': '✅ 全部算子在 NPU 上执行',
+            'warn': '⚠️ 少量尾部算子回退到 CPU',
+            'cpu_bound': '❌ 存在 CPU 回退算子，模型可能受 CPU 限制'}[report['status']]
+    lines = [f"{head}：NPU {report['npu_ops']} / CPU {report['cpu_ops']} 个算子"
+             f"（CPU 占比 {report['cpu_ratio']:.1%}，NPU↔CPU 切换 {report['transitions']} 次）"]
+    if report['cpu_op_types']:
+        lines.append('  CPU 算子：' + ', '.join(f'{k}×{v}' for k, v in
+                                               sorted(report['cpu_op_types'].items(),
+                                                      key=lambda x: -x[1])))
+    if report['dtypes']:
+        lines.append('  数据类型：' + ', '.join(f'{k} {v}' for k, v in sorted(report['dtypes'].items())))
+    for w in report['warnings'][:5]:
+        lines.append(f'  告警：{w}')
+    return '\n'.join(lines)
+
+
+def brief(report):
+    """任务结果 / 历史列表用的精简报告（去掉逐层明细）"""
+    if not report:
+        return None
+    return {k: v for k, v in report.items() if k != 'layers'}
+
+
+def parse_log_file(log_path):
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            return parse_build_log(f)
+    except OSError as e:
+        logger.warning(f'[ops] 读取构建日志失败：{e}')
+        return None
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
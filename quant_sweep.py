@@ -0,0 +1,215 @@
+"""
+INT8 量化参数搜索（sweep）
+
+在 quantized_algorithm × quantized_method × 校准图片数 的网格上分别构建同一模型，
+每个候选在独立工作进程中执行：
+  build（INT8）→ export_rknn → x86 模拟器推理留出图片 → 与 FP16 参考输出计算余弦相似度
+记录 .rknn 体积与构建耗时，按 (平均余弦相似度↓, 体积↑, 构建耗时↑) 排名。
+
+留出图片取自 dataset.txt 末尾，不参与任何候选的校准；校准子集从其余图片中等间隔抽取。
+参考输出由 FP16 构建在同一批留出图片上推理得到（run_reference_job），只计算一次。
+"""
+import os
+import time
+import logging
+import itertools
+
+import cv2
+import numpy as np
+
+from model_registry import MODEL_REGISTRY
+from job_executor import set_stage
+from build_options import effective_build_options
+from inferencer import letterbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SWEEP_GRID = {
+    'quantized_algorithm': ['normal', 'mmse', 'kl_divergence'],
+    'quantized_method': ['layer', 'channel'],
+    'calib_size': [20, 50, 100],
+}
+DEFAULT_HOLDOUT = 5
+
+
+# ──────────────────────────────────────────────────────────────
+# 网格与数据集划分（主进程）
+# ──────────────────────────────────────────────────────────────
+
+def _read_dataset(dataset_path):
+    base = os.path.dirname(os.path.abspath(dataset_path))
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        lines = [l.strip() for l in f if l.strip()]
+    return [l if os.path.isabs(l) else os.path.join(base, l) for l in lines]
+
+
+def split_dataset(dataset_path, calib_sizes, holdout, work_dir):
+    """
+    划分留出集与各尺寸校准子集。
+    返回 (subsets {实际图片数: dataset.txt 路径}, holdout_images)；
+    校准图片不足时子集尺寸截断为可用数量（相同尺寸只保留一份）。
+    """
+    images = _read_dataset(dataset_path)
+    holdout = max(1, min(int(holdout), len(images) - 1))
+    if len(images) < 2:
+        raise RuntimeError('校准集图片不足 2 张，无法划分留出集')
+    held, pool = images[-holdout:], images[:-holdout]
+
+    os.makedirs(work_dir, exist_ok=True)
+    subsets = {}
+    for size in sorted(set(int(s) for s in calib_sizes)):
+        n = max(1, min(size, len(pool)))
+        if n in subsets:
+            continue
+        idx = np.linspace(0, len(pool) - 1, n).round().astype(int)
+        path = os.path.join(work_dir, f'calib_{n}.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(pool[i] for i in idx) + '\n')
+        subsets[n] = path
+    return subsets, held
+
+
+def expand_grid(algorithms, methods, calib_sizes):
+    """网格展开为候选配置列表：[{quantized_algorithm, quantized_method, calib_size}]"""
+    return [{'quantized_algorithm': a, 'quantized_method': m, 'calib_size': n}
+            for a, m, n in itertools.product(algorithms, methods, calib_sizes)]
+
+
+def config_label(config):
+    return f"{config['quantized_algorithm']}/{config['quantized_method']}/{config['calib_size']}"
+
+
+def rank_results(results):
+    """成功的候选按 (平均余弦↓, 体积↑, 构建耗时↑) 排序，失败的排在最后"""
+    ok = sorted((r for r in results if r.get('success')),
+                key=lambda r: (-r['cosine'], r['size'], r['build_time']))
+    failed = [r for r in results if not r.get('success')]
+    for i, r in enumerate(ok):
+        r['rank'] = i + 1
+    return ok + failed
+
+
+# ──────────────────────────────────────────────────────────────
+# 工作进程任务（job_executor 以 'quant_sweep:<函数名>' 调用）
+# ──────────────────────────────────────────────────────────────
+
+def _build_session(model_type, artifact, platform, input_size, do_quant, dataset_path,
+                   build_options):
+    """config → load → build，返回已构建的 RKNN 对象（调用方负责 release）"""
+    from rknn.api import RKNN
+    cfg = MODEL_REGISTRY[model_type]
+    set_stage('load')
+    rknn = RKNN(verbose=True)
+    try:
+        ret = rknn.config(mean_values=cfg['mean_values'], std_values=cfg['std_values'],
+                          target_platform=platform, **(build_options or {}))
+        if ret != 0:
+            raise RuntimeError(f'RKNN config 失败，ret={ret}')
+        shape = [[1, 3, input_size[0], input_size[1]]]
+        if artifact['kind'] == 'torchscript':
+            ret = rknn.load_pytorch(model=artifact['path'], input_size_list=shape)
+        else:
+            ret = rknn.load_onnx(model=artifact['path'], input_size_list=shape)
+        if ret != 0:
+            raise RuntimeError(f'加载模型失败，ret={ret}')
+        set_stage('build')
+        if do_quant:
+            ret = rknn.build(do_quantization=True, dataset=dataset_path)
+        else:
+            ret = rknn.build(do_quantization=False)
+        if ret != 0:
+            raise RuntimeError(f'RKNN build 失败，ret={ret}')
+    except Exception:
+        rknn.release()
+        raise
+    return rknn
+
+
+def _simulate(rknn, images, input_size):
+    """模拟器推理留出图片，返回 [[output ndarray, ...], ...]"""
+    set_stage('simulate')
+    ret = rknn.init_runtime()
+    if ret != 0:
+        raise RuntimeError(f'init_runtime 失败，ret={ret}')
+    results = []
+    for path in images:
+        img = cv2.imread(path)
+        if img is None:
+            raise RuntimeError(f'无法读取留出图片：{path}')
+        img_lb, _, _, _ = letterbox(img, input_size[1], input_size[0])
+        outputs = rknn.inference(inputs=[img_lb])
+        if not outputs:
+            raise RuntimeError('inference() 返回空结果')
+        results.append([np.asarray(o, dtype=np.float32) for o in outputs])
+    return results
+
+
+def _cosine(a, b):
+    a, b = a.ravel().astype(np.float64), b.ravel().astype(np.float64)
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    if denom == 0:
+        return 1.0 if not a.any() and not b.any() else 0.0
+    return float(np.dot(a, b) / denom)
+
+
+def run_reference_job(model_type, artifact, platform, input_size, holdout_images,
+                      reference_path):
+    """FP16 构建并推理留出图片，输出保存为 npz（键 '<图片序号>_<输出序号>'）"""
+    try:
+        rknn = _build_session(model_type, artifact, platform, tuple(input_size), False, None, {})
+        try:
+            outputs = _simulate(rknn, holdout_images, tuple(input_size))
+        finally:
+            rknn.release()
+        np.savez(reference_path, **{f'{i}_{j}': o for i, outs in enumerate(outputs)
+                                    for j, o in enumerate(outs)})
+        return {'success': True, 'message': f'FP16 参考输出：{len(outputs)} 张留出图片'}
+    except Exception as e:
+        return {'success': False, 'message': f'参考输出生成失败：{e}'}
+
+
+def run_candidate_job(model_type, artifact, platform, input_size, config, dataset_path,
+                      holdout_images, reference_path, output_path, build_options=None):
+    """
+    按 config 构建一个 INT8 候选并评估。
+    返回 success / message / config / cosine（留出集平均）/ min_cosine / size / build_time
+    """
+    result = {'success': False, 'config': config, 'output_path': output_path}
+    options = effective_build_options(
+        dict(build_options or {}, quantized_algorithm=config['quantized_algorithm'],
+             quantized_method=config['quantized_method']),
+        platform, True)
+    result['build_options'] = options
+    logger.info(f'[sweep] 候选 {config_label(config)}：开始构建')
+    try:
+        t0 = time.time()
+        rknn = _build_session(model_type, artifact, platform, tuple(input_size), True,
+                              dataset_path, options)
+        try:
+            result['build_time'] = round(time.time() - t0, 2)
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            set_stage('export_rknn')
+            ret = rknn.export_rknn(output_path)
+            if ret != 0:
+                raise RuntimeError(f'export_rknn 失败，ret={ret}')
+            result['size'] = os.path.getsize(output_path)
+            outputs = _simulate(rknn, holdout_images, tuple(input_size))
+        finally:
+            rknn.release()
+    except Exception as e:
+        result['message'] = f'候选 {config_label(config)} 失败：{e}'
+        return result
+
+    ref = np.load(reference_path)
+    per_image = []
+    worst = 1.0
+    for i, outs in enumerate(outputs):
+        sims = [_cosine(o, ref[f'{i}_{j}']) for j, o in enumerate(outs)]
+        per_image.append(sum(sims) / len(sims))
+        worst = min(worst, min(sims))
+    result.update(success=True, cosine=round(float(np.mean(per_image)), 6),
+                  min_cosine=round(worst, 6))
+    result['message'] = (f"候选 {config_label(config)}：cos={result['cosine']:.6f}，"
+                         f"体积 {result['size'] / 1e6:.2f} MB，构建 {result['build_time']:.1f}s")
+    logger.info(f'[sweep] {result["message"]}')
+    return result
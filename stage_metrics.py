@@ -0,0 +1,152 @@
+"""
+转换阶段计时与资源统计
+
+工作进程内由 job_executor.set_stage() 驱动：声明新阶段时结束上一阶段，每个阶段记录为
+  stage                     阶段名（upload / export / estimate / export_onnx / load / calibration /
+                            build / export_rknn …）
+  start_s                   相对任务开始的时间（秒）；各工作进程分别从自己的子任务开始计时，
+                            合并多个子任务的记录时用 rebase() 换算到同一起点
+  wall_s                    墙钟耗时（秒）
+  cpu_s                     进程 CPU 时间（用户 + 系统，含已回收的子进程）
+  peak_rss_mb               阶段内进程峰值常驻内存；Linux 上每个阶段开始时经 /proc/self/clear_refs
+                            重置峰值，不支持时为进程启动以来的峰值
+  read_bytes / write_bytes  阶段内读写字节数（/proc/self/io 的 rchar / wchar，含页缓存命中），
+                            不可用时为 None
+统计的是整个工作进程（每个工作进程同一时间只执行一个任务）。
+"""
+import os
+import time
+import threading
+
+try:
+    import resource
+except ImportError:                 # Windows
+    resource = None
+
+_PROC_IO = '/proc/self/io'
+_PROC_STATUS = '/proc/self/status'
+_PROC_CLEAR_REFS = '/proc/self/clear_refs'
+
+
+def _cpu_s():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _io_bytes():
+    try:
+        with open(_PROC_IO, 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['rchar']), int(fields['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _reset_peak():
+    """重置 VmHWM（Linux ≥ 4.0），返回是否成功"""
+    try:
+        with open(_PROC_CLEAR_REFS, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open(_PROC_STATUS, 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+def make_record(stage, wall_s, cpu_s=None, peak_rss_mb=None, read_bytes=None, write_bytes=None,
+                start_s=0.0):
+    return {'stage': stage, 'start_s': round(start_s, 3), 'wall_s': round(wall_s, 3),
+            'cpu_s': None if cpu_s is None else round(cpu_s, 3), 'peak_rss_mb': peak_rss_mb,
+            'read_bytes': read_bytes, 'write_bytes': write_bytes}
+
+
+class StageRecorder:
+    """一个任务内的阶段记录器：start() 切换阶段并返回刚结束阶段的记录"""
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+        self.started_at = time.time()     # 计时起点（Unix 时间，跨进程对齐用）
+        self._open = None
+
+    def start(self, name):
+        with self._lock:
+            closed = self._close()
+            rchar, wchar = _io_bytes()
+            _reset_peak()
+            self._open = (name, time.monotonic(), _cpu_s(), rchar, wchar)
+            return closed
+
+    def finish(self):
+        with self._lock:
+            return self._close()
+
+    def _close(self):
+        if self._open is None:
+            return None
+        name, t, cpu, rchar, wchar = self._open
+        self._open = None
+        r2, w2 = _io_bytes()
+        rec = make_record(
+            name, time.monotonic() - t, _cpu_s() - cpu, _peak_rss_mb(),
+            None if rchar is None or r2 is None else r2 - rchar,
+            None if wchar is None or w2 is None else w2 - wchar,
+            start_s=t - self._t0)
+        self.records.append(rec)
+        return rec
+
+
+def rebase(records, started_at, origin):
+    """
+    子任务的阶段记录换算到以 origin（Unix 时间）为起点的时间线；
+    started_at 或 origin 未知时无法对齐，start_s 置为 None
+    """
+    if started_at is None or origin is None:
+        return [dict(r, start_s=None) for r in records]
+    offset = started_at - origin
+    return [dict(r, start_s=round(r['start_s'] + offset, 3)) for r in records]
+
+
+def _fmt_bytes(n):
+    if n is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+    return f'{n:.2f} GB'
+
+
+def record_text(rec):
+    """单个阶段记录 → 一行日志"""
+    parts = [f"{rec['stage']} {rec['wall_s']:.2f}s"]
+    if rec.get('cpu_s') is not None:
+        parts.append(f"CPU {rec['cpu_s']:.2f}s")
+    if rec.get('peak_rss_mb') is not None:
+        parts.append(f"峰值内存 {rec['peak_rss_mb']:.0f} MB")
+    if rec.get('read_bytes') is not None or rec.get('write_bytes') is not None:
+        parts.append(f"读 {_fmt_bytes(rec.get('read_bytes'))} / 写 {_fmt_bytes(rec.get('write_bytes'))}")
+    return '，'.join(parts)
+
+
+def summary_text(stages):
+    """阶段记录列表 → 多行摘要（耗时占比从高到低）"""
+    if not stages:
+        return ''
+    total = sum(r['wall_s'] for r in stages) or 1.0
+    lines = [f'⏱ 阶段耗时（累计 {total:.2f}s）：']
+    for r in sorted(stages, key=lambda r: -r['wall_s']):
+        lines.append(f"  {r['wall_s'] / total:6.1%}  {record_text(r)}")
+    return '\n'.join(lines)
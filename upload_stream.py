@@ -0,0 +1,159 @@
+"""
+流式上传：multipart 文件部分直接写入上传目录，写入同时计算 SHA-256
+
+Werkzeug 默认先把文件部分写进临时文件，视图中 file.save() 再复制一遍，大模型要写两次盘。
+StreamingRequest 覆盖 _get_file_stream，文件部分写入 UPLOAD_FOLDER 下的 UploadSpool：
+- 边写边计算 SHA-256，save_upload() 时以 rename 落到最终路径（同一文件系统，不再复制）
+- 开始写入前按 Content-Length 检查单文件上限（MAX_UPLOAD_FILE_BYTES）与磁盘剩余空间，
+  写入中超过上限立即中止（413），空间不足返回 507
+- 请求结束时（含客户端断开、校验失败提前返回）未被取走的 spool 文件自动删除
+"""
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from flask import Request, current_app
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+SPOOL_PREFIX = '.upload_'
+SPOOL_SUFFIX = '.part'
+DISK_RESERVE_BYTES = 256 * 1024 * 1024     # 上传后至少保留的磁盘空间
+
+
+class InsufficientStorage(HTTPException):
+    """507：上传目录磁盘空间不足（Werkzeug 未内置该状态码）"""
+    code = 507
+    description = '上传目录磁盘空间不足'
+
+
+class UploadSpool:
+    """上传中的文件：写入时计算 SHA-256 并检查大小上限"""
+    def __init__(self, folder, max_bytes=None):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, f'{SPOOL_PREFIX}{uuid.uuid4().hex}{SPOOL_SUFFIX}')
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, 'w+b')
+        self._t0, self._c0 = time.monotonic(), time.thread_time()
+        self.wall_s = self.cpu_s = 0.0
+
+    @property
+    def name(self):
+        return self.path
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'上传文件超过上限 {self.max_bytes // (1024 * 1024)} MB')
+        self._hash.update(data)
+        self._file.write(data)
+        self.wall_s = time.monotonic() - self._t0
+        self.cpu_s = time.thread_time() - self._c0
+        return len(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    # 解析完成后 FileStorage 按普通文件读取（图片等小文件直接 read()）
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def commit(self, dest):
+        """落到最终路径（rename；跨文件系统时退回 move）"""
+        self._file.close()
+        try:
+            os.replace(self.path, dest)
+        except OSError:
+            shutil.move(self.path, dest)
+        self.committed = True
+
+    def close(self):
+        self._file.close()
+
+    def discard(self):
+        self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f'[upload] 删除未完成的上传文件失败：{e}')
+
+
+class StreamingRequest(Request):
+    """文件部分写入 UploadSpool 的请求类（app.request_class）"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        config = current_app.config
+        folder = config['UPLOAD_FOLDER']
+        max_bytes = config.get('MAX_UPLOAD_FILE_BYTES') or config.get('MAX_CONTENT_LENGTH')
+        expected = content_length or total_content_length
+        if max_bytes and content_length and content_length > max_bytes:
+            raise RequestEntityTooLarge(f'上传文件超过上限 {max_bytes // (1024 * 1024)} MB')
+        if expected:
+            free = shutil.disk_usage(folder).free
+            if free - expected < DISK_RESERVE_BYTES:
+                raise InsufficientStorage(f'上传目录磁盘空间不足（剩余 {free // (1024 * 1024)} MB）')
+        spool = UploadSpool(folder, max_bytes)
+        if not hasattr(self, '_upload_spools'):
+            self._upload_spools = []
+        self._upload_spools.append(spool)
+        return spool
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            for spool in getattr(self, '_upload_spools', ()):
+                spool.discard()
+
+
+def upload_sha256(file):
+    """流式上传的文件在保存前即可取得 SHA-256，否则返回 None"""
+    stream = file.stream
+    return stream.hexdigest() if isinstance(stream, UploadSpool) else None
+
+
+def save_upload(file, path):
+    """
+    保存上传文件到 path，返回 (sha256, 墙钟秒, CPU 秒)。
+    流式上传的文件直接 rename，否则（未使用 StreamingRequest 时）边复制边计算哈希。
+    """
+    stream = file.stream
+    t0, c0 = time.monotonic(), time.thread_time()
+    if isinstance(stream, UploadSpool):
+        stream.commit(path)
+        return (stream.hexdigest(), stream.wall_s + time.monotonic() - t0,
+                stream.cpu_s + time.thread_time() - c0)
+    h = hashlib.sha256()
+    with open(path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest(), time.monotonic() - t0, time.thread_time() - c0